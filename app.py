@@ -1,11 +1,17 @@
 # src/app.py
 
 import sys
+import uuid
 import logging
+import threading
 from pathlib import Path
 import streamlit as st
 from src.backend import ad_generator
+from src.backend import jobs
+from src.backend import metrics
+from src.backend import storage_paths
 from src.backend import video_ops
+from src.backend.settings import get_settings
 from src.backend.utils import load_config
 from src.frontend import input_page, output_page
 
@@ -14,6 +20,7 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 config = load_config()
+get_settings()  # Fail fast on missing or invalid config keys
 
 # Ensure the project root is in the path for imports
 project_root = Path(__file__).parent.parent
@@ -24,19 +31,100 @@ if str(project_root) not in sys.path:
 INPUT_PAGE = "Input"
 OUTPUT_PAGE = "Output"
 
+# URL query parameter holding the session id
+SESSION_QUERY_PARAM = "session"
+
+
+@st.cache_resource
+def _start_backend_warm_up():
+    """Warms up backend clients once per process, in the background so the first page render isn't blocked."""
+    def warm_up():
+        try:
+            ad_generator.warm_up()
+        except Exception as e:
+            logger.warning(f"Backend warm-up failed: {e}")
+
+    thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+@st.cache_resource
+def _start_metrics_server():
+    """Exposes the backend metrics registry in Prometheus format once per process."""
+    return metrics.start_metrics_server()
+
 
 def _initialize_session_state():
-    """Initializes key session state variables."""
+    """
+    Initializes key session state variables.
+
+    The session id is kept in the page URL, so a reloaded tab or a reconnected websocket
+    gets a fresh Streamlit session with the same id and picks its scenes back up.
+    """
     if 'current_page' not in st.session_state:
         st.session_state['current_page'] = INPUT_PAGE
         st.session_state['ad_input_data'] = None
         st.session_state['output_data'] = None
         st.session_state['scene_states'] = None
-        st.session_state['initial_generation_pending'] = False
+        st.session_state['session_id'] = st.query_params.get(SESSION_QUERY_PARAM) or uuid.uuid4().hex
         # Initialize tab state if needed, default to 'Quick AdGen'
         if 'active_tab' not in st.session_state:
             st.session_state['active_tab'] = "Quick AdGen"
+        if SESSION_QUERY_PARAM in st.query_params and _restore_session(st.session_state['session_id']):
+            logger.info(f"Restored session {st.session_state['session_id']} from its jobs.")
         logger.info("Initial session state initialized.")
+    # A new ad starts a new session id; keep the URL in sync with it
+    if st.query_params.get(SESSION_QUERY_PARAM) != st.session_state['session_id']:
+        st.query_params[SESSION_QUERY_PARAM] = st.session_state['session_id']
+
+
+def _restore_session(session_id: str) -> bool:
+    """
+    Rebuilds the review page of a session from its retained background jobs.
+
+    Each scene gets the job the user chose most recently: its initial generation, latest
+    regeneration or latest adopted alternative. Clip selections and confirmations are not kept.
+
+    Returns:
+        bool: True if the session had scenes to restore.
+    """
+    def chosen_at(job):
+        # Adopted alternatives were submitted speculatively, before the user picked them
+        return job['labels'].get('promoted_at', job['created_at'])
+
+    latest_jobs = {}
+    for job in jobs.list_for_owner(session_id):
+        scene_index = job['labels'].get('scene_index')
+        if scene_index is None or job['priority'] != jobs.PRIORITY_USER:
+            continue
+        if scene_index not in latest_jobs or chosen_at(job) >= chosen_at(latest_jobs[scene_index]):
+            latest_jobs[scene_index] = job
+    if not latest_jobs or all(job['status'] == jobs.CANCELLED for job in latest_jobs.values()):
+        return False
+
+    scene_order = sorted(latest_jobs)
+    params = latest_jobs[scene_order[0]]['params']
+    st.session_state['ad_input_data'] = {
+        'aspect_ratio': params.get('aspect_ratio', '16:9'),
+        'person_generation': params.get('person_generation', 'allow_adult'),
+        'negative_prompt': params.get('negative_prompt', ''),
+        'product_name': (params.get('metadata') or {}).get('product_name', ''),
+    }
+    st.session_state['output_data'] = [
+        {'prompt': latest_jobs[scene_index]['params'].get('prompt', ''),
+         'scene_duration': latest_jobs[scene_index]['params'].get('duration_seconds', 5)}
+        for scene_index in scene_order
+    ]
+    output_page.initialize_scene_state(st.session_state['output_data'])
+    for scene_state, scene_index in zip(st.session_state['scene_states'], scene_order):
+        if latest_jobs[scene_index]['status'] == jobs.CANCELLED:
+            scene_state['generation_error'] = "Video generation was cancelled."
+        else:
+            # Finished jobs are pulled in by the review page's next job refresh
+            scene_state['job_id'] = latest_jobs[scene_index]['job_id']
+    st.session_state['current_page'] = OUTPUT_PAGE
+    return True
 
 
 def _handle_input_submission(input_data: dict):
@@ -47,48 +135,29 @@ def _handle_input_submission(input_data: dict):
         st.session_state['current_page'] = OUTPUT_PAGE
         st.session_state['output_data'] = None
         st.session_state['scene_states'] = None
-        st.session_state['initial_generation_pending'] = False
         st.rerun()
 
 
-def _generate_initial_prompts():
-    """Calls backend to generate initial scene prompts."""
-    logger.info("Generating initial output data (scene prompts) from backend...")
-    try:
-        ad_idea = st.session_state['ad_input_data'].get('product_ad_idea', '')
-        st.session_state['output_data'] = ad_generator.get_scene_prompts(ad_idea=ad_idea)
-        logger.info("Initial output data (prompts) generated and stored.")
-        st.session_state['initial_generation_pending'] = True
-        st.rerun()
-    except Exception as e:
-        logger.error(f"Error generating initial output data: {e}")
-        st.error(f"An error occurred during ad concept generation: {e}")
-        st.session_state['current_page'] = INPUT_PAGE
-        st.session_state['ad_input_data'] = None
-        st.session_state['output_data'] = None
-        st.session_state['scene_states'] = None
-        st.session_state['initial_generation_pending'] = False
-        st.rerun()
-
+def _reset_to_input_page():
+    """Discards the current ad and returns to the input page."""
+    st.session_state['current_page'] = INPUT_PAGE
+    st.session_state['ad_input_data'] = None
+    st.session_state['output_data'] = None
+    st.session_state['scene_states'] = None
+    # The discarded ad's jobs must not be restored on reload
+    st.session_state['session_id'] = uuid.uuid4().hex
 
-def _trigger_initial_video_generation():
-    """Triggers initial video generation for all scenes."""
-    logger.info("Initial video generation pending. Triggering generation for all scenes.")
-    st.session_state['initial_generation_pending'] = False
-
-    output_page.initialize_scene_state(st.session_state['output_data'])
 
+def _scene_video_job_params() -> dict:
+    """Builds the video generation parameters shared by all scenes from the input data."""
     ad_input_data = st.session_state['ad_input_data']
-    aspect_ratio = ad_input_data.get('aspect_ratio', '16:9')
-    person_generation = ad_input_data.get('person_generation', 'allow_adult')
     uploaded_image = ad_input_data.get('uploaded_image', None)
     product_name = ad_input_data.get('product_name', '')
-    negative_prompt = ad_input_data.get('negative_prompt', '')
 
     image_gcs_uri = None
     if uploaded_image:
         logger.info(f"Uploaded image detected: {uploaded_image.name}. Uploading to GCS.")
-        image_destination_blob = f"{config['imagen']['image_output_dir']}"
+        image_destination_blob = storage_paths.image_location(uploaded_image.name)
         image_gcs_uri = video_ops.upload_file_to_gcs(uploaded_image, image_destination_blob)
         if image_gcs_uri:
             logger.info(f"Image uploaded to GCS: {image_gcs_uri}")
@@ -96,39 +165,59 @@ def _trigger_initial_video_generation():
             logger.error("Failed to upload image to GCS.")
             st.error("Failed to upload product image. Video generation may be affected.")
 
-    metadata = {'product_name': product_name} if product_name else None
+    return dict(
+        aspect_ratio=ad_input_data.get('aspect_ratio', '16:9'),
+        person_generation=ad_input_data.get('person_generation', 'allow_adult'),
+        metadata={'product_name': product_name} if product_name else None,
+        negative_prompt=ad_input_data.get('negative_prompt', ''),
+        image_gcs_uri=image_gcs_uri
+    )
+
 
+def _generate_initial_prompts():
+    """
+    Generates scene prompts and starts video generation for each scene as soon as its prompt is ready.
+    """
+    logger.info("Generating initial output data (scene prompts) from backend...")
+    ad_input_data = st.session_state['ad_input_data']
+    job_ids = {}
     try:
-        with st.spinner("Generating initial video clips for all scenes... This may take a few minutes."):
-            for i, scene_state in enumerate(st.session_state['scene_states']):
-                prompt = scene_state['prompt_text']
-                duration = scene_state['scene_duration']
-
-                output_location = config["veo"]["veo_output_dir"]
-                generated_clips_data = video_ops.generate_video_clip(
-                    prompt=prompt,
-                    output_location=output_location,
-                    aspect_ratio=aspect_ratio,
-                    duration_seconds=duration,
-                    person_generation=person_generation,
-                    metadata=metadata,
-                    negative_prompt=negative_prompt,
-                    image_gcs_uri=image_gcs_uri
+        common_params = _scene_video_job_params()
+        scene_prompts = {}
+        scene_cards = st.container()
+        with st.spinner("Generating ad concept..."):
+            for scene_index, scene_prompt in ad_generator.iter_scene_prompts(
+                    ad_idea=ad_input_data.get('product_ad_idea', '')):
+                scene_prompts[scene_index] = scene_prompt
+                with scene_cards:
+                    output_page.render_pending_scene_card(scene_index, scene_prompt)
+                job_ids[scene_index] = jobs.submit(
+                    dict(
+                        common_params,
+                        output_location=storage_paths.clip_output_location(
+                            st.session_state.get('session_id'), scene_index),
+                        prompt=scene_prompt.get('prompt', ''),
+                        duration_seconds=scene_prompt.get('scene_duration', 5)
+                    ),
+                    owner=st.session_state.get('session_id'),
+                    bypass_cache=ad_input_data.get('bypass_cache', False),
+                    labels={'scene_index': scene_index}
                 )
-                st.session_state['scene_states'][i]['gcs_video_paths'] = generated_clips_data
-                logger.info(f"Initial video data generated for Scene {i}: {generated_clips_data}")
+                logger.info(f"Submitted video generation job {job_ids[scene_index]} for Scene {scene_index}")
 
-        st.success("Initial video clips generated.")
+        scene_order = sorted(scene_prompts)
+        st.session_state['output_data'] = [scene_prompts[scene_index] for scene_index in scene_order]
+        logger.info("Initial output data (prompts) generated and stored.")
+        output_page.initialize_scene_state(st.session_state['output_data'])
+        for scene_state, scene_index in zip(st.session_state['scene_states'], scene_order):
+            scene_state['job_id'] = job_ids[scene_index]
         st.rerun()
-
     except Exception as e:
-        logger.error(f"Error during initial video generation: {e}")
-        st.error(f"An error occurred during initial video generation: {e}")
-        st.session_state['current_page'] = INPUT_PAGE
-        st.session_state['ad_input_data'] = None
-        st.session_state['output_data'] = None
-        st.session_state['scene_states'] = None
-        st.session_state['initial_generation_pending'] = False
+        logger.error(f"Error generating initial output data: {e}")
+        st.error(f"An error occurred during ad concept generation: {e}")
+        for job_id in job_ids.values():
+            jobs.cancel(job_id)
+        _reset_to_input_page()
         st.rerun()
 
 
@@ -149,10 +238,6 @@ def _render_quick_adgen_tab():
             _generate_initial_prompts()
             return
 
-        if st.session_state.get('initial_generation_pending', False):
-            _trigger_initial_video_generation()
-            return
-
         logger.info("Rendering output page with data and videos.")
         output_page.render_output_page(st.session_state['output_data'])
 
@@ -167,6 +252,8 @@ def main():
     Main function to run the Streamlit application.
     Orchestrates page navigation and backend workflow steps within tabs.
     """
+    _start_backend_warm_up()
+    _start_metrics_server()
     _initialize_session_state()
     st.set_page_config(layout="wide", page_title="AI Ad Generator")  # Page config for browser tab title
 
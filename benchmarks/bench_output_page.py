@@ -0,0 +1,133 @@
+"""
+Rerun-time benchmark of the scene review page, run headless with Streamlit's AppTest.
+
+For each scene count, times two reruns against a local fake GCS:
+
+- page:  a full rerun of render_output_page, which is what every click on a scene
+         cost before scene cards became fragments, and still costs for page-wide changes
+         (confirming or regenerating a scene).
+- scene: a rerun of a single scene card (_render_scene_card), which is all a click on
+         a scene's own widgets (selecting or playing a clip, editing its prompt) reruns now.
+
+Each scene has two generated clips with ready previews. The "empty" row is AppTest's
+own per-run overhead, included in both numbers.
+
+Usage (AppTest logs verbosely to stderr):
+    python -m benchmarks.bench_output_page 2>/dev/null
+    python -m benchmarks.bench_output_page --scenes 2 4 8 16 --runs 30
+"""
+import os
+import time
+import argparse
+import statistics
+import tempfile
+
+SCRIPT = """
+import streamlit as st
+from src.frontend import output_page
+
+mode = st.session_state['bench_mode']
+if mode == 'page':
+    output_page.render_output_page(st.session_state['output_data'])
+elif mode == 'scene':
+    output_page._render_scene_card(st.session_state['bench_scene_index'])
+"""
+
+BUCKET = "adgen-bench"
+
+
+def _configure(work_dir: str):
+    os.environ.update({
+        'ADGEN__METRICS__ENABLED': "false",
+        'ADGEN__SCRATCH__ROOT': os.path.join(work_dir, "scratch"),
+        'ADGEN__VEO__VEO_OUTPUT_DIR': f"gs://{BUCKET}/output_clips",
+    })
+
+
+def _scene_data(storage_client, scenes: int, clips_per_scene: int):
+    """Creates the clips and their previews in the fake GCS and returns the output data and scene states."""
+    from src.backend import previews
+
+    output_data, scene_states = [], []
+    for scene_index in range(scenes):
+        prompt = f"Cinematic shot {scene_index + 1} of the product, soft morning light."
+        clips = []
+        for clip_index in range(clips_per_scene):
+            gs_uri = f"gs://{BUCKET}/output_clips/scene_{scene_index}/sample_{clip_index}.mp4"
+            for uri in [gs_uri, *previews.preview_locations(gs_uri).values()]:
+                storage_client.blob_for_uri(uri).upload_from_string(b"\0")
+            clips.append({'gs_uri': gs_uri, 'http_url': gs_uri})
+        output_data.append({'prompt': prompt, 'scene_duration': 5})
+        scene_states.append({
+            'prompt_text': prompt, 'original_prompt': prompt, 'is_edited': False, 'video_index': 0,
+            'confirmed_video_url': None, 'is_confirmed': False, 'gcs_video_paths': clips,
+            'generation_error': None, 'job_id': None, 'is_playing': False, 'scene_duration': 5,
+        })
+    return output_data, scene_states
+
+
+def _time_runs(app, runs: int) -> float:
+    """Median wall time of `runs` reruns, in milliseconds."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        app.run(timeout=30)
+        timings.append((time.perf_counter() - start) * 1000)
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+    return statistics.median(timings)
+
+
+def _bench(storage_client, scenes: int, clips_per_scene: int, runs: int) -> dict:
+    from streamlit.testing.v1 import AppTest
+    from src.backend import previews
+
+    output_data, scene_states = _scene_data(storage_client, scenes, clips_per_scene)
+    app = AppTest.from_string(SCRIPT, default_timeout=30)
+    app.session_state['output_data'] = output_data
+    app.session_state['scene_states'] = scene_states
+    app.session_state['bench_mode'] = 'page'
+
+    # Warm up until every clip's previews are ready, so posters render in the timed runs
+    for _ in range(100):
+        app.run()
+        uris = [clip['gs_uri'] for state in scene_states for clip in state['gcs_video_paths']]
+        if not previews.previews_pending(uris):
+            break
+        time.sleep(0.05)
+
+    result = {'page': _time_runs(app, runs)}
+    app.session_state['bench_mode'] = 'scene'
+    app.session_state['bench_scene_index'] = 0
+    result['scene'] = _time_runs(app, runs)
+    app.session_state['bench_mode'] = 'empty'
+    result['empty'] = _time_runs(app, runs)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenes", type=int, nargs="+", default=[1, 2, 4, 8, 12], help="Scene counts to measure.")
+    parser.add_argument("--clips-per-scene", type=int, default=2)
+    parser.add_argument("--runs", type=int, default=20, help="Timed reruns per measurement.")
+    parser.add_argument("--work-dir", help="Directory for fake GCS and scratch files. Defaults to a temp dir.")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="adgen_bench_ui_")
+    _configure(work_dir)
+
+    # Imported only after the overrides are in place, so module-level config sees them
+    from benchmarks.fakes import LocalStorageClient
+    from src.backend import clients
+    storage_client = LocalStorageClient(os.path.join(work_dir, "gcs"), signed_url_base="https://fake-gcs.invalid")
+    clients.set_storage_client(storage_client)
+
+    print(f"{'scenes':>6}{'page_ms':>10}{'scene_ms':>10}{'empty_ms':>10}{'speedup':>9}")
+    for scenes in args.scenes:
+        result = _bench(storage_client, scenes, args.clips_per_scene, args.runs)
+        speedup = (result['page'] - result['empty']) / max(result['scene'] - result['empty'], 1e-3)
+        print(f"{scenes:>6}{result['page']:>10.1f}{result['scene']:>10.1f}{result['empty']:>10.1f}{speedup:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Offline end-to-end benchmark of the AdGen pipeline with local stand-ins for Gemini, Veo and GCS.
+
+Each simulated user runs get_scene_prompts, submits one job per scene with jobs.submit,
+polls them with jobs.poll like the review page does, then runs merge_video_clips. This is
+one pass through the app, on the same process-wide JobManager and QuotaScheduler the app
+uses. All users start together. The report shows p50/p95 latency per stage and overall
+throughput. No cloud credentials are needed; ffmpeg must be installed for the test clips
+and the merge.
+
+Usage:
+    python -m benchmarks.bench_pipeline --users 8
+    python -m benchmarks.bench_pipeline --users 16 --veo-operation-sec 20 --veo-failure-rate 0.1
+    python -m benchmarks.bench_pipeline --users 16 --quota-rpm 60 --quota-max-concurrent 16
+"""
+import os
+import math
+import time
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+STAGES = ['scene_prompts', 'video_generation', 'merge', 'total']
+
+
+def _configure(work_dir: str, args):
+    """Points caches, scratch space and polling at the benchmark via ADGEN__* overrides."""
+    os.environ.update({
+        'ADGEN__PROMPT_CACHE__ENABLED': "false",
+        'ADGEN__CLIP_CACHE__BACKEND': "none",
+        'ADGEN__METRICS__ENABLED': "false",
+        'ADGEN__PREVIEWS__ENABLED': "false",
+        'ADGEN__SPECULATION__ENABLED': "false",
+        'ADGEN__JOBS__DB_PATH': os.path.join(work_dir, "jobs.sqlite"),
+        'ADGEN__SCRATCH__ROOT': os.path.join(work_dir, "scratch"),
+        'ADGEN__POLLING__MODEL_PATH': os.path.join(work_dir, "operation_durations.json"),
+        'ADGEN__POLLING__DEFAULT_EXPECTED_SEC': str(args.veo_operation_sec),
+        'ADGEN__POLLING__MIN_INTERVAL_SEC': str(args.min_poll_interval_sec),
+        'ADGEN__VEO__VEO_OUTPUT_DIR': "gs://adgen-bench/output_clips",
+        'ADGEN__GEMINI__PIPELINE': args.pipeline,
+    })
+    if args.max_in_flight:
+        os.environ['ADGEN__VEO__MAX_CONCURRENT_OPERATIONS'] = str(args.max_in_flight)
+    if args.quota_rpm:
+        os.environ['ADGEN__QUOTA__REQUESTS_PER_MINUTE'] = str(args.quota_rpm)
+    if args.quota_max_concurrent:
+        os.environ['ADGEN__QUOTA__MAX_CONCURRENT_OPERATIONS'] = str(args.quota_max_concurrent)
+
+
+def _percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def _run_user(user_index: int, ad_idea: str, poll_interval_sec: float) -> dict:
+    from src.backend import ad_generator, jobs, storage_paths, video_ops
+
+    session_id = f"bench-user-{user_index}"
+    timings = {}
+    start = time.perf_counter()
+
+    stage_start = time.perf_counter()
+    scene_prompts = ad_generator.get_scene_prompts(ad_idea)
+    timings['scene_prompts'] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    job_ids = {
+        scene_index: jobs.submit(
+            dict(
+                prompt=scene['prompt'],
+                output_location=storage_paths.clip_output_location(session_id, scene_index),
+                aspect_ratio="16:9",
+                duration_seconds=scene.get('scene_duration', 5),
+                person_generation="allow_adult",
+            ),
+            owner=session_id,
+        )
+        for scene_index, scene in enumerate(scene_prompts)
+    }
+    clips, unfinished = {}, dict(job_ids)
+    while unfinished:
+        for scene_index, job_id in list(unfinished.items()):
+            job = jobs.poll(job_id)
+            if job['status'] not in jobs.FINISHED_STATUSES:
+                continue
+            if job['status'] == jobs.SUCCEEDED and job['result']:
+                clips[scene_index] = job['result'][0]['gs_uri']
+            del unfinished[scene_index]
+        if unfinished:
+            time.sleep(poll_interval_sec)
+    timings['video_generation'] = time.perf_counter() - stage_start
+    if not clips:
+        raise RuntimeError("No scene produced a video clip.")
+
+    stage_start = time.perf_counter()
+    final_video_url = video_ops.merge_video_clips(
+        [clips[scene_index] for scene_index in sorted(clips)],
+        output_location=storage_paths.final_ad_location(session_id),
+    )
+    timings['merge'] = time.perf_counter() - stage_start
+    if not final_video_url:
+        raise RuntimeError("Merging clips failed.")
+
+    timings['total'] = time.perf_counter() - start
+    timings['failed_scenes'] = len(job_ids) - len(clips)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=4, help="Concurrent simulated users.")
+    parser.add_argument("--scenes", type=int, default=4, help="Scenes per ad returned by the fake Gemini.")
+    parser.add_argument("--pipeline", choices=["two_step", "single_call"], default="two_step")
+    parser.add_argument("--gemini-latency-sec", type=float, default=2.0, help="Mean latency of a Gemini call.")
+    parser.add_argument("--veo-operation-sec", type=float, default=30.0, help="Mean duration of a Veo operation.")
+    parser.add_argument("--veo-failure-rate", type=float, default=0.0, help="Probability a Veo operation fails.")
+    parser.add_argument("--max-in-flight", type=int, help="Veo operations the job manager runs at once.")
+    parser.add_argument("--quota-rpm", type=int, help="Veo starts per minute allowed by the quota scheduler.")
+    parser.add_argument("--quota-max-concurrent", type=int,
+                        help="Concurrent Veo operations allowed by the quota scheduler.")
+    parser.add_argument("--min-poll-interval-sec", type=float, default=0.5)
+    parser.add_argument("--ui-poll-sec", type=float, default=0.5,
+                        help="How often each user polls its jobs, like the review page's refresh.")
+    parser.add_argument("--work-dir", help="Directory for fake GCS and scratch files. Defaults to a temp dir.")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="adgen_bench_")
+    _configure(work_dir, args)
+
+    # Imported only after the overrides are in place, so module-level config sees them,
+    # and before the user threads start, so they don't race on the imports
+    from benchmarks.fakes import install_fakes
+    from src.backend import ad_generator, jobs, storage_paths, video_ops  # noqa: F401
+    install_fakes(
+        work_dir,
+        gemini_latency_sec=args.gemini_latency_sec,
+        scenes=args.scenes,
+        veo_operation_sec=args.veo_operation_sec,
+        veo_failure_rate=args.veo_failure_rate,
+    )
+
+    results, errors = [], []
+    lock = threading.Lock()
+
+    def run(user_index):
+        try:
+            timings = _run_user(user_index, f"Ad idea #{user_index}: a reusable water bottle on a desert hike.",
+                                args.ui_poll_sec)
+        except Exception as e:
+            with lock:
+                errors.append(f"user {user_index}: {type(e).__name__}: {e}")
+            return
+        with lock:
+            results.append(timings)
+
+    print(f"Running {args.users} users against local fakes in {work_dir} ...")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users, thread_name_prefix="bench-user") as executor:
+        list(executor.map(run, range(args.users)))
+    wall_sec = time.perf_counter() - start
+
+    print(f"\n{'stage':<18}{'p50_sec':>10}{'p95_sec':>10}{'max_sec':>10}")
+    for stage in STAGES:
+        values = [timings[stage] for timings in results]
+        if values:
+            print(f"{stage:<18}{_percentile(values, 50):>10.2f}{_percentile(values, 95):>10.2f}{max(values):>10.2f}")
+
+    print(f"\nCompleted ads:   {len(results)}/{args.users}")
+    print(f"Failed scenes:   {sum(timings['failed_scenes'] for timings in results)}")
+    print(f"Wall time:       {wall_sec:.1f}s")
+    print(f"Throughput:      {len(results) / wall_sec * 60:.2f} ads/min")
+    for error in errors:
+        print(f"  FAILED {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark of the scene prompt pipelines: two-step (script, then Veo prompts) vs a single structured call.
+
+Reports latency, Gemini token usage, output validity and how often scene durations had to be
+clamped for each pipeline.
+Requires Vertex AI credentials; the prompt cache is disabled so every run calls Gemini.
+
+Usage:
+    python -m benchmarks.bench_scene_pipeline --runs 3
+    python -m benchmarks.bench_scene_pipeline --ad-idea "A smartwatch that tracks your surf sessions"
+"""
+import os
+import time
+import argparse
+import statistics
+
+os.environ["ADGEN__PROMPT_CACHE__ENABLED"] = "false"
+
+from vertexai.generative_models import GenerativeModel  # noqa: E402
+
+from src.backend import ad_generator, clients  # noqa: E402
+
+DEFAULT_AD_IDEAS = [
+    "A reusable water bottle that keeps drinks cold for 48 hours, shown on a desert hike.",
+    "A smartwatch that tracks your surf sessions, from dawn patrol to sunset.",
+    "A cozy coffee shop's new pumpkin spice latte on a rainy autumn afternoon.",
+]
+
+PIPELINES = {
+    'two_step': ad_generator.get_scene_prompts_two_step,
+    'single_call': ad_generator.get_scene_prompts_single_call,
+}
+
+
+class _UsageRecordingModel:
+    """Wraps a GenerativeModel and records token usage of every generate_content call."""
+
+    usage = []
+
+    def __init__(self, **kwargs):
+        self._model = GenerativeModel(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+    def generate_content(self, *args, **kwargs):
+        response = self._model.generate_content(*args, **kwargs)
+        usage_metadata = response.usage_metadata
+        _UsageRecordingModel.usage.append(
+            (usage_metadata.prompt_token_count, usage_metadata.candidates_token_count))
+        return response
+
+
+def _run_pipeline(name: str, ad_ideas: list, runs: int) -> dict:
+    latencies, input_tokens, output_tokens, calls, valid, clamped = [], [], [], [], 0, 0
+    for run in range(runs):
+        for ad_idea in ad_ideas:
+            _UsageRecordingModel.usage = []
+            start = time.perf_counter()
+            try:
+                scene_prompts = PIPELINES[name](ad_idea)
+                problems = ad_generator.validate_scene_prompts(scene_prompts)
+                deviations = ad_generator.scene_duration_deviations(scene_prompts)
+            except Exception as e:
+                problems, deviations = [f"{type(e).__name__}: {e}"], []
+            latencies.append(time.perf_counter() - start)
+            input_tokens.append(sum(usage[0] for usage in _UsageRecordingModel.usage))
+            output_tokens.append(sum(usage[1] for usage in _UsageRecordingModel.usage))
+            calls.append(len(_UsageRecordingModel.usage))
+            if problems:
+                print(f"  [{name}] run {run + 1}: invalid output: {problems}")
+            else:
+                valid += 1
+            if deviations:
+                print(f"  [{name}] run {run + 1}: durations clamped: {deviations}")
+                clamped += 1
+
+    return {
+        'samples': len(latencies),
+        'p50_sec': statistics.median(latencies),
+        'mean_sec': statistics.mean(latencies),
+        'max_sec': max(latencies),
+        'calls': statistics.mean(calls),
+        'input_tokens': statistics.mean(input_tokens),
+        'output_tokens': statistics.mean(output_tokens),
+        'valid_pct': 100 * valid / len(latencies),
+        'clamped_pct': 100 * clamped / len(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Repetitions per ad idea.")
+    parser.add_argument("--ad-idea", action="append", help="Ad idea to benchmark (repeatable).")
+    parser.add_argument("--pipeline", choices=sorted(PIPELINES), action="append",
+                        help="Pipeline to benchmark (repeatable). Defaults to all.")
+    args = parser.parse_args()
+
+    clients.set_model_factory(_UsageRecordingModel)
+    ad_ideas = args.ad_idea or DEFAULT_AD_IDEAS
+    results = {name: _run_pipeline(name, ad_ideas, args.runs) for name in args.pipeline or PIPELINES}
+
+    columns = ['samples', 'p50_sec', 'mean_sec', 'max_sec', 'calls', 'input_tokens', 'output_tokens', 'valid_pct',
+               'clamped_pct']
+    print(f"\n{'pipeline':<12}" + "".join(f"{column:>14}" for column in columns))
+    for name, result in results.items():
+        print(f"{name:<12}" + "".join(f"{result[column]:>14.1f}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
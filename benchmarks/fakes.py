@@ -0,0 +1,340 @@
+"""
+Local stand-ins for Gemini, Veo and GCS used by the offline benchmarks.
+
+Install them with `install_fakes`, which swaps the process-wide clients in
+`src.backend.clients`; the application code runs unchanged on top of them.
+
+- `FakeGenerativeModel` answers Gemini prompts with canned JSON after a configurable latency.
+- `FakeGenaiClient` simulates Veo long-running operations with a configurable duration and
+  failure rate, writing real MP4 clips into the fake GCS when an operation completes.
+- `LocalStorageClient` implements the subset of the GCS client AdGen uses on top of a local
+  directory; signed URLs are file:// URLs, so ffmpeg can read them directly.
+"""
+import os
+import json
+import time
+import uuid
+import base64
+import random
+import shutil
+import asyncio
+import datetime
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Optional
+
+import ffmpeg
+import google_crc32c
+
+from src.backend import clients
+
+SCRIPT_PROMPT_MARKER = "`scenes` array"
+VEO_PROMPTS_PROMPT_MARKER = "**Input Ad Concept Data:**"
+PROMPT_VARIANTS_PROMPT_MARKER = "**Input Veo Prompt:**"
+
+
+def _jittered(seconds: float, jitter: float) -> float:
+    return max(0.0, seconds * random.uniform(1 - jitter, 1 + jitter))
+
+
+class LocalBlob:
+    """A GCS object stored as a file under `LocalStorageClient.root/<bucket>/<name>`."""
+
+    def __init__(self, bucket: "LocalBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+        self.path = bucket.path / name
+
+    def exists(self) -> bool:
+        return self.path.is_file()
+
+    @property
+    def size(self) -> Optional[int]:
+        return self.path.stat().st_size if self.exists() else None
+
+    @property
+    def crc32c(self) -> Optional[str]:
+        if not self.exists():
+            return None
+        checksum = google_crc32c.Checksum()
+        with open(self.path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                checksum.update(chunk)
+        return base64.b64encode(checksum.digest()).decode('utf-8')
+
+    @property
+    def updated(self) -> Optional[datetime.datetime]:
+        if not self.exists():
+            return None
+        return datetime.datetime.fromtimestamp(self.path.stat().st_mtime, tz=datetime.timezone.utc)
+
+    def _require(self):
+        if not self.exists():
+            raise FileNotFoundError(f"No such object: gs://{self.bucket.name}/{self.name}")
+
+    def download_to_filename(self, filename: str, **kwargs):
+        self._require()
+        shutil.copyfile(self.path, filename)
+
+    def download_as_text(self, **kwargs) -> str:
+        self._require()
+        return self.path.read_text(encoding="utf-8")
+
+    def upload_from_file(self, file_obj, **kwargs):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'wb') as f:
+            shutil.copyfileobj(file_obj, f)
+
+    def upload_from_filename(self, filename: str, **kwargs):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(filename, self.path)
+
+    def upload_from_string(self, data, content_type: str = None, **kwargs):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.path.write_bytes(data)
+
+    def open(self, mode: str = "r", chunk_size: int = None, content_type: str = None, **kwargs):
+        if "w" in mode:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        else:
+            self._require()
+        return open(self.path, mode)
+
+    def delete(self, **kwargs):
+        self._require()
+        self.path.unlink()
+
+    def generate_signed_url(self, **kwargs) -> str:
+        if self.bucket.client.signed_url_base:
+            return f"{self.bucket.client.signed_url_base}/{self.bucket.name}/{self.name}"
+        return self.path.resolve().as_uri()
+
+
+class LocalBucket:
+
+    def __init__(self, client: "LocalStorageClient", name: str):
+        self.client = client
+        self.name = name
+        self.path = client.root / name
+
+    def blob(self, blob_name: str) -> LocalBlob:
+        return LocalBlob(self, blob_name)
+
+    def get_blob(self, blob_name: str) -> Optional[LocalBlob]:
+        blob = self.blob(blob_name)
+        return blob if blob.exists() else None
+
+    def copy_blob(self, blob: LocalBlob, destination_bucket: "LocalBucket", new_name: str = None, **kwargs) -> LocalBlob:
+        blob._require()
+        new_blob = destination_bucket.blob(new_name or blob.name)
+        new_blob.upload_from_filename(str(blob.path))
+        return new_blob
+
+    def list_blobs(self, prefix: str = "", **kwargs):
+        if not self.path.exists():
+            return []
+        names = sorted(str(path.relative_to(self.path)) for path in self.path.rglob("*") if path.is_file())
+        return [self.blob(name) for name in names if name.startswith(prefix)]
+
+
+class LocalStorageClient:
+    """
+    Filesystem-backed replacement for `google.cloud.storage.Client`.
+
+    Signed URLs are file:// URLs, or `signed_url_base`/<bucket>/<name> if given (e.g. for
+    Streamlit elements, which only accept http(s) URLs).
+    """
+
+    def __init__(self, root: str, signed_url_base: str = None):
+        self.root = Path(root)
+        self.signed_url_base = signed_url_base
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def bucket(self, bucket_name: str) -> LocalBucket:
+        return LocalBucket(self, bucket_name)
+
+    def blob_for_uri(self, gs_uri: str) -> LocalBlob:
+        bucket_name, blob_name = gs_uri.replace("gs://", "", 1).split('/', 1)
+        return self.bucket(bucket_name).blob(blob_name)
+
+
+def _response(prompt: str, text: str) -> SimpleNamespace:
+    # Rough token estimate; real counts come from the Gemini tokenizer
+    usage_metadata = SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=len(text) // 4)
+    candidate = SimpleNamespace(content=SimpleNamespace(parts=[SimpleNamespace(text=text)]))
+    return SimpleNamespace(text=text, candidates=[candidate], usage_metadata=usage_metadata)
+
+
+class FakeGenerativeModel:
+    """
+    Stand-in for `vertexai.generative_models.GenerativeModel` with canned JSON answers.
+
+    Recognizes the ad script prompt, the Veo prompt rewrite prompt and the prompt variants
+    prompt by their wording; any other prompt (e.g. the single-call scene list) gets a Veo-ready scene list.
+    """
+
+    def __init__(self, model_name: str, generation_config=None, safety_settings=None,
+                 latency_sec: float = 1.0, jitter: float = 0.25, scenes: int = 4, stream_chunks: int = 8):
+        self._latency_sec = latency_sec
+        self._jitter = jitter
+        self._scenes = scenes
+        self._stream_chunks = stream_chunks
+
+    @staticmethod
+    def _scene_list(scenes: int) -> str:
+        return json.dumps([
+            {'prompt': f"Cinematic shot {index + 1} of the product, soft morning light.", 'scene_duration': 5}
+            for index in range(scenes)
+        ])
+
+    def _answer(self, prompt: str) -> str:
+        if PROMPT_VARIANTS_PROMPT_MARKER in prompt:
+            return json.dumps([f"Variant {index + 1}: low-angle tracking shot of the product at golden hour."
+                               for index in range(2)])
+        if VEO_PROMPTS_PROMPT_MARKER in prompt:
+            # "scene_number" only occurs in the embedded script, once per scene
+            return self._scene_list(max(1, prompt.count("scene_number")))
+        if SCRIPT_PROMPT_MARKER in prompt:
+            return json.dumps({
+                'scenes': [
+                    {'scene_number': index + 1, 'scene_duration_sec': 5,
+                     'scene_description': f"Scene {index + 1} showing the product in use."}
+                    for index in range(self._scenes)
+                ],
+                'visual_elements': [{'name': "Product", 'description': "A matte black bottle with a steel cap."}],
+            })
+        return self._scene_list(self._scenes)
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        text = self._answer(prompt)
+        if stream:
+            return self._stream(prompt, text)
+        time.sleep(_jittered(self._latency_sec, self._jitter))
+        return _response(prompt, text)
+
+    def _stream(self, prompt: str, text: str):
+        total_sec = _jittered(self._latency_sec, self._jitter)
+        chunk_size = max(1, -(-len(text) // self._stream_chunks))
+        for start in range(0, len(text), chunk_size):
+            time.sleep(total_sec / self._stream_chunks)
+            chunk = _response(prompt, text[start:start + chunk_size])
+            # Like Gemini, only the final chunk carries the usage totals
+            chunk.usage_metadata = _response(prompt, text).usage_metadata if start + chunk_size >= len(text) else None
+            yield chunk
+
+    async def generate_content_async(self, prompt, **kwargs):
+        await asyncio.sleep(_jittered(self._latency_sec, self._jitter))
+        return _response(prompt, self._answer(prompt))
+
+
+class _FakeModels:
+
+    def __init__(self, owner: "FakeGenaiClient"):
+        self._owner = owner
+
+    def generate_videos(self, model: str, prompt: str, config=None, **kwargs):
+        return self._owner._start_operation(prompt, config)
+
+
+class _FakeOperations:
+
+    def __init__(self, owner: "FakeGenaiClient"):
+        self._owner = owner
+
+    def get(self, operation):
+        return self._owner._get_operation(operation.name)
+
+
+class FakeGenaiClient:
+    """
+    Stand-in for the Vertex AI `genai.Client` that simulates Veo operations.
+
+    Each operation finishes after `operation_sec` (with jitter) and fails with probability
+    `failure_rate`. On success, `number_of_videos` copies of a generated test clip of the
+    requested duration and aspect ratio are written below the request's output_gcs_uri.
+    """
+
+    def __init__(self, storage_client: LocalStorageClient, clip_dir: str, operation_sec: float = 60,
+                 jitter: float = 0.25, failure_rate: float = 0.0):
+        self.models = _FakeModels(self)
+        self.operations = _FakeOperations(self)
+        self._storage_client = storage_client
+        self._clip_dir = Path(clip_dir)
+        self._clip_dir.mkdir(parents=True, exist_ok=True)
+        self._operation_sec = operation_sec
+        self._jitter = jitter
+        self._failure_rate = failure_rate
+        self._lock = threading.Lock()
+        self._operations = {}
+
+    def _template_clip(self, duration_seconds: int, aspect_ratio: str) -> str:
+        """Renders (once) a silent test-pattern clip shaped like a Veo output."""
+        width, height = (720, 1280) if aspect_ratio == "9:16" else (1280, 720)
+        path = self._clip_dir / f"clip_{duration_seconds}s_{width}x{height}.mp4"
+        with self._lock:
+            if not path.exists():
+                (
+                    ffmpeg
+                    .input(f"testsrc=size={width}x{height}:rate=24:duration={duration_seconds}", f='lavfi')
+                    .output(str(path), vcodec='libx264', preset='ultrafast', pix_fmt='yuv420p')
+                    .run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
+                )
+        return str(path)
+
+    def _start_operation(self, prompt: str, config) -> SimpleNamespace:
+        name = f"projects/offline/locations/local/operations/{uuid.uuid4().hex}"
+        with self._lock:
+            self._operations[name] = {
+                'done_at': time.time() + _jittered(self._operation_sec, self._jitter),
+                'failed': random.random() < self._failure_rate,
+                'config': config,
+                'result': None,
+            }
+        return SimpleNamespace(name=name, done=False, error=None, result=None)
+
+    def _get_operation(self, name: str) -> SimpleNamespace:
+        with self._lock:
+            state = self._operations.get(name)
+        if state is None:
+            raise KeyError(f"Unknown operation: {name}")
+        if time.time() < state['done_at']:
+            return SimpleNamespace(name=name, done=False, error=None, result=None)
+        if state['failed']:
+            return SimpleNamespace(name=name, done=True, result=None,
+                                   error={'code': 13, 'message': "Simulated Veo failure"})
+
+        if state['result'] is None:
+            config = state['config']
+            template = self._template_clip(config.duration_seconds, config.aspect_ratio)
+            operation_id = name.rsplit('/', 1)[-1]
+            videos = []
+            for index in range(config.number_of_videos or 1):
+                uri = f"{config.output_gcs_uri.rstrip('/')}/{operation_id}/sample_{index}.mp4"
+                self._storage_client.blob_for_uri(uri).upload_from_filename(template)
+                videos.append(SimpleNamespace(video=SimpleNamespace(uri=uri)))
+            state['result'] = SimpleNamespace(generated_videos=videos)
+        return SimpleNamespace(name=name, done=True, error=None, result=state['result'])
+
+
+def install_fakes(work_dir: str, gemini_latency_sec: float = 1.0, scenes: int = 4,
+                  veo_operation_sec: float = 60, veo_failure_rate: float = 0.0) -> LocalStorageClient:
+    """
+    Replaces the shared Gemini, Veo and GCS clients with local fakes rooted at `work_dir`.
+
+    Returns:
+        LocalStorageClient: The fake GCS, e.g. to inspect uploaded objects.
+    """
+    storage_client = LocalStorageClient(os.path.join(work_dir, "gcs"))
+    clients.set_storage_client(storage_client)
+    clients.set_genai_client(FakeGenaiClient(
+        storage_client,
+        clip_dir=os.path.join(work_dir, "clip_templates"),
+        operation_sec=veo_operation_sec,
+        failure_rate=veo_failure_rate,
+    ))
+    clients.set_model_factory(
+        lambda **kwargs: FakeGenerativeModel(latency_sec=gemini_latency_sec, scenes=scenes, **kwargs))
+    return storage_client
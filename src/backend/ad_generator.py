@@ -1,6 +1,10 @@
 """Ad Generator"""
 import json
+import time
+import queue
+import asyncio
 import logging
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, Tuple
 
 from vertexai.generative_models import (
     GenerativeModel,
@@ -10,8 +14,16 @@ from vertexai.generative_models import (
     GenerationConfig
 )
 
-from src.backend.prompts import (generate_script_prompt, generate_veo_compatible_prompt)
+from src.backend import metrics
+from src.backend.clients import (get_generative_model, get_generative_model_spec, get_genai_client,
+                                 get_storage_client, run_coroutine)
+from src.backend.json_stream import IncrementalJSONArrayParser
+from src.backend.prompt_cache import PromptCache, get_prompt_cache
+from src.backend.prompts import (generate_script_prompt, generate_veo_compatible_prompt,
+                                 generate_veo_scene_list_prompt, generate_prompt_variants_prompt)
+from src.backend.settings import Settings, get_settings
 from src.backend.utils import load_config
+from src.backend.video_ops import clamp_duration
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -41,14 +53,310 @@ safety_config = [
 ]
 
 
-def call_gemini(model, prompt) -> str:
-    """Makes an API call to Gemini"""
-    logging.info("Making Gemini call")
-    response = model.generate_content(prompt)
+def _model_name(model) -> Optional[str]:
+    return get_generative_model_spec(model)[0]
+
+
+def _prompt_cache_lookup(model, prompt, use_cache: bool) -> Tuple[Optional[PromptCache], Optional[str], Optional[str]]:
+    """Returns (cache, key, cached_text) for a Gemini call; cache and key are None when caching is off."""
+    cache = get_prompt_cache() if use_cache else None
+    if cache is None:
+        return None, None, None
+    model_name, generation_config = get_generative_model_spec(model)
+    if model_name is None:
+        # Not built by get_generative_model, so there is nothing reliable to key on
+        return None, None, None
+    key = cache.key(model_name, generation_config, prompt)
+    return cache, key, cache.get(key)
+
+
+def _cache_if_valid(cache: Optional[PromptCache], key: str, text: str, validate: Callable[[str], Any]):
+    """Caches a response only if `validate` accepts it, so truncated or malformed answers aren't replayed."""
+    if cache is None:
+        return
+    try:
+        validate(text)
+    except Exception as e:
+        logger.warning(f"Not caching Gemini response that failed validation: {e}")
+        return
+    cache.put(key, text)
+
+
+def _record_cache_hit(api: str, model, prompt):
+    logger.info("Gemini prompt cache hit")
+    metrics.record_call(api=api, model=_model_name(model), outcome="cache_hit", wall_sec=0.0,
+                        prompt_chars=len(prompt) if isinstance(prompt, str) else None)
+
+
+def call_gemini(model, prompt, use_cache: bool = True, validate: Callable[[str], Any] = json.loads) -> str:
+    """
+    Makes an API call to Gemini, reusing a cached response for an identical call.
+
+    A fresh response is cached only if `validate` (by default, JSON parsing) accepts it.
+    """
+    cache, key, cached_text = _prompt_cache_lookup(model, prompt, use_cache)
+    if cached_text is not None:
+        _record_cache_hit("gemini.generate_content", model, prompt)
+        return cached_text
+
+    logger.info("Making Gemini call")
+    with metrics.track_call("gemini.generate_content", _model_name(model), prompt) as call:
+        response = model.generate_content(prompt)
+        call['usage_metadata'] = response.usage_metadata
+    _cache_if_valid(cache, key, response.text, validate)
     return response.text
 
 
+def call_gemini_stream(model, prompt, use_cache: bool = True,
+                       validate: Callable[[str], Any] = json.loads) -> Iterator[str]:
+    """
+    Makes a streaming API call to Gemini, yielding text chunks as they are generated.
+
+    The joined response is cached only if `validate` accepts it once the stream has ended.
+    """
+    cache, key, cached_text = _prompt_cache_lookup(model, prompt, use_cache)
+    if cached_text is not None:
+        _record_cache_hit("gemini.generate_content_stream", model, prompt)
+        yield cached_text
+        return
+
+    logger.info("Making streaming Gemini call")
+    chunks = []
+    with metrics.track_call("gemini.generate_content_stream", _model_name(model), prompt) as call:
+        start = time.perf_counter()
+        for chunk in model.generate_content(prompt, stream=True):
+            # Token counts are cumulative; the last chunk carries the totals
+            if chunk.usage_metadata is not None:
+                call['usage_metadata'] = chunk.usage_metadata
+            if chunk.candidates and chunk.candidates[0].content.parts:
+                call.setdefault('first_chunk_sec', round(time.perf_counter() - start, 3))
+                chunks.append(chunk.text)
+                yield chunk.text
+    _cache_if_valid(cache, key, "".join(chunks), validate)
+
+
+async def call_gemini_async(model, prompt, use_cache: bool = True,
+                            validate: Callable[[str], Any] = json.loads) -> str:
+    """
+    Makes a non-blocking API call to Gemini, reusing a cached response for an identical call.
+
+    A fresh response is cached only if `validate` (by default, JSON parsing) accepts it.
+    """
+    cache, key, cached_text = _prompt_cache_lookup(model, prompt, use_cache)
+    if cached_text is not None:
+        _record_cache_hit("gemini.generate_content_async", model, prompt)
+        return cached_text
+
+    logger.info("Making async Gemini call")
+    with metrics.track_call("gemini.generate_content_async", _model_name(model), prompt) as call:
+        response = await model.generate_content_async(prompt)
+        call['usage_metadata'] = response.usage_metadata
+    _cache_if_valid(cache, key, response.text, validate)
+    return response.text
+
+
+# Generation config shared by all JSON-producing Gemini calls
+json_generation_config = GenerationConfig(
+    response_mime_type="application/json",
+    # response_schema=response_schema
+)
+
+
+# Final Veo-ready scene list, produced directly by the single-call pipeline
+scene_list_response_schema = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "prompt": {"type": "string"},
+            "scene_duration": {"type": "integer"},
+        },
+        "required": ["prompt", "scene_duration"],
+    },
+}
+
+scene_list_generation_config = GenerationConfig(
+    response_mime_type="application/json",
+    response_schema=scene_list_response_schema,
+)
+
+
+prompt_variants_response_schema = {
+    "type": "array",
+    "items": {"type": "string"},
+}
+
+prompt_variants_generation_config = GenerationConfig(
+    response_mime_type="application/json",
+    response_schema=prompt_variants_response_schema,
+)
+
+
+def _create_model(settings: Settings, generation_config: GenerationConfig = json_generation_config) -> GenerativeModel:
+    return get_generative_model(
+        model_name=settings.gemini.model_name,
+        generation_config=generation_config,
+        safety_settings=safety_config,
+    )
+
+
+def _normalized_scene_duration(scene: dict):
+    """
+    Returns the clip length video generation will request for a scene: 5s when
+    scene_duration is missing, otherwise clamped to 5-8s. None if it can't be used.
+    """
+    duration = scene.get('scene_duration', 5)
+    if isinstance(duration, bool) or not isinstance(duration, (int, float)):
+        return None
+    duration = clamp_duration(duration)
+    return duration if isinstance(duration, int) else None
+
+
+def validate_scene_prompts(scene_prompts) -> list:
+    """
+    Checks that a scene list is usable for video generation.
+
+    Durations are checked after the same defaulting and clamping video generation
+    applies, so an out-of-range duration is not a problem here; see
+    `scene_duration_deviations` for those.
+
+    Returns:
+        list: Human-readable problems; empty if the scene list is valid.
+    """
+    if not isinstance(scene_prompts, list) or not scene_prompts:
+        return ["Scene list must be a non-empty JSON list."]
+
+    problems = []
+    for scene_index, scene in enumerate(scene_prompts):
+        problems += _scene_problems(scene_index, scene)
+    return problems
+
+
+def _scene_problems(scene_index: int, scene) -> list:
+    """Returns the problems of a single scene, as checked by `validate_scene_prompts`."""
+    if not isinstance(scene, dict):
+        return [f"Scene {scene_index + 1} is not an object."]
+    problems = []
+    if not isinstance(scene.get('prompt'), str) or not scene['prompt'].strip():
+        problems.append(f"Scene {scene_index + 1} has no prompt.")
+    if _normalized_scene_duration(scene) is None:
+        problems.append(f"Scene {scene_index + 1} has unusable scene_duration "
+                        f"{scene['scene_duration']!r} (expected whole seconds).")
+    return problems
+
+
+def _checked_scene(scene_index: int, scene) -> dict:
+    """
+    Returns a streamed scene if it passes the `validate_scene_prompts` checks, so an unusable
+    scene is never handed to video generation.
+
+    Raises:
+        ValueError: If the scene is not an object, has no prompt or an unusable duration.
+    """
+    problems = _scene_problems(scene_index, scene)
+    if problems:
+        raise ValueError(f"Gemini returned an unusable scene: {' '.join(problems)}")
+    return scene
+
+
+def scene_duration_deviations(scene_prompts) -> list:
+    """
+    Lists scenes whose requested scene_duration video generation will change, i.e.
+    missing or outside 5-8 seconds.
+
+    Returns:
+        list: Human-readable notes; empty if every usable duration is used as given.
+    """
+    if not isinstance(scene_prompts, list):
+        return []
+
+    deviations = []
+    for scene_index, scene in enumerate(scene_prompts):
+        if not isinstance(scene, dict):
+            continue
+        duration = _normalized_scene_duration(scene)
+        if duration is not None and scene.get('scene_duration') != duration:
+            deviations.append(f"Scene {scene_index + 1} scene_duration "
+                              f"{scene.get('scene_duration')!r} becomes {duration}s.")
+    return deviations
+
+
+def warm_up():
+    """
+    Pays cold-start costs ahead of the first user request: initializes Vertex AI, builds
+    the cached Gemini model, creates the shared Google Cloud clients and, if
+    `gemini.warm_up_request` is set, sends one tiny request to open the connection.
+    """
+    model = _create_model(get_settings())
+    get_genai_client()
+    get_storage_client()
+    if load_config()["gemini"].get("warm_up_request", False):
+        model.generate_content("Reply with an empty JSON object.")
+    logger.info("Backend warm-up complete")
+
+
 def get_scene_prompts(ad_idea: str) -> list:
+    """
+    Generates Veo-ready scene prompts using the pipeline set by `gemini.pipeline`:
+    "two_step" (script, then Veo prompts) or "single_call" (one structured call).
+
+    Args:
+        ad_idea (str): The user-provided ad idea or story.
+
+    Returns:
+        list: A scene-wise descriptive ad prompts.
+    """
+    pipeline = load_config()["gemini"].get("pipeline", "two_step")
+    if pipeline == "single_call":
+        return get_scene_prompts_single_call(ad_idea)
+    if pipeline == "two_step":
+        return get_scene_prompts_two_step(ad_idea)
+    raise ValueError(f"Unknown scene prompt pipeline: {pipeline}")
+
+
+def get_scene_prompts_single_call(ad_idea: str) -> list:
+    """
+    Produces the final Veo-ready scene list in one Gemini call constrained by
+    `scene_list_response_schema`, skipping the intermediate script.
+
+    Args:
+        ad_idea (str): The user-provided ad idea or story.
+
+    Returns:
+        list: A scene-wise descriptive ad prompts.
+    """
+    settings = get_settings()
+    model = _create_model(settings, generation_config=scene_list_generation_config)
+    logger.info("Generating veo compatible prompts in a single structured call")
+    scene_list_prompt = generate_veo_scene_list_prompt(
+        ad_idea=ad_idea, example_prompts=settings.veo.prompts, max_scenes=4, ad_duration_sec=15)
+    return json.loads(call_gemini(model=model, prompt=scene_list_prompt))
+
+
+def iter_scene_prompts_single_call(ad_idea: str) -> Iterator[Tuple[int, dict]]:
+    """
+    Streams the single structured call and yields each scene as soon as it is parsed.
+
+    Yields:
+        Tuples of (scene_index, {'prompt': ..., 'scene_duration': ...}) in scene order.
+    """
+    settings = get_settings()
+    model = _create_model(settings, generation_config=scene_list_generation_config)
+    logger.info("Streaming veo compatible prompts from a single structured call")
+    scene_list_prompt = generate_veo_scene_list_prompt(
+        ad_idea=ad_idea, example_prompts=settings.veo.prompts, max_scenes=4, ad_duration_sec=15)
+
+    parser = IncrementalJSONArrayParser()
+    scene_index = 0
+    for text_chunk in call_gemini_stream(model=model, prompt=scene_list_prompt):
+        for scene_prompt in parser.feed(text_chunk):
+            yield scene_index, _checked_scene(scene_index, scene_prompt)
+            scene_index += 1
+    if not parser.finished:
+        raise ValueError("Gemini response ended before the scene prompt list was complete.")
+
+
+def get_scene_prompts_two_step(ad_idea: str) -> list:
     """
     Calls Gemini to generate a detailed descriptive script for the ad.
     Prompts Gemini to create an elaborate story from a basic ad idea,
@@ -60,42 +368,224 @@ def get_scene_prompts(ad_idea: str) -> list:
     Returns:
         list: A scene-wise descriptive ad prompts.
     """
-    config = load_config()
-    model = GenerativeModel(
-        model_name=config["gemini"]["model_name"],
-        safety_settings=safety_config,
-        generation_config=GenerationConfig(
-            response_mime_type="application/json",
-            # response_schema=response_schema
-        )
-    )
+    settings = get_settings()
+    model = _create_model(settings)
 
     # Generate Ad script
-    import time
-    t1 = time.time()
-    logging.info("Generating Ad script")
+    logger.info("Generating Ad script")
     script_prompt = generate_script_prompt(ad_idea=ad_idea, max_scenes=4, ad_duration_sec=15)
     generated_script = call_gemini(model=model, prompt=script_prompt)
     generated_script_json = json.loads(generated_script)
-    logging.debug(f"\ngenerated_script_json: \n{json.dumps(generated_script_json)}")
-    print("time taken: ", time.time() - t1)
+    logger.debug(f"\ngenerated_script_json: \n{json.dumps(generated_script_json)}")
 
     # TODO: Add last scene consistency logic using image
 
     # Generate veo compatible prompts
-    t2 = time.time()
-    logging.info("Generating veo compatible prompts for each scene")
-    few_shot_prompts = config["veo"]["prompts"]
+    logger.info("Generating veo compatible prompts for each scene")
+    few_shot_prompts = settings.veo.prompts
     generate_veo_prompts_prompt = generate_veo_compatible_prompt(
         input_script_data=generated_script_json,
         example_prompts=few_shot_prompts)
     generated_veo_prompts = call_gemini(model=model, prompt=generate_veo_prompts_prompt)
     generated_veo_prompts_list = json.loads(generated_veo_prompts)
-
-    for prompt in generated_veo_prompts_list:
-        print(prompt)
-        print("-" * 100)
-    print("time taken: ", time.time() - t2)
-    print("total time taken: ", time.time() - t1)
+    logger.debug(f"\ngenerated_veo_prompts: \n{json.dumps(generated_veo_prompts_list)}")
 
     return generated_veo_prompts_list
+
+
+def get_prompt_variants(scene_prompt: str, count: int = 2) -> list:
+    """
+    Proposes refined alternatives of a scene's Veo prompt that keep its content but vary
+    camera, lighting or mood.
+
+    Args:
+        scene_prompt (str): The Veo prompt of the scene.
+        count (int): Number of variants to propose.
+
+    Returns:
+        list: Up to `count` distinct variant prompts, none equal to `scene_prompt`.
+    """
+    settings = get_settings()
+    model = _create_model(settings, generation_config=prompt_variants_generation_config)
+    variants = json.loads(call_gemini(model=model, prompt=generate_prompt_variants_prompt(scene_prompt, count)))
+    unique_variants = []
+    for variant in variants:
+        if isinstance(variant, str) and variant.strip() and variant.strip() != scene_prompt.strip():
+            if variant.strip() not in unique_variants:
+                unique_variants.append(variant.strip())
+    return unique_variants[:count]
+
+
+def _parse_scene_veo_prompt(text: str) -> dict:
+    """
+    Parses Gemini's rewrite of a single scene: one {'prompt', 'scene_duration'} object,
+    possibly wrapped in a one-element list.
+
+    Raises:
+        ValueError: If the response is not JSON or holds no prompt object.
+    """
+    generated = json.loads(text)
+    veo_prompt = generated[0] if isinstance(generated, list) and generated else generated
+    if not isinstance(veo_prompt, dict) or not isinstance(veo_prompt.get('prompt'), str):
+        raise ValueError(f"Expected a Veo prompt object, got: {text[:200]!r}")
+    return veo_prompt
+
+
+async def _generate_scene_veo_prompt(model, scene_index: int, scene: dict, visual_elements: list,
+                                     example_prompts: list) -> Tuple[int, dict]:
+    """Rewrites a single script scene into a Veo-ready prompt."""
+    scene_prompt = generate_veo_compatible_prompt(
+        input_script_data={'scenes': [scene], 'visual_elements': visual_elements},
+        example_prompts=example_prompts)
+    text = await call_gemini_async(model=model, prompt=scene_prompt, validate=_parse_scene_veo_prompt)
+    try:
+        veo_prompt = _parse_scene_veo_prompt(text)
+    except ValueError as e:
+        raise ValueError(f"Gemini returned an unusable Veo prompt for scene {scene_index + 1}: {e}") from e
+    veo_prompt.setdefault('scene_duration', scene.get('scene_duration_sec', 5))
+    return scene_index, _checked_scene(scene_index, veo_prompt)
+
+
+async def iter_scene_prompts_async(ad_idea: str) -> AsyncIterator[Tuple[int, dict]]:
+    """
+    Generates the ad script, then rewrites every scene into a Veo prompt concurrently.
+
+    Unlike `get_scene_prompts`, each scene gets its own Gemini call, and scenes are
+    yielded as soon as their prompt is ready, so callers can start video generation
+    for early scenes while later ones are still being written. Run it on the shared loop
+    from `clients.get_event_loop`, which the cached Gemini models are bound to.
+
+    Args:
+        ad_idea (str): The user-provided ad idea or story.
+
+    Yields:
+        Tuples of (scene_index, {'prompt': ..., 'scene_duration': ...}) in completion order.
+    """
+    settings = get_settings()
+    model = _create_model(settings)
+
+    logger.info("Generating Ad script")
+    script_prompt = generate_script_prompt(ad_idea=ad_idea, max_scenes=4, ad_duration_sec=15)
+    generated_script_json = json.loads(await call_gemini_async(model=model, prompt=script_prompt))
+
+    scenes = generated_script_json.get('scenes', [])
+    visual_elements = generated_script_json.get('visual_elements', [])
+    logger.info(f"Generating veo compatible prompts for {len(scenes)} scenes concurrently")
+    tasks = [
+        asyncio.create_task(_generate_scene_veo_prompt(
+            model, scene_index, scene, visual_elements, settings.veo.prompts))
+        for scene_index, scene in enumerate(scenes)
+    ]
+    try:
+        for next_completed in asyncio.as_completed(tasks):
+            yield await next_completed
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def get_scene_prompts_async(ad_idea: str) -> list:
+    """
+    Async variant of `get_scene_prompts` that rewrites scenes concurrently. Like
+    `iter_scene_prompts_async`, it must run on the shared loop from `clients.get_event_loop`.
+
+    Returns:
+        list: A scene-wise descriptive ad prompts, in scene order.
+    """
+    scene_prompts = {}
+    async for scene_index, scene_prompt in iter_scene_prompts_async(ad_idea):
+        scene_prompts[scene_index] = scene_prompt
+    return [scene_prompts[scene_index] for scene_index in sorted(scene_prompts)]
+
+
+def iter_scene_prompts_streaming(ad_idea: str) -> Iterator[Tuple[int, dict]]:
+    """
+    Generates the ad script, then streams the Veo prompts for all scenes from one Gemini call.
+
+    The streamed JSON array is parsed incrementally, so each scene is yielded as soon as
+    its object closes instead of after the whole response has been generated.
+
+    Args:
+        ad_idea (str): The user-provided ad idea or story.
+
+    Yields:
+        Tuples of (scene_index, {'prompt': ..., 'scene_duration': ...}) in scene order.
+    """
+    settings = get_settings()
+    model = _create_model(settings)
+
+    logger.info("Generating Ad script")
+    script_prompt = generate_script_prompt(ad_idea=ad_idea, max_scenes=4, ad_duration_sec=15)
+    generated_script_json = json.loads(call_gemini(model=model, prompt=script_prompt))
+
+    logger.info("Streaming veo compatible prompts for each scene")
+    generate_veo_prompts_prompt = generate_veo_compatible_prompt(
+        input_script_data=generated_script_json,
+        example_prompts=settings.veo.prompts)
+
+    parser = IncrementalJSONArrayParser()
+    scene_index = 0
+    for text_chunk in call_gemini_stream(model=model, prompt=generate_veo_prompts_prompt):
+        for scene_prompt in parser.feed(text_chunk):
+            yield scene_index, _checked_scene(scene_index, scene_prompt)
+            scene_index += 1
+    if not parser.finished:
+        raise ValueError("Gemini response ended before the scene prompt list was complete.")
+
+
+def _iter_scene_prompts_concurrent(ad_idea: str) -> Iterator[Tuple[int, dict]]:
+    """
+    Synchronous bridge over `iter_scene_prompts_async` for callers such as Streamlit scripts.
+
+    The async generator runs on the shared Gemini event loop (see `clients.get_event_loop`);
+    scenes are handed back through a queue as they become ready.
+
+    Yields:
+        Tuples of (scene_index, {'prompt': ..., 'scene_duration': ...}) in completion order.
+    """
+    items = queue.Queue()
+    done = object()
+
+    async def produce():
+        try:
+            async for item in iter_scene_prompts_async(ad_idea):
+                items.put(item)
+            items.put(done)
+        except Exception as e:
+            items.put(e)
+
+    future = run_coroutine(produce())
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Stops the remaining Gemini calls if the caller abandons the iterator early
+        future.cancel()
+
+
+def iter_scene_prompts(ad_idea: str) -> Iterator[Tuple[int, dict]]:
+    """
+    Yields scene prompts progressively.
+
+    With `gemini.pipeline` set to "single_call" the structured call is streamed. For the
+    two-step pipeline, `gemini.scene_prompt_mode` picks "concurrent" (one async Gemini
+    call per scene) or "streaming" (all scenes streamed from one call).
+
+    Yields:
+        Tuples of (scene_index, {'prompt': ..., 'scene_duration': ...}).
+    """
+    gemini_config = load_config()["gemini"]
+    if gemini_config.get("pipeline", "two_step") == "single_call":
+        return iter_scene_prompts_single_call(ad_idea)
+
+    mode = gemini_config.get("scene_prompt_mode", "concurrent")
+    if mode == "streaming":
+        return iter_scene_prompts_streaming(ad_idea)
+    if mode == "concurrent":
+        return _iter_scene_prompts_concurrent(ad_idea)
+    raise ValueError(f"Unknown scene prompt mode: {mode}")
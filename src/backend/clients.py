@@ -0,0 +1,197 @@
+"""Process-wide Google Cloud clients"""
+import json
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Coroutine, Optional, Tuple
+
+import google.auth
+import vertexai
+from google import genai
+from google.auth.transport.requests import AuthorizedSession
+from google.cloud import storage
+from requests.adapters import HTTPAdapter
+from vertexai.generative_models import GenerativeModel
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_CLOUD_PLATFORM_SCOPE = "https://www.googleapis.com/auth/cloud-platform"
+
+_lock = threading.Lock()
+_storage_client = None
+_genai_client = None
+_vertexai_initialized = False
+_event_loop = None
+_generative_models = {}
+_generative_model_specs = {}  # id(model) -> (model_name, generation_config dict)
+_model_factory = GenerativeModel
+
+
+def _load_config() -> dict:
+    # Imported lazily: utils uses this module for its GCS helpers
+    from src.backend.utils import load_config
+    return load_config()
+
+
+def _load_settings():
+    # Imported lazily for the same reason: settings builds on utils
+    from src.backend.settings import get_settings
+    return get_settings()
+
+
+def _create_storage_client() -> storage.Client:
+    config = _load_config()
+    gcs_config = config.get("gcs", {})
+    pool_size = gcs_config.get("http_pool_maxsize", 32)
+
+    credentials, _ = google.auth.default(scopes=[_CLOUD_PLATFORM_SCOPE])
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+
+    logger.info(f"Creating shared storage client with HTTP pool size {pool_size}.")
+    return storage.Client(project=_load_settings().project.id, credentials=credentials, _http=session)
+
+
+def _create_genai_client() -> genai.Client:
+    project = _load_settings().project
+    logger.info("Creating shared genai client.")
+    return genai.Client(
+        vertexai=True,
+        project=project.id,
+        location=project.region,
+    )
+
+
+def get_storage_client() -> storage.Client:
+    """
+    Returns the process-wide GCS client, creating it on first use.
+
+    The client shares one authorized HTTP session whose connection pool is sized by
+    `gcs.http_pool_maxsize`, so concurrent uploads, downloads and signing reuse connections.
+    """
+    global _storage_client
+    if _storage_client is None:
+        with _lock:
+            if _storage_client is None:
+                _storage_client = _create_storage_client()
+    return _storage_client
+
+
+def get_genai_client() -> genai.Client:
+    """Returns the process-wide Vertex AI genai client, creating it on first use."""
+    global _genai_client
+    if _genai_client is None:
+        with _lock:
+            if _genai_client is None:
+                _genai_client = _create_genai_client()
+    return _genai_client
+
+
+def set_storage_client(client):
+    """Replaces the shared GCS client, e.g. with a local fake. Pass None to recreate it lazily."""
+    global _storage_client
+    with _lock:
+        _storage_client = client
+
+
+def set_genai_client(client):
+    """Replaces the shared genai client, e.g. with a local fake. Pass None to recreate it lazily."""
+    global _genai_client
+    with _lock:
+        _genai_client = client
+
+
+def init_vertexai():
+    """Initializes the Vertex AI SDK once per process with the project and region from config."""
+    global _vertexai_initialized
+    if _vertexai_initialized:
+        return
+    with _lock:
+        if not _vertexai_initialized:
+            project = _load_settings().project
+            vertexai.init(project=project.id, location=project.region)
+            _vertexai_initialized = True
+            logger.info("Initialized Vertex AI SDK.")
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns the process-wide event loop for async Gemini calls, running on a daemon thread.
+
+    A shared GenerativeModel binds its async gRPC channel to the loop that first uses it,
+    so every async call on the shared models must run on this one long-lived loop rather
+    than on a fresh `asyncio.run` loop per request.
+    """
+    global _event_loop
+    if _event_loop is None:
+        with _lock:
+            if _event_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="gemini-async", daemon=True).start()
+                _event_loop = loop
+                logger.info("Started shared event loop for async Gemini calls.")
+    return _event_loop
+
+
+def run_coroutine(coroutine: Coroutine) -> Future:
+    """Schedules a coroutine on the shared event loop from any thread and returns its future."""
+    return asyncio.run_coroutine_threadsafe(coroutine, get_event_loop())
+
+
+def _to_cache_key(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, (list, tuple)):
+        return json.dumps([_to_cache_key(item) for item in value])
+    if hasattr(value, "to_dict"):
+        value = value.to_dict()
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+def get_generative_model(model_name: str, generation_config=None, safety_settings=None) -> GenerativeModel:
+    """
+    Returns a configured GenerativeModel, constructed once per process for each
+    (model_name, generation_config, safety_settings) combination.
+    """
+    key = (model_name, _to_cache_key(generation_config), _to_cache_key(safety_settings))
+    model = _generative_models.get(key)
+    if model is not None:
+        return model
+
+    init_vertexai()
+    with _lock:
+        if key not in _generative_models:
+            model = _model_factory(
+                model_name=model_name,
+                generation_config=generation_config,
+                safety_settings=safety_settings,
+            )
+            _generative_models[key] = model
+            _generative_model_specs[id(model)] = (model_name, json.loads(_to_cache_key(generation_config)))
+            logger.info(f"Created generative model {model_name}.")
+        return _generative_models[key]
+
+
+def get_generative_model_spec(model) -> Tuple[Optional[str], Optional[dict]]:
+    """
+    Returns the (model_name, generation_config) a model from `get_generative_model` was
+    built with, with the config as a plain dict; (None, None) for any other model.
+    """
+    return _generative_model_specs.get(id(model), (None, None))
+
+
+def set_model_factory(factory):
+    """
+    Replaces the callable used to build generative models, e.g. with a local fake, and
+    drops already-built models. Pass None to restore GenerativeModel.
+    """
+    global _model_factory, _vertexai_initialized
+    with _lock:
+        _model_factory = factory or GenerativeModel
+        # Fakes don't need the SDK; real models re-run init on next use
+        _vertexai_initialized = factory is not None
+        _generative_models.clear()
+        _generative_model_specs.clear()
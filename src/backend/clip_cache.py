@@ -0,0 +1,215 @@
+"""Content-addressed cache for Veo clip generation results"""
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional, List, Dict
+
+from src.backend.clients import get_storage_client
+from src.backend.utils import load_config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def clip_cache_key(
+        model_name: str,
+        prompt: str,
+        negative_prompt: Optional[str],
+        aspect_ratio: str,
+        duration_seconds: int,
+        person_generation: str,
+        image_gcs_uri: Optional[str],
+        number_of_videos: int,
+) -> str:
+    """
+    Builds the cache key for a Veo request: a SHA-256 over every input that affects the output.
+
+    Returns:
+        str: Hex digest identifying the request.
+    """
+    payload = json.dumps({
+        'model_name': model_name,
+        'prompt': prompt,
+        'negative_prompt': negative_prompt or None,
+        'aspect_ratio': aspect_ratio,
+        'duration_seconds': duration_seconds,
+        'person_generation': person_generation,
+        'image_gcs_uri': image_gcs_uri or None,
+        'number_of_videos': number_of_videos,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ClipCache(ABC):
+    """Interface for clip cache backends. Values are lists of {'gs_uri', 'http_url'} dicts."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[List[Dict[str, str]]]:
+        ...
+
+    @abstractmethod
+    def put(self, key: str, clips: List[Dict[str, str]]):
+        ...
+
+
+class NullClipCache(ClipCache):
+    """Backend used when caching is disabled."""
+
+    def get(self, key: str) -> Optional[List[Dict[str, str]]]:
+        return None
+
+    def put(self, key: str, clips: List[Dict[str, str]]):
+        pass
+
+
+class SQLiteClipCache(ClipCache):
+    """
+    Clip cache stored in a local SQLite file.
+
+    Entries older than `ttl_sec` are treated as misses and purged. When more than
+    `max_entries` are stored, the least recently used entries are evicted.
+    """
+
+    def __init__(self, db_path: str, ttl_sec: float = None, max_entries: int = None):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._ttl_sec = ttl_sec
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS clips (
+                    key TEXT PRIMARY KEY,
+                    clips TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL
+                )
+            """)
+
+    def get(self, key: str) -> Optional[List[Dict[str, str]]]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT clips, created_at FROM clips WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self._ttl_sec and now - row[1] > self._ttl_sec:
+                self._conn.execute("DELETE FROM clips WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE clips SET last_used_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, key: str, clips: List[Dict[str, str]]):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO clips VALUES (?, ?, ?, ?)", (key, json.dumps(clips), now, now)
+            )
+            if self._ttl_sec:
+                self._conn.execute("DELETE FROM clips WHERE created_at < ?", (now - self._ttl_sec,))
+            if self._max_entries:
+                self._conn.execute("""
+                    DELETE FROM clips WHERE key NOT IN (
+                        SELECT key FROM clips ORDER BY last_used_at DESC LIMIT ?
+                    )
+                """, (self._max_entries,))
+
+
+class GCSClipCache(ClipCache):
+    """
+    Clip cache stored as one JSON object per key under a GCS prefix.
+
+    Shared by every instance of the service. TTL is checked against the time stored in
+    each entry. Size eviction lists the whole prefix, so instead of running on every put
+    it runs in the background at most once per `eviction_interval_sec`, deleting the oldest
+    objects beyond `max_entries`.
+    """
+
+    def __init__(self, index_uri: str, ttl_sec: float = None, max_entries: int = None,
+                 eviction_interval_sec: float = 600):
+        bucket_name, _, prefix = index_uri.replace("gs://", "", 1).partition('/')
+        self._bucket = get_storage_client().bucket(bucket_name)
+        self._prefix = prefix.rstrip('/')
+        self._ttl_sec = ttl_sec
+        self._max_entries = max_entries
+        self._eviction_interval_sec = eviction_interval_sec
+        self._lock = threading.Lock()
+        self._evicting = False
+        self._last_eviction = 0.0
+
+    def _blob_name(self, key: str) -> str:
+        return f"{self._prefix}/{key}.json"
+
+    def get(self, key: str) -> Optional[List[Dict[str, str]]]:
+        blob = self._bucket.blob(self._blob_name(key))
+        try:
+            entry = json.loads(blob.download_as_text())
+        except Exception:
+            return None
+        if self._ttl_sec and time.time() - entry['created_at'] > self._ttl_sec:
+            blob.delete()
+            return None
+        return entry['clips']
+
+    def put(self, key: str, clips: List[Dict[str, str]]):
+        entry = {'clips': clips, 'created_at': time.time()}
+        self._bucket.blob(self._blob_name(key)).upload_from_string(
+            json.dumps(entry), content_type="application/json"
+        )
+        if self._max_entries:
+            self._schedule_eviction()
+
+    def _schedule_eviction(self):
+        now = time.time()
+        with self._lock:
+            if self._evicting or now - self._last_eviction < self._eviction_interval_sec:
+                return
+            self._evicting = True
+            self._last_eviction = now
+        threading.Thread(target=self._evict, name="clip-cache-eviction", daemon=True).start()
+
+    def _evict(self):
+        try:
+            blobs = sorted(self._bucket.list_blobs(prefix=f"{self._prefix}/"), key=lambda b: b.updated)
+            excess = blobs[:max(0, len(blobs) - self._max_entries)]
+            for blob in excess:
+                blob.delete()
+            if excess:
+                logger.info(f"Evicted {len(excess)} clip cache entries.")
+        except Exception as e:
+            logger.warning(f"Clip cache eviction failed: {e}")
+        finally:
+            with self._lock:
+                self._evicting = False
+
+
+_clip_cache = None
+_clip_cache_lock = threading.Lock()
+
+
+def get_clip_cache() -> ClipCache:
+    """Returns the process-wide clip cache backend selected by `clip_cache.backend` in the config."""
+    global _clip_cache
+    with _clip_cache_lock:
+        if _clip_cache is None:
+            cache_config = load_config().get("clip_cache", {})
+            backend = cache_config.get("backend", "sqlite")
+            ttl_sec = cache_config.get("ttl_sec")
+            max_entries = cache_config.get("max_entries")
+            if backend == "sqlite":
+                _clip_cache = SQLiteClipCache(
+                    cache_config.get("sqlite_path", "/tmp/adgen/clip_cache.sqlite"), ttl_sec, max_entries
+                )
+            elif backend == "gcs":
+                _clip_cache = GCSClipCache(cache_config["gcs_index_uri"], ttl_sec, max_entries,
+                                           cache_config.get("eviction_interval_sec", 600))
+            elif backend == "none":
+                _clip_cache = NullClipCache()
+            else:
+                raise ValueError(f"Unknown clip cache backend: {backend}")
+            logger.info(f"Using {type(_clip_cache).__name__} for Veo clip results.")
+    return _clip_cache
@@ -0,0 +1,577 @@
+"""Background job engine for Veo video generation"""
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from collections import Counter, deque
+from pathlib import Path
+from typing import Callable, Optional, Dict, Any, List
+
+from src.backend import polling
+from src.backend import previews
+from src.backend import quota
+from src.backend import video_ops
+from src.backend.settings import get_settings
+from src.backend.utils import load_config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+# Job priorities: queued user jobs always start before speculative ones
+PRIORITY_USER = 0
+PRIORITY_SPECULATIVE = 1
+
+_COLUMNS = ("job_id", "owner", "params", "status", "operation_name", "result", "error", "created_at",
+            "updated_at", "priority", "labels")
+
+# Finished jobs stay in memory this long, then are only read back from SQLite
+_MEMORY_RETENTION_SEC = 3600
+# How often the worker drops expired finished jobs
+_PRUNE_INTERVAL_SEC = 600
+
+
+class _JobStore:
+    """SQLite persistence for jobs, so in-flight Veo operations survive a process restart."""
+
+    def __init__(self, db_path: str):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    owner TEXT,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    operation_name TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    labels TEXT
+                )
+            """)
+            columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if 'priority' not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN priority INTEGER NOT NULL DEFAULT 0")
+            if 'labels' not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN labels TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_owner ON jobs (owner, created_at)")
+
+    def save(self, job: Dict[str, Any]):
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO jobs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                (job['job_id'], job['owner'], json.dumps(job['params']), job['status'],
+                 job['operation_name'], json.dumps(job['result']), job['error'],
+                 job['created_at'], job['updated_at'], job['priority'], json.dumps(job['labels']))
+            )
+
+    def load_unfinished(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def load_for_owner(self, owner: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE owner = ? ORDER BY created_at", (owner,)
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def delete_finished_before(self, cutoff: float) -> int:
+        with self._lock, self._conn:
+            return self._conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED_STATUSES))}) AND updated_at < ?",
+                (*FINISHED_STATUSES, cutoff)
+            ).rowcount
+
+    @staticmethod
+    def _row_to_job(row) -> Dict[str, Any]:
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        job['labels'] = json.loads(job['labels']) if job['labels'] else {}
+        return job
+
+
+class JobManager:
+    """
+    Owns Veo long-running operations on a single background thread.
+
+    Streamlit script runs only call `submit`, `poll` and `cancel`; none of them block
+    on Veo. The worker thread starts queued jobs while fewer than `max_in_flight`
+    operations are running, and checks all running operations that are due in a
+    single pass as scheduled by a `polling.PollScheduler`.
+
+    Queued user jobs start before speculative ones. Within a priority, the next job
+    belongs to the owner with the fewest running operations, earliest submission first,
+    so one session submitting many scenes cannot starve the others. Speculative jobs only
+    start when no user job is waiting, and at most `max_speculative_in_flight` of them run
+    at once, so speculation never delays what a user asked for by more than those slots.
+
+    Finished jobs are kept in SQLite for `retention_sec`, so a reloaded page can find its
+    session's results with `list_for_owner`.
+
+    Every start is admitted by a `quota.QuotaScheduler` shared with the rest of the process
+    (and with other workers, if it is backed by a lease file). A start rejected with 429 puts
+    the job back at the head of the queue instead of failing it.
+    """
+
+    def __init__(self, db_path: str, max_in_flight: int = 4, max_poll_errors: int = 8,
+                 max_speculative_in_flight: int = 1, quota_scheduler: quota.QuotaScheduler = None,
+                 retention_sec: float = 7 * 86400):
+        self._store = _JobStore(db_path)
+        self._max_in_flight = max(1, int(max_in_flight))
+        self._max_speculative_in_flight = max(0, int(max_speculative_in_flight))
+        self._max_poll_errors = max_poll_errors
+        self._quota = quota_scheduler
+        self._quota_retry_at = 0.0
+        self._retention_sec = retention_sec
+        self._last_prune = 0.0
+        self._prune_callbacks: List[Callable[[], None]] = []
+        self._scheduler = polling.create_scheduler()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._queue: List[str] = []
+        self._queue_positions: Optional[Dict[str, int]] = None  # job_id -> 1-based start position
+        self._operations: Dict[str, Any] = {}
+        self._thread = None
+
+        for job in self._store.load_unfinished():
+            self._jobs[job['job_id']] = job
+            if job['status'] == RUNNING and job['operation_name']:
+                self._operations[job['job_id']] = job['operation_name']
+                self._track(job, started_at=job['updated_at'])
+                logger.info(f"Resuming job {job['job_id']} for operation {job['operation_name']}")
+            else:
+                job['status'] = QUEUED
+                self._queue.append(job['job_id'])
+
+    def start(self):
+        """Starts the background worker thread if it is not already running."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="veo-jobs", daemon=True)
+                self._thread.start()
+
+    def submit(self, params: Dict[str, Any], owner: str = None, bypass_cache: bool = False,
+               priority: int = PRIORITY_USER, labels: Dict[str, Any] = None) -> str:
+        """
+        Queues a video generation job.
+
+        If identical params were generated before and `bypass_cache` is False, the job
+        completes immediately with the cached clips and no Veo operation is started.
+
+        Args:
+            params: Keyword arguments accepted by `video_ops.start_video_generation`.
+            owner: Optional identifier of the submitting session.
+            bypass_cache: If True, always start a fresh Veo operation.
+            priority: PRIORITY_USER, or PRIORITY_SPECULATIVE for jobs nobody is waiting on yet.
+            labels: Optional JSON-serializable data stored with the job, e.g. the scene it belongs to.
+
+        Returns:
+            str: The job id.
+        """
+        now = time.time()
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'owner': owner,
+            'params': params,
+            'status': QUEUED,
+            'operation_name': None,
+            'result': None,
+            'error': None,
+            'created_at': now,
+            'updated_at': now,
+            'priority': priority,
+            'labels': labels or {},
+        }
+        cached_clips = None if bypass_cache else video_ops.get_cached_clips(params)
+        with self._lock:
+            self._jobs[job['job_id']] = job
+            if cached_clips:
+                self._finish(job, SUCCEEDED, result=cached_clips)
+            else:
+                self._queue.append(job['job_id'])
+                self._queue_positions = None
+                self._store.save(job)
+        if cached_clips:
+            previews.submit_previews(cached_clips)
+            logger.info(f"Job {job['job_id']} served from clip cache")
+            return job['job_id']
+        logger.info(f"Submitted job {job['job_id']}")
+        self._wakeup.set()
+        return job['job_id']
+
+    def poll(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns a snapshot of a job's state, or None if the job id is unknown.
+
+        The snapshot contains 'status', 'result' (list of clip dicts once succeeded),
+        'error' (message once failed) and 'queue_position' (1-based place in the start
+        order while queued, else None).
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job, queue_position=self._queue_position_map().get(job_id))
+        job = self._store.load(job_id)
+        return dict(job, queue_position=None) if job else None
+
+    def list_for_owner(self, owner: str) -> List[Dict[str, Any]]:
+        """
+        Returns snapshots of every job an owner submitted that is still retained, oldest first.
+
+        Lets a session that lost its state, e.g. after a page reload, find its jobs again.
+        """
+        stored_jobs = self._store.load_for_owner(owner)
+        return [self.poll(job['job_id']) or dict(job, queue_position=None) for job in stored_jobs]
+
+    def promote(self, job_id: str) -> bool:
+        """
+        Raises a speculative job to user priority, e.g. once a user picks its result.
+
+        A job that already succeeded is promoted too, so the choice is recorded and
+        `list_for_owner` reports it as the user's job after a reload. The time of the
+        promotion is kept as the 'promoted_at' label.
+
+        Returns:
+            bool: True if the job was promoted, False if it was unknown, failed or cancelled.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id) or self._store.load(job_id)
+            if job is None or job['status'] in (FAILED, CANCELLED):
+                return False
+            job['priority'] = PRIORITY_USER
+            job['labels'] = dict(job['labels'], promoted_at=time.time())
+            self._queue_positions = None
+            self._store.save(job)
+        logger.info(f"Promoted job {job_id} to user priority")
+        self._wakeup.set()
+        return True
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancels a queued or running job. A Veo operation that has already been
+        submitted keeps running remotely, but its result is discarded.
+
+        Returns:
+            bool: True if the job was cancelled, False if it was unknown or already finished.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] in FINISHED_STATUSES:
+                return False
+            if job_id in self._queue:
+                self._queue.remove(job_id)
+            was_running = self._operations.pop(job_id, None) is not None
+            self._queue_positions = None
+            poll_stats = self._scheduler.untrack(job_id)
+            queue_sec = self._queue_seconds(job)
+            self._finish(job, CANCELLED)
+        if was_running:
+            self._release_quota(job_id)
+        if poll_stats is not None:
+            video_ops.record_video_operation(job['params'], "cancelled", poll_stats, queue_sec)
+        logger.info(f"Cancelled job {job_id}")
+        # A freed slot may let a queued job start
+        self._wakeup.set()
+        return True
+
+    def _finish(self, job: Dict[str, Any], status: str, result: list = None, error: str = None):
+        # Called with the lock held; callers submit previews of the result after releasing it
+        job['status'] = status
+        job['result'] = result
+        job['error'] = error
+        job['updated_at'] = time.time()
+        self._store.save(job)
+
+    def _release_quota(self, job_id: str):
+        # Quota state may live in a shared SQLite file, so never call this with the lock held
+        if self._quota:
+            self._quota.release(job_id)
+
+    @staticmethod
+    def _queue_seconds(job: Dict[str, Any]) -> float:
+        # While a job is running, updated_at holds the time its operation was submitted
+        return job['updated_at'] - job['created_at']
+
+    def _track(self, job: Dict[str, Any], started_at: float = None):
+        self._scheduler.track(
+            job['job_id'],
+            job['params'].get('duration_seconds'),
+            job['params'].get('aspect_ratio'),
+            started_at=started_at,
+        )
+
+    def _run(self):
+        while True:
+            try:
+                if time.time() - self._last_prune >= _PRUNE_INTERVAL_SEC:
+                    self._prune()
+                if self._quota:
+                    with self._lock:
+                        running_job_ids = list(self._operations)
+                    self._quota.renew(running_job_ids)
+                self._start_queued_jobs()
+                self._check_running_jobs()
+            except Exception as e:
+                logger.error(f"Unexpected error in job worker: {e}")
+            # Sleep until the next scheduled poll, until quota may be available again
+            # for a waiting job, or until a new job is submitted
+            timeout = self._scheduler.next_due_in()
+            with self._lock:
+                if self._queue and self._quota_retry_at:
+                    quota_wait = max(0.0, self._quota_retry_at - time.time())
+                    timeout = quota_wait if timeout is None else min(timeout, quota_wait)
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+    def add_prune_callback(self, callback: Callable[[], None]):
+        """
+        Runs `callback` on the worker thread after every prune pass, so other per-session
+        state can expire on the same schedule as the jobs.
+        """
+        with self._lock:
+            self._prune_callbacks.append(callback)
+
+    def _prune(self):
+        """Forgets finished jobs: from memory after an hour, from SQLite after `retention_sec`."""
+        now = time.time()
+        self._last_prune = now
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job['status'] in FINISHED_STATUSES and job['updated_at'] < now - _MEMORY_RETENTION_SEC]
+            for job_id in expired:
+                del self._jobs[job_id]
+        deleted = self._store.delete_finished_before(now - self._retention_sec)
+        if expired or deleted:
+            logger.info(f"Pruned {len(expired)} finished jobs from memory and {deleted} from the job store")
+        with self._lock:
+            callbacks = list(self._prune_callbacks)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Prune callback failed: {e}")
+
+    def _queue_order(self) -> List[str]:
+        """Returns the queued job ids in the order they would start. Called with the lock held."""
+        running = Counter(self._jobs[job_id]['owner'] for job_id in self._operations)
+        order = []
+        for priority in sorted({self._jobs[job_id]['priority'] for job_id in self._queue}):
+            by_owner: Dict[Optional[str], deque] = {}
+            for job_id in self._queue:
+                if self._jobs[job_id]['priority'] == priority:
+                    by_owner.setdefault(self._jobs[job_id]['owner'], deque()).append(job_id)
+            while by_owner:
+                owner = min(by_owner, key=lambda o: (running[o], self._jobs[by_owner[o][0]]['created_at']))
+                order.append(by_owner[owner].popleft())
+                running[owner] += 1
+                if not by_owner[owner]:
+                    del by_owner[owner]
+        return order
+
+    def _queue_position_map(self) -> Dict[str, int]:
+        """
+        Returns the 1-based start position of every queued job. Called with the lock held.
+
+        The order is computed at most once per change to the queue or the running jobs,
+        so polling every queued job doesn't rebuild it for each of them.
+        """
+        if self._queue_positions is None:
+            self._queue_positions = {job_id: position for position, job_id in enumerate(self._queue_order(), 1)}
+        return self._queue_positions
+
+    def _next_queued_job_id(self) -> Optional[str]:
+        # Called with the lock held
+        if len(self._operations) >= self._max_in_flight:
+            return None
+        order = list(self._queue_position_map())  # Built in start order
+        for job_id in order:
+            if self._jobs[job_id]['priority'] == PRIORITY_USER:
+                return job_id
+        speculative_in_flight = sum(1 for job_id in self._operations
+                                    if self._jobs[job_id]['priority'] != PRIORITY_USER)
+        if order and speculative_in_flight < self._max_speculative_in_flight:
+            return order[0]
+        return None
+
+    def _start_queued_jobs(self):
+        while True:
+            with self._lock:
+                job_id = self._next_queued_job_id()
+            if job_id is None:
+                return
+            # Admission runs without the lock: with a lease file it is SQLite I/O that
+            # may wait on other workers, and poll() must not wait behind it
+            if self._quota:
+                wait_sec = self._quota.try_acquire(job_id)
+                if wait_sec > 0:
+                    with self._lock:
+                        self._quota_retry_at = time.time() + wait_sec
+                    return
+            with self._lock:
+                # Only this thread starts jobs, but the job may have been cancelled meanwhile.
+                # A job submitted meanwhile that would now come first waits for the next pass.
+                still_queued = job_id in self._queue
+                if still_queued:
+                    self._quota_retry_at = 0.0
+                    self._queue.remove(job_id)
+                    self._queue_positions = None
+                    job = self._jobs[job_id]
+            if not still_queued:
+                self._release_quota(job_id)
+                continue
+
+            try:
+                operation = video_ops.start_video_generation(**job['params'])
+            except Exception as e:
+                self._release_quota(job_id)
+                if self._quota and quota.is_quota_error(e):
+                    backoff_sec = self._quota.record_quota_error()
+                    logger.warning(f"Veo quota exhausted while starting job {job_id}; retrying in {backoff_sec:.0f}s")
+                    with self._lock:
+                        if job['status'] != CANCELLED:
+                            self._queue.insert(0, job_id)
+                            self._queue_positions = None
+                        self._quota_retry_at = time.time() + backoff_sec
+                    return
+                logger.error(f"Failed to start job {job['job_id']}: {e}")
+                with self._lock:
+                    self._finish(job, FAILED, error=str(e))
+                continue
+
+            if self._quota:
+                self._quota.record_success()
+            with self._lock:
+                cancelled = job['status'] == CANCELLED
+                if not cancelled:
+                    job['status'] = RUNNING
+                    job['operation_name'] = operation.name
+                    job['updated_at'] = time.time()
+                    self._operations[job['job_id']] = operation
+                    self._queue_positions = None
+                    self._track(job)
+                    self._store.save(job)
+            if cancelled:
+                self._release_quota(job_id)
+
+    def _check_running_jobs(self):
+        for job_id in self._scheduler.due():
+            with self._lock:
+                operation = self._operations.get(job_id)
+            if operation is None:
+                continue
+
+            try:
+                operation = video_ops.get_video_operation(operation)
+            except Exception as e:
+                if self._scheduler.record_error(job_id) < self._max_poll_errors:
+                    logger.warning(f"Error polling job {job_id}, backing off: {e}")
+                    continue
+                poll_stats = self._scheduler.untrack(job_id)
+                logger.error(f"Job {job_id} failed after repeated polling errors: {e}")
+                result, error, status = None, str(e), FAILED
+            else:
+                if not operation.done:
+                    self._scheduler.record_pending(job_id)
+                    with self._lock:
+                        if job_id in self._operations:
+                            self._operations[job_id] = operation
+                    continue
+
+                poll_stats = self._scheduler.record_done(job_id)
+                try:
+                    result, error, status = video_ops.extract_generated_clips(operation), None, SUCCEEDED
+                    video_ops.cache_generated_clips(self._jobs[job_id]['params'], result)
+                except Exception as e:
+                    logger.error(f"Job {job_id} failed: {e}")
+                    result, error, status = None, str(e), FAILED
+
+            with self._lock:
+                if self._operations.pop(job_id, None) is None:
+                    continue  # Cancelled while we were polling
+                self._queue_positions = None
+                job = self._jobs[job_id]
+                queue_sec = self._queue_seconds(job)
+                self._finish(job, status, result=result, error=error)
+            if status == SUCCEEDED:
+                previews.submit_previews(result)
+            self._release_quota(job_id)
+            video_ops.record_video_operation(job['params'], "ok" if status == SUCCEEDED else "error",
+                                             poll_stats, queue_sec, error=error)
+            logger.info(f"Job {job_id} finished with status {status}")
+
+
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Returns the process-wide job manager, creating and starting it on first use."""
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            config = load_config()
+            jobs_config = config.get("jobs", {})
+            _job_manager = JobManager(
+                db_path=jobs_config.get("db_path", "/tmp/adgen/jobs.sqlite"),
+                max_in_flight=get_settings().veo.max_concurrent_operations,
+                max_poll_errors=config.get("polling", {}).get("max_consecutive_errors", 8),
+                max_speculative_in_flight=config.get("speculation", {}).get("max_in_flight", 1),
+                quota_scheduler=quota.get_quota_scheduler(),
+                retention_sec=jobs_config.get("retention_sec", 7 * 86400),
+            )
+            _job_manager.start()
+    return _job_manager
+
+
+def submit(params: Dict[str, Any], owner: str = None, bypass_cache: bool = False,
+           priority: int = PRIORITY_USER, labels: Dict[str, Any] = None) -> str:
+    """Queues a video generation job on the process-wide job manager."""
+    return get_job_manager().submit(params, owner=owner, bypass_cache=bypass_cache, priority=priority,
+                                    labels=labels)
+
+
+def poll(job_id: str) -> Optional[Dict[str, Any]]:
+    """Returns the state of a job on the process-wide job manager."""
+    return get_job_manager().poll(job_id)
+
+
+def list_for_owner(owner: str) -> List[Dict[str, Any]]:
+    """Returns the retained jobs of an owner on the process-wide job manager, oldest first."""
+    return get_job_manager().list_for_owner(owner)
+
+
+def cancel(job_id: str) -> bool:
+    """Cancels a job on the process-wide job manager."""
+    return get_job_manager().cancel(job_id)
+
+
+def promote(job_id: str) -> bool:
+    """Raises a speculative job to user priority on the process-wide job manager."""
+    return get_job_manager().promote(job_id)
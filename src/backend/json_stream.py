@@ -0,0 +1,98 @@
+"""Incremental parsing of streamed JSON arrays"""
+import json
+from typing import List, Any
+
+
+class IncrementalJSONArrayParser:
+    """
+    Extracts elements of a top-level JSON array from text that arrives in chunks.
+
+    Each element is returned by `feed` as soon as its closing bracket is seen, so callers
+    can act on the first objects of an LLM response before the rest has been generated.
+    Anything before the opening '[' (e.g. a ```json fence) is ignored.
+
+    Example:
+        parser = IncrementalJSONArrayParser()
+        for chunk in chunks:
+            for item in parser.feed(chunk):
+                handle(item)
+    """
+
+    def __init__(self):
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._element: List[str] = []
+
+    @property
+    def finished(self) -> bool:
+        """True once the closing ']' of the top-level array has been seen."""
+        return self._finished
+
+    def feed(self, text: str) -> List[Any]:
+        """
+        Consumes the next chunk of text.
+
+        Returns:
+            list: Array elements completed by this chunk, in order.
+
+        Raises:
+            json.JSONDecodeError: If a completed element is not valid JSON.
+        """
+        completed = []
+        for char in text:
+            if self._finished:
+                break
+
+            if not self._started:
+                if char == '[':
+                    self._started = True
+                continue
+
+            if self._in_string:
+                self._element.append(char)
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if self._depth == 0:
+                if char == ']':
+                    self._finished = True
+                    completed.extend(self._flush_scalar())
+                elif char == ',':
+                    completed.extend(self._flush_scalar())
+                elif char in '[{':
+                    self._depth = 1
+                    self._element.append(char)
+                elif char == '"':
+                    self._in_string = True
+                    self._element.append(char)
+                elif not char.isspace():
+                    self._element.append(char)
+                continue
+
+            self._element.append(char)
+            if char == '"':
+                self._in_string = True
+            elif char in '[{':
+                self._depth += 1
+            elif char in ']}':
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.append(json.loads("".join(self._element)))
+                    self._element = []
+        return completed
+
+    def _flush_scalar(self) -> List[Any]:
+        """Returns a pending scalar element (number, string, literal) terminated by ',' or ']'."""
+        if not self._element:
+            return []
+        value = json.loads("".join(self._element))
+        self._element = []
+        return [value]
@@ -0,0 +1,317 @@
+"""In-process metrics and structured call logging"""
+import json
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any, Tuple, List
+
+from src.backend.utils import load_config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 90, 120, 180, 300, 600)
+SIZE_BUCKETS = (100, 300, 1000, 3000, 10000, 30000, 100000)
+COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class _Metric(ABC):
+    type_name = None
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[Tuple[str, str], ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {sorted(labels)}")
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            series = list(self._series.items())
+        for key, value in sorted(series):
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    @abstractmethod
+    def _render_series(self, key, value) -> List[str]:
+        ...
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label combination."""
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+    def _render_series(self, key, value) -> List[str]:
+        return [f"{self.name}{_format_labels(key)} {value}"]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram per label combination, as exposed by Prometheus."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'buckets': [0] * len(self.buckets), 'count': 0, 'sum': 0.0}
+            for index, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    series['buckets'][index] += 1
+            series['count'] += 1
+            series['sum'] += value
+
+    def snapshot(self, **labels) -> Dict[str, Any]:
+        """Returns 'count', 'sum' and 'mean' of the observations for one label combination."""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            count, total = (series['count'], series['sum']) if series else (0, 0.0)
+        return {'count': count, 'sum': total, 'mean': total / count if count else None}
+
+    def _render_series(self, key, value) -> List[str]:
+        lines = []
+        for upper_bound, bucket_count in zip(self.buckets, value['buckets']):
+            labels = _format_labels(key + (("le", f"{upper_bound:g}"),))
+            lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+        lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {value['count']}")
+        lines.append(f"{self.name}_count{_format_labels(key)} {value['count']}")
+        lines.append(f"{self.name}_sum{_format_labels(key)} {value['sum']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds every metric of the process and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.type_name}")
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = [self._metrics[name] for name in sorted(self._metrics)]
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+registry = MetricsRegistry()
+
+model_calls = registry.counter(
+    "adgen_model_calls_total", "Gemini and Veo calls by outcome.", ("api", "model", "outcome"))
+model_call_seconds = registry.histogram(
+    "adgen_model_call_seconds", "Wall time of Gemini and Veo calls.", ("api", "model"))
+model_queue_seconds = registry.histogram(
+    "adgen_model_queue_seconds", "Time a call waited before it was sent.", ("api", "model"))
+model_poll_seconds = registry.histogram(
+    "adgen_model_poll_seconds", "Time spent polling long-running operations until done.", ("api", "model"))
+model_prompt_chars = registry.histogram(
+    "adgen_model_prompt_chars", "Prompt size in characters.", ("api", "model"), buckets=SIZE_BUCKETS)
+model_tokens = registry.counter(
+    "adgen_model_tokens_total", "Tokens reported in usage_metadata.", ("api", "model", "direction"))
+model_retries = registry.counter(
+    "adgen_model_retries_total", "Retried requests, e.g. failed operation polls.", ("api", "model"))
+operation_polls = registry.histogram(
+    "adgen_operation_polls", "Status checks spent per long-running operation.", ("api", "model"),
+    buckets=COUNT_BUCKETS)
+detection_lag_seconds = registry.histogram(
+    "adgen_operation_detection_lag_seconds",
+    "Upper bound on how long a finished operation went unnoticed.", ())
+merges = registry.counter(
+    "adgen_merges_total", "Clip merges by mode, concat path (copy or reencode) and outcome.",
+    ("mode", "path", "outcome"))
+merge_seconds = registry.histogram(
+    "adgen_merge_seconds", "Wall time of clip merges, including downloads and upload.", ("mode", "path"))
+quota_throttles = registry.counter(
+    "adgen_quota_throttled_total", "Veo operation starts deferred by the quota scheduler.", ("reason",))
+quota_errors = registry.counter(
+    "adgen_quota_errors_total", "Veo operation starts rejected with 429 RESOURCE_EXHAUSTED.")
+preview_seconds = registry.histogram(
+    "adgen_preview_seconds", "Wall time of rendering and uploading the previews of one clip.", ("outcome",))
+cache_lookups = registry.counter(
+    "adgen_cache_lookups_total", "Prompt, clip and signed URL cache lookups.", ("cache", "result"))
+
+
+def record_call(api: str, model: str, outcome: str, wall_sec: float, prompt_chars: int = None,
+                input_tokens: int = None, output_tokens: int = None, queue_sec: float = None,
+                poll_sec: float = None, polls: int = None, retries: int = 0, **fields):
+    """
+    Records one model call in the registry and emits it as a structured log line.
+
+    Args:
+        api: Call site, e.g. "gemini.generate_content" or "veo.operation".
+        model: Model name.
+        outcome: "ok", "error", "cache_hit" or another short status.
+        wall_sec: End-to-end wall time of the call.
+        prompt_chars, input_tokens, output_tokens: Request size and token usage, if known.
+        queue_sec, poll_sec, polls, retries: Long-running operation timings, if any.
+        **fields: Extra context included in the log line only (e.g. an error message).
+    """
+    model = model or "unknown"
+    model_calls.inc(api=api, model=model, outcome=outcome)
+    model_call_seconds.observe(wall_sec, api=api, model=model)
+    if prompt_chars is not None:
+        model_prompt_chars.observe(prompt_chars, api=api, model=model)
+    if input_tokens:
+        model_tokens.inc(input_tokens, api=api, model=model, direction="input")
+    if output_tokens:
+        model_tokens.inc(output_tokens, api=api, model=model, direction="output")
+    if queue_sec is not None:
+        model_queue_seconds.observe(queue_sec, api=api, model=model)
+    if poll_sec is not None:
+        model_poll_seconds.observe(poll_sec, api=api, model=model)
+    if polls is not None:
+        operation_polls.observe(polls, api=api, model=model)
+    if retries:
+        model_retries.inc(retries, api=api, model=model)
+
+    record = {
+        'event': "model_call", 'api': api, 'model': model, 'outcome': outcome,
+        'wall_sec': round(wall_sec, 3), 'prompt_chars': prompt_chars,
+        'input_tokens': input_tokens, 'output_tokens': output_tokens,
+        'queue_sec': None if queue_sec is None else round(queue_sec, 3),
+        'poll_sec': None if poll_sec is None else round(poll_sec, 3),
+        'polls': polls, 'retries': retries, **fields,
+    }
+    logger.info(json.dumps({key: value for key, value in record.items() if value is not None}, default=str))
+
+
+def usage_tokens(usage_metadata) -> Tuple[Optional[int], Optional[int]]:
+    """Returns (input_tokens, output_tokens) from a Gemini `usage_metadata`, or Nones if absent."""
+    if usage_metadata is None:
+        return None, None
+    return (getattr(usage_metadata, "prompt_token_count", None),
+            getattr(usage_metadata, "candidates_token_count", None))
+
+
+@contextmanager
+def track_call(api: str, model: str, prompt: str = None):
+    """
+    Times a model call and records it with `record_call` when the block exits.
+
+    Yields a dict the caller can fill in: 'usage_metadata' (from the response), 'outcome'
+    (defaults to "ok", or "error" if the block raises) and any other `record_call` fields.
+
+    Example:
+        with track_call("gemini.generate_content", model_name, prompt) as call:
+            response = model.generate_content(prompt)
+            call['usage_metadata'] = response.usage_metadata
+    """
+    call = {}
+    start = time.perf_counter()
+    try:
+        yield call
+    except GeneratorExit:
+        call['outcome'] = "cancelled"  # A streaming consumer stopped early
+        raise
+    except BaseException as e:
+        call['outcome'] = "error"
+        call['error'] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        input_tokens, output_tokens = usage_tokens(call.pop('usage_metadata', None))
+        call.setdefault('input_tokens', input_tokens)
+        call.setdefault('output_tokens', output_tokens)
+        record_call(
+            api=api,
+            model=model,
+            outcome=call.pop('outcome', "ok"),
+            wall_sec=time.perf_counter() - start,
+            prompt_chars=len(prompt) if isinstance(prompt, str) else None,
+            **call,
+        )
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would otherwise flood the application log
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(host: str = None, port: int = None) -> Optional[ThreadingHTTPServer]:
+    """
+    Serves the registry at http://<host>:<port>/metrics from a daemon thread.
+
+    Host and port default to `metrics.host` and `metrics.port` from the config. Does nothing
+    if `metrics.enabled` is false or the server is already running; if the port is taken
+    (e.g. by another worker process) a warning is logged and None is returned.
+    """
+    global _server
+    metrics_config = load_config().get("metrics", {})
+    if not metrics_config.get("enabled", True):
+        return None
+    with _server_lock:
+        if _server is None:
+            host = host or metrics_config.get("host", "127.0.0.1")
+            port = port or metrics_config.get("port", 9464)
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                logger.warning(f"Could not start metrics endpoint on {host}:{port}: {e}")
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+            logger.info(f"Serving metrics at http://{host}:{port}/metrics")
+    return _server
@@ -0,0 +1,224 @@
+"""Adaptive polling for Veo long-running operations"""
+import json
+import time
+import random
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+from src.backend import metrics
+from src.backend.utils import load_config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class DurationModel:
+    """
+    Expected operation duration per (duration_seconds, aspect_ratio), learned from past runs.
+
+    Each bucket holds an exponentially weighted moving average of observed wall-clock
+    durations. Buckets without observations fall back to `default_seconds`.
+    """
+
+    def __init__(self, default_seconds: float = 90, alpha: float = 0.3, path: str = None):
+        self._default_seconds = default_seconds
+        self._alpha = alpha
+        self._path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._expected: Dict[str, float] = {}
+
+        if self._path and self._path.exists():
+            try:
+                self._expected = json.loads(self._path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable duration model {self._path}: {e}")
+
+    @staticmethod
+    def _bucket(duration_seconds, aspect_ratio) -> str:
+        return f"{duration_seconds}s|{aspect_ratio}"
+
+    def expected(self, duration_seconds, aspect_ratio) -> float:
+        """Returns the expected operation duration in seconds."""
+        with self._lock:
+            return self._expected.get(self._bucket(duration_seconds, aspect_ratio), self._default_seconds)
+
+    def observe(self, duration_seconds, aspect_ratio, elapsed: float):
+        """Folds an observed operation duration into the model."""
+        bucket = self._bucket(duration_seconds, aspect_ratio)
+        with self._lock:
+            previous = self._expected.get(bucket)
+            if previous is None:
+                self._expected[bucket] = elapsed
+            else:
+                self._expected[bucket] = (1 - self._alpha) * previous + self._alpha * elapsed
+            snapshot = dict(self._expected)
+
+        if self._path:
+            try:
+                self._path.parent.mkdir(parents=True, exist_ok=True)
+                self._path.write_text(json.dumps(snapshot), encoding="utf-8")
+            except OSError as e:
+                logger.warning(f"Could not persist duration model to {self._path}: {e}")
+
+
+class PollScheduler:
+    """
+    Decides when each outstanding operation should be polled next.
+
+    Polls are sparse early in an operation's life and densify as it approaches the
+    expected duration from the `DurationModel`. Once an operation is overdue the interval
+    grows again slowly. Errors back off exponentially with jitter. Callers check every
+    operation returned by `due()` in a single pass.
+    """
+
+    def __init__(self, model: DurationModel, min_interval: float = 2, max_interval: float = 30,
+                 backoff_base: float = 5, max_backoff: float = 120):
+        self._model = model
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._backoff_base = backoff_base
+        self._max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._tracked: Dict[Any, Dict[str, Any]] = {}
+
+    def track(self, key, duration_seconds, aspect_ratio, started_at: float = None):
+        """Starts scheduling polls for an operation."""
+        now = time.time()
+        entry = {
+            'duration_seconds': duration_seconds,
+            'aspect_ratio': aspect_ratio,
+            'started_at': started_at or now,
+            'expected': self._model.expected(duration_seconds, aspect_ratio),
+            'last_polled_at': started_at or now,
+            'errors': 0,
+            'poll_errors': 0,
+            'polls': 0,
+        }
+        entry['next_poll_at'] = now + self._interval(entry, now)
+        with self._lock:
+            self._tracked[key] = entry
+
+    def untrack(self, key) -> Optional[Dict[str, Any]]:
+        """
+        Stops scheduling polls for an operation, e.g. after it was cancelled or given up on.
+
+        Returns:
+            dict: 'elapsed', 'polls' and 'poll_errors' so far, or None if the key was not tracked.
+        """
+        with self._lock:
+            entry = self._tracked.pop(key, None)
+        if entry is None:
+            return None
+        return {'elapsed': time.time() - entry['started_at'], 'polls': entry['polls'],
+                'poll_errors': entry['poll_errors']}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._tracked)
+
+    def next_due_in(self) -> Optional[float]:
+        """Returns seconds until the earliest scheduled poll, or None if nothing is tracked."""
+        with self._lock:
+            if not self._tracked:
+                return None
+            next_poll_at = min(entry['next_poll_at'] for entry in self._tracked.values())
+        return max(0.0, next_poll_at - time.time())
+
+    def due(self) -> List[Any]:
+        """Returns the keys of all operations that should be polled now."""
+        now = time.time()
+        with self._lock:
+            return [key for key, entry in self._tracked.items() if entry['next_poll_at'] <= now]
+
+    def record_pending(self, key):
+        """Records a poll that found the operation still running."""
+        now = time.time()
+        with self._lock:
+            entry = self._tracked.get(key)
+            if entry is None:
+                return
+            entry['polls'] += 1
+            entry['errors'] = 0
+            entry['last_polled_at'] = now
+            entry['next_poll_at'] = now + self._interval(entry, now)
+
+    def record_error(self, key) -> int:
+        """
+        Records a failed poll and backs off with jitter.
+
+        Returns:
+            int: Number of consecutive errors for this operation.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._tracked.get(key)
+            if entry is None:
+                return 0
+            entry['polls'] += 1
+            entry['errors'] += 1
+            entry['poll_errors'] += 1
+            backoff = min(self._max_backoff, self._backoff_base * 2 ** (entry['errors'] - 1))
+            entry['next_poll_at'] = now + backoff * random.uniform(0.5, 1.5)
+            return entry['errors']
+
+    def record_done(self, key) -> Optional[Dict[str, Any]]:
+        """
+        Records a poll that found the operation finished and stops tracking it.
+
+        Returns:
+            dict: 'elapsed' (operation wall time), 'lag' (completion-to-detection upper bound),
+            'polls' (status checks spent) and 'poll_errors' (failed checks that were retried),
+            or None if the key was not tracked.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._tracked.pop(key, None)
+        if entry is None:
+            return None
+
+        elapsed = now - entry['started_at']
+        lag = now - entry['last_polled_at']
+        self._model.observe(entry['duration_seconds'], entry['aspect_ratio'], elapsed)
+        metrics.detection_lag_seconds.observe(lag)
+        logger.info(f"Operation {key} done after {elapsed:.1f}s and {entry['polls'] + 1} polls "
+                    f"(detection lag <= {lag:.1f}s)")
+        return {'elapsed': elapsed, 'lag': lag, 'polls': entry['polls'] + 1, 'poll_errors': entry['poll_errors']}
+
+    def _interval(self, entry: Dict[str, Any], now: float) -> float:
+        remaining = entry['expected'] - (now - entry['started_at'])
+        if remaining > 0:
+            interval = remaining / 2
+        else:
+            interval = -remaining / 4
+        return max(self._min_interval, min(self._max_interval, interval))
+
+
+_duration_model = None
+_duration_model_lock = threading.Lock()
+
+
+def get_duration_model() -> DurationModel:
+    """Returns the process-wide duration model."""
+    global _duration_model
+    with _duration_model_lock:
+        if _duration_model is None:
+            polling_config = load_config().get("polling", {})
+            _duration_model = DurationModel(
+                default_seconds=polling_config.get("default_expected_sec", 90),
+                path=polling_config.get("model_path"),
+            )
+    return _duration_model
+
+
+def create_scheduler() -> PollScheduler:
+    """Creates a poll scheduler configured from config.yaml and backed by the shared duration model."""
+    polling_config = load_config().get("polling", {})
+    return PollScheduler(
+        get_duration_model(),
+        min_interval=polling_config.get("min_interval_sec", 2),
+        max_interval=polling_config.get("max_interval_sec", 30),
+        backoff_base=polling_config.get("error_backoff_base_sec", 5),
+        max_backoff=polling_config.get("max_error_backoff_sec", 120),
+    )
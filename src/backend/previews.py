@@ -0,0 +1,241 @@
+"""Lightweight preview renditions and poster frames for generated clips"""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import ffmpeg
+
+from src.backend import metrics
+from src.backend.clients import get_storage_client
+from src.backend.scratch import get_scratch_space
+from src.backend.signed_urls import get_signed_url
+from src.backend.utils import load_config, upload_file_to_gcs, IMMUTABLE_CACHE_CONTROL
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+config = load_config()
+
+# Preview kind -> (file suffix appended to the clip's name without extension, content type)
+PREVIEW_KINDS = {
+    'poster': (".poster.jpg", "image/jpeg"),
+    'thumbnails': (".thumbs.gif", "image/gif"),
+    'preview': (".preview.mp4", "video/mp4"),
+}
+
+
+def preview_locations(gs_uri: str) -> Dict[str, str]:
+    """
+    Returns where the previews of a clip are stored: next to the clip, named after it.
+
+    Args:
+        gs_uri: gs:// URI of the clip, e.g. '.../sample_0.mp4'.
+
+    Returns:
+        Dict[str, str]: gs:// URI per preview kind ('poster', 'thumbnails', 'preview').
+    """
+    stem = os.path.splitext(gs_uri)[0]
+    return {kind: f"{stem}{suffix}" for kind, (suffix, _) in PREVIEW_KINDS.items()}
+
+
+def _previews_exist(locations: Dict[str, str]) -> bool:
+    client = get_storage_client()
+    for gs_uri in locations.values():
+        bucket_name, blob_name = gs_uri.replace("gs://", "", 1).split('/', 1)
+        if client.bucket(bucket_name).get_blob(blob_name) is None:
+            return False
+    return True
+
+
+def build_preview_outputs(source: str, work_dir: str, preview_config: dict) -> tuple:
+    """
+    Builds the single-pass ffmpeg job that renders all previews of a clip.
+
+    The clip is decoded once and split three ways: a low-bitrate MP4 (with the clip's
+    audio, if any), an animated GIF thumbnail strip sampled at `thumbnail_fps`, and a
+    representative poster frame picked by ffmpeg's thumbnail filter.
+
+    Args:
+        source: Local path or URL of the clip.
+        work_dir: Directory the preview files are written to.
+        preview_config: The `previews` config section.
+
+    Returns:
+        A tuple of the merged ffmpeg output node and the local path per preview kind.
+    """
+    paths = {kind: os.path.join(work_dir, f"clip{suffix}") for kind, (suffix, _) in PREVIEW_KINDS.items()}
+    height = preview_config.get("height", 360)
+    thumbnail_width = preview_config.get("thumbnail_width", 240)
+
+    video = ffmpeg.input(source).video.filter_multi_output('split', 3)
+
+    preview = video[0].filter('scale', -2, height)
+    preview_output = ffmpeg.output(
+        preview, paths['preview'],
+        vcodec='libx264',
+        preset=preview_config.get("preset", "veryfast"),
+        video_bitrate=preview_config.get("video_bitrate", "400k"),
+        acodec='aac',
+        audio_bitrate=preview_config.get("audio_bitrate", "64k"),
+        movflags='+faststart',
+        # Carry the clip's audio over when it has any
+        **{'map': '0:a?'},
+    )
+
+    frames = (
+        video[1]
+        .filter('fps', preview_config.get("thumbnail_fps", 1))
+        .filter('scale', thumbnail_width, -2)
+        .filter_multi_output('split', 2)
+    )
+    palette = frames[0].filter('palettegen')
+    thumbnails_output = ffmpeg.output(ffmpeg.filter([frames[1], palette], 'paletteuse'), paths['thumbnails'])
+
+    poster = video[2].filter('thumbnail', preview_config.get("poster_sample_frames", 48)).filter('scale', -2, height)
+    poster_output = ffmpeg.output(poster, paths['poster'], vframes=1,
+                                  **{'q:v': preview_config.get("poster_quality", 4)})
+
+    return ffmpeg.merge_outputs(preview_output, thumbnails_output, poster_output), paths
+
+
+def generate_previews(gs_uri: str) -> Optional[Dict[str, str]]:
+    """
+    Renders and uploads the previews of one clip, unless they already exist.
+
+    ffmpeg reads the clip straight from a signed URL, so it is never downloaded in full.
+
+    Args:
+        gs_uri: gs:// URI of the clip.
+
+    Returns:
+        Dict[str, str]: gs:// URI per preview kind, or None if rendering or uploading failed.
+    """
+    locations = preview_locations(gs_uri)
+    if _previews_exist(locations):
+        return locations
+
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        source = get_signed_url(gs_uri)
+        if not source:
+            return None
+        with get_scratch_space().job_dir("previews") as work_dir:
+            outputs, paths = build_preview_outputs(source, work_dir, config.get("previews", {}))
+            outputs.run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
+
+            for kind, (_, content_type) in PREVIEW_KINDS.items():
+                with open(paths[kind], 'rb') as preview_file:
+                    # Clip names are unique, so previews named after them are never overwritten
+                    if not upload_file_to_gcs(preview_file, locations[kind], content_type=content_type,
+                                              cache_control=IMMUTABLE_CACHE_CONTROL):
+                        return None
+        outcome = "ok"
+        logger.info(f"Generated previews for {gs_uri} in {time.perf_counter() - start:.1f}s.")
+        return locations
+    except ffmpeg.Error as e:
+        logger.error(f"ffmpeg error while generating previews for {gs_uri}:")
+        logger.error(e.stderr.decode('utf8', errors='replace') if e.stderr else str(e))
+        return None
+    except Exception as e:
+        logger.error(f"Could not generate previews for {gs_uri}: {e}")
+        return None
+    finally:
+        metrics.preview_seconds.observe(time.perf_counter() - start, outcome=outcome)
+
+
+class PreviewWorker:
+    """
+    Worker pool that generates clip previews in the background.
+
+    Requests for a clip whose previews are being generated share that work. Results of
+    the `max_results` most recently used clips are kept in memory; an older clip is looked
+    up again, which only costs a GCS metadata check since its previews already exist.
+    """
+
+    def __init__(self, max_workers: int = 4, max_results: int = 1024):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="previews")
+        self._max_results = max(1, max_results)
+        self._lock = threading.Lock()
+        self._futures: Dict[str, Future] = {}  # Clips whose previews are being generated
+        self._results: "OrderedDict[str, Optional[Dict[str, str]]]" = OrderedDict()  # LRU of finished clips
+
+    def submit(self, gs_uris: List[str]):
+        """Queues preview generation for clips that are neither queued nor finished."""
+        submitted = []
+        with self._lock:
+            for gs_uri in gs_uris:
+                if gs_uri and gs_uri not in self._futures and gs_uri not in self._results:
+                    self._futures[gs_uri] = self._executor.submit(generate_previews, gs_uri)
+                    submitted.append(gs_uri)
+            futures = [(gs_uri, self._futures[gs_uri]) for gs_uri in submitted]
+        # Outside the lock: a callback runs right away if its future is already done
+        for gs_uri, future in futures:
+            future.add_done_callback(lambda done, gs_uri=gs_uri: self._finished(gs_uri, done))
+
+    def _finished(self, gs_uri: str, future: Future):
+        with self._lock:
+            self._futures.pop(gs_uri, None)
+            self._results[gs_uri] = future.result() if future.exception() is None else None
+            self._results.move_to_end(gs_uri)
+            while len(self._results) > self._max_results:
+                self._results.popitem(last=False)
+
+    def get(self, gs_uri: str) -> Optional[Dict[str, str]]:
+        """
+        Returns the preview locations of a clip if they are ready, queueing the clip if needed.
+
+        Returns:
+            Dict[str, str]: gs:// URI per preview kind, or None while pending or after a failure.
+        """
+        self.submit([gs_uri])
+        with self._lock:
+            if gs_uri not in self._results:
+                return None
+            self._results.move_to_end(gs_uri)
+            return self._results[gs_uri]
+
+    def is_pending(self, gs_uri: str) -> bool:
+        """Returns True while the previews of a queued clip are still being generated."""
+        with self._lock:
+            return gs_uri in self._futures
+
+
+_preview_worker = None
+_preview_worker_lock = threading.Lock()
+
+
+def get_preview_worker() -> Optional[PreviewWorker]:
+    """Returns the process-wide preview worker, or None if `previews.enabled` is false."""
+    global _preview_worker
+    preview_config = load_config().get("previews", {})
+    if not preview_config.get("enabled", True):
+        return None
+    with _preview_worker_lock:
+        if _preview_worker is None:
+            _preview_worker = PreviewWorker(max_workers=preview_config.get("workers", 4),
+                                            max_results=preview_config.get("max_results", 1024))
+    return _preview_worker
+
+
+def submit_previews(clips: List[Dict[str, str]]):
+    """Queues preview generation for a list of {'gs_uri', ...} clip dicts."""
+    worker = get_preview_worker()
+    if worker and clips:
+        worker.submit([clip.get('gs_uri') for clip in clips])
+
+
+def get_previews(gs_uri: str) -> Optional[Dict[str, str]]:
+    """Returns the preview locations of a clip once they are ready, or None."""
+    worker = get_preview_worker()
+    return worker.get(gs_uri) if worker and gs_uri else None
+
+
+def previews_pending(gs_uris: List[str]) -> bool:
+    """Returns True if the previews of any of the given clips are still being generated."""
+    worker = get_preview_worker()
+    return bool(worker) and any(worker.is_pending(gs_uri) for gs_uri in gs_uris)
@@ -0,0 +1,121 @@
+"""Disk cache for Gemini prompt results"""
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+from src.backend import metrics
+from src.backend.utils import load_config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapses whitespace and case so trivially different prompts share a cache entry."""
+    return re.sub(r"\s+", " ", prompt).strip().casefold()
+
+
+class PromptCache:
+    """
+    SQLite-backed cache of Gemini response text keyed on (model, generation config, prompt).
+
+    Entries expire after `ttl_sec`; beyond `max_entries` the least recently used entries
+    are evicted. In semantic mode prompts are normalized with `normalize_prompt` before
+    hashing, so ad ideas that differ only in whitespace or casing hit the same entry.
+    The prompt actually sent to Gemini is never modified.
+    """
+
+    def __init__(self, db_path: str, ttl_sec: float = None, max_entries: int = None, semantic: bool = False):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._ttl_sec = ttl_sec
+        self._max_entries = max_entries
+        self._semantic = semantic
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL
+                )
+            """)
+
+    def key(self, model_name: str, generation_config: Optional[Dict[str, Any]], prompt: str) -> str:
+        """Builds the cache key for a Gemini call."""
+        prompt_text = normalize_prompt(prompt) if self._semantic else prompt
+        payload = json.dumps({
+            'model_name': model_name,
+            'generation_config': generation_config,
+            'prompt_sha256': hashlib.sha256(prompt_text.encode("utf-8")).hexdigest(),
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self._ttl_sec and now - row[1] > self._ttl_sec:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self._misses += 1
+                metrics.cache_lookups.inc(cache="prompt", result="miss")
+                return None
+            self._hits += 1
+            metrics.cache_lookups.inc(cache="prompt", result="hit")
+            self._conn.execute("UPDATE responses SET last_used_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, key: str, response: str):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, response, now, now)
+            )
+            if self._ttl_sec:
+                self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self._ttl_sec,))
+            if self._max_entries:
+                self._conn.execute("""
+                    DELETE FROM responses WHERE key NOT IN (
+                        SELECT key FROM responses ORDER BY last_used_at DESC LIMIT ?
+                    )
+                """, (self._max_entries,))
+
+    def stats(self) -> Dict[str, int]:
+        """Returns hit/miss counters since process start and the current entry count."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {'hits': self._hits, 'misses': self._misses, 'entries': entries}
+
+
+_prompt_cache = None
+_prompt_cache_lock = threading.Lock()
+
+
+def get_prompt_cache() -> Optional[PromptCache]:
+    """Returns the process-wide prompt cache, or None if `prompt_cache.enabled` is false."""
+    global _prompt_cache
+    cache_config = load_config().get("prompt_cache", {})
+    if not cache_config.get("enabled", True):
+        return None
+    with _prompt_cache_lock:
+        if _prompt_cache is None:
+            _prompt_cache = PromptCache(
+                db_path=cache_config.get("sqlite_path", "/tmp/adgen/prompt_cache.sqlite"),
+                ttl_sec=cache_config.get("ttl_sec"),
+                max_entries=cache_config.get("max_entries"),
+                semantic=cache_config.get("semantic", False),
+            )
+    return _prompt_cache
@@ -397,3 +397,105 @@ Example:
 ]
 """
     return prompt
+
+
+def generate_veo_scene_list_prompt(ad_idea, example_prompts, max_scenes=4, ad_duration_sec=15):
+    """
+    Single-call alternative to `generate_script_prompt` + `generate_veo_compatible_prompt`.
+    Plans the ad and writes the final Veo-ready prompt for every scene in one response.
+
+    Input:
+        ad_idea (str): The user-provided ad idea.
+        example_prompts (list): Example Veo prompts that define the target style.
+
+    Output:
+        str: Instructions for an LLM whose response is constrained to a list of
+        {"prompt", "scene_duration"} objects.
+    """
+
+    prompt = f"""
+**ROLE:**
+You are an **Expert AI Visual Storyteller, Director and cinematic prompt writer** for generative video AI (e.g., Google Veo).
+
+**CORE TASK:**
+Turn the Input Ad Idea into an ad of at most {max_scenes} scenes with a total duration of about {ad_duration_sec} seconds,
+and write the final Veo generation prompt for every scene.
+
+**Input Ad Idea:**
+`{ad_idea}`
+
+**KEY INSTRUCTIONS:**
+
+1. **Compelling Ad Story:**
+   - Deliver a visually engaging, creatively structured story or product showcase. Every scene must move the idea forward.
+   - Avoid generic or repetitive shots; each scene shows a *different* aspect, interaction or emotional beat.
+
+2. **One Shot Per Scene:**
+   - Each scene is one continuous, uncut camera shot. Fluid camera movement and simple action progressions are fine;
+     complex multi-stage sequences must be split across scenes.
+
+3. **Scene Independence with Narrative Continuity:**
+   - Each prompt must be written **as if it's the only input** the AI will receive. Never assume context from other scenes.
+   - Plan the recurring visual elements (characters, product, vehicles, settings, lighting, mood) first, then describe
+     each of them **identically** in every prompt where it appears.
+
+4. **Exhaustive Visual Detail:**
+   - Include subject appearance and current state, environment and background, action, composition and framing,
+     camera motion and angle, lens, lighting and color palette. Leave nothing to assumption.
+
+5. **Example Reference:**
+   - Follow the structure, flow and tone of the example prompts precisely: one continuous cinematic paragraph per
+     prompt that opens with framing/composition, moves into subject/environment detail, then action/motion,
+     then ambiance/mood/lighting.
+
+### Example Prompts (Mandatory Style Guide):
+{example_prompts}
+
+**Required Output Format:**
+Output ONLY a JSON list with one object per scene, in order:
+[
+    {{
+        "prompt": "Highly detailed Veo prompt for scene 1, following example style exactly...",
+        "scene_duration": <integer seconds between 5 and 8>
+    }},
+  ...
+]
+"""
+    return prompt
+
+
+def generate_prompt_variants_prompt(scene_prompt, count=2):
+    """
+    Asks for alternative versions of one scene's Veo prompt, used to pre-generate
+    alternate clips while the user reviews the first ones.
+
+    Input:
+        scene_prompt (str): The Veo prompt of the scene.
+        count (int): Number of variants to propose.
+
+    Output:
+        str: Instructions for an LLM whose response is constrained to a list of prompt strings.
+    """
+
+    prompt = f"""
+**ROLE:**
+You are an **Expert cinematic prompt writer** for generative video AI (e.g., Google Veo).
+
+**CORE TASK:**
+A user is reviewing the video generated from the Veo prompt below and may ask for alternatives.
+Write {count} refined variants of the prompt that a user would most likely ask for next.
+
+**Input Veo Prompt:**
+`{scene_prompt}`
+
+**KEY INSTRUCTIONS:**
+- Keep the subject, product, characters, setting and story beat of the scene **exactly** as described, word for word
+  where they are described, so the clip still fits the rest of the ad.
+- Change one or two cinematic choices per variant: camera angle or movement, framing, lens, lighting, time of day,
+  pacing of the action or mood. Make every variant clearly different from the input and from each other.
+- Keep the style of the input: one continuous cinematic paragraph of similar length.
+
+**Required Output Format:**
+Output ONLY a JSON list of {count} strings, one variant prompt each.
+"""
+    return prompt
@@ -0,0 +1,255 @@
+"""Veo quota scheduler: requests-per-minute and concurrent-operation admission control"""
+import time
+import sqlite3
+import logging
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from src.backend import metrics
+from src.backend.settings import get_settings
+from src.backend.utils import load_config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_WINDOW_SEC = 60
+
+
+def is_quota_error(error: Exception) -> bool:
+    """Returns True if an API error means the project ran out of quota (HTTP 429 / RESOURCE_EXHAUSTED)."""
+    code = getattr(error, 'code', None)
+    if code == 429:
+        return True
+    message = str(error)
+    return "RESOURCE_EXHAUSTED" in message or message.startswith("429")
+
+
+class _MemoryQuotaState:
+    """Quota bookkeeping for a single process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._starts = deque()
+        self._leases: Dict[str, float] = {}  # lease_id -> expires_at
+        self._backoff: Tuple[float, int] = (0.0, 0)  # (paused until, consecutive quota errors)
+
+    def try_acquire(self, lease_id: str, now: float, requests_per_minute: int, max_concurrent: int,
+                    lease_ttl_sec: float) -> Tuple[bool, Optional[str], float]:
+        with self._lock:
+            while self._starts and self._starts[0] <= now - _WINDOW_SEC:
+                self._starts.popleft()
+            self._leases = {lease: expires_at for lease, expires_at in self._leases.items() if expires_at > now}
+            if lease_id in self._leases:
+                return True, None, 0.0
+            if len(self._leases) >= max_concurrent:
+                return False, "concurrency", 0.0
+            if len(self._starts) >= requests_per_minute:
+                return False, "rpm", self._starts[0] + _WINDOW_SEC - now
+            self._starts.append(now)
+            self._leases[lease_id] = now + lease_ttl_sec
+            return True, None, 0.0
+
+    def release(self, lease_id: str):
+        with self._lock:
+            self._leases.pop(lease_id, None)
+
+    def renew(self, lease_ids: Iterable[str], expires_at: float):
+        with self._lock:
+            for lease_id in lease_ids:
+                self._leases[lease_id] = expires_at
+
+    def get_backoff(self) -> Tuple[float, int]:
+        with self._lock:
+            return self._backoff
+
+    def set_backoff(self, until: float, strikes: int):
+        with self._lock:
+            self._backoff = (until, strikes)
+
+
+class _SqliteQuotaState:
+    """
+    Quota bookkeeping shared by every process that opens the same SQLite file.
+
+    Each admission decision runs in an IMMEDIATE transaction, so concurrent workers never
+    both take the last slot. Leases expire unless renewed, so a crashed worker's slots
+    are freed after `lease_ttl_sec`.
+    """
+
+    def __init__(self, db_path: str):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS quota_starts (started_at REAL NOT NULL)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS quota_leases (
+                    lease_id TEXT PRIMARY KEY,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS quota_backoff (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    until REAL NOT NULL,
+                    strikes INTEGER NOT NULL
+                )
+            """)
+
+    def _transaction(self, statements):
+        """Runs `statements(conn)` in an IMMEDIATE transaction and returns its result."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(self._conn)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def try_acquire(self, lease_id: str, now: float, requests_per_minute: int, max_concurrent: int,
+                    lease_ttl_sec: float) -> Tuple[bool, Optional[str], float]:
+        def statements(conn):
+            conn.execute("DELETE FROM quota_starts WHERE started_at <= ?", (now - _WINDOW_SEC,))
+            conn.execute("DELETE FROM quota_leases WHERE expires_at <= ?", (now,))
+            if conn.execute("SELECT 1 FROM quota_leases WHERE lease_id = ?", (lease_id,)).fetchone():
+                return True, None, 0.0
+            if conn.execute("SELECT COUNT(*) FROM quota_leases").fetchone()[0] >= max_concurrent:
+                return False, "concurrency", 0.0
+            count, oldest = conn.execute("SELECT COUNT(*), MIN(started_at) FROM quota_starts").fetchone()
+            if count >= requests_per_minute:
+                return False, "rpm", oldest + _WINDOW_SEC - now
+            conn.execute("INSERT INTO quota_starts VALUES (?)", (now,))
+            conn.execute("INSERT INTO quota_leases VALUES (?, ?)", (lease_id, now + lease_ttl_sec))
+            return True, None, 0.0
+
+        return self._transaction(statements)
+
+    def release(self, lease_id: str):
+        self._transaction(lambda conn: conn.execute("DELETE FROM quota_leases WHERE lease_id = ?", (lease_id,)))
+
+    def renew(self, lease_ids: Iterable[str], expires_at: float):
+        rows = [(lease_id, expires_at) for lease_id in lease_ids]
+        if rows:
+            self._transaction(lambda conn: conn.executemany("INSERT OR REPLACE INTO quota_leases VALUES (?, ?)", rows))
+
+    def get_backoff(self) -> Tuple[float, int]:
+        with self._lock:
+            row = self._conn.execute("SELECT until, strikes FROM quota_backoff WHERE id = 0").fetchone()
+        return (row[0], row[1]) if row else (0.0, 0)
+
+    def set_backoff(self, until: float, strikes: int):
+        self._transaction(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO quota_backoff VALUES (0, ?, ?)", (until, strikes)))
+
+
+class QuotaScheduler:
+    """
+    Admission control for Veo generate_videos calls, shared by every session in the process.
+
+    An operation may start only if fewer than `max_concurrent_operations` leases are held
+    and fewer than `requests_per_minute` operations started in the last 60 seconds. A
+    caller that is refused gets the time to wait before trying again. The caller holds
+    a lease until its operation finishes and must release it then. After a 429 from Veo,
+    all starts pause with exponential backoff.
+
+    With `lease_db_path`, the limits are enforced across all worker processes sharing the
+    SQLite file; otherwise they apply to this process only.
+    """
+
+    def __init__(self, requests_per_minute: int = 10, max_concurrent_operations: int = 10,
+                 lease_db_path: str = None, lease_ttl_sec: float = 900, backoff_base_sec: float = 10,
+                 max_backoff_sec: float = 300, retry_sec: float = 2):
+        self._requests_per_minute = max(1, int(requests_per_minute))
+        self._max_concurrent = max(1, int(max_concurrent_operations))
+        self._lease_ttl_sec = lease_ttl_sec
+        self._backoff_base_sec = backoff_base_sec
+        self._max_backoff_sec = max_backoff_sec
+        self._retry_sec = retry_sec
+        self._state = _SqliteQuotaState(lease_db_path) if lease_db_path else _MemoryQuotaState()
+        self._last_renewal = 0.0
+
+    def try_acquire(self, lease_id: str) -> float:
+        """
+        Tries to take a slot for starting one Veo operation.
+
+        Args:
+            lease_id: Unique id of the operation, e.g. its job id. Acquiring a lease
+                that is already held succeeds without using more quota.
+
+        Returns:
+            float: 0 if the lease was acquired, otherwise seconds to wait before retrying.
+        """
+        now = time.time()
+        paused_until, _ = self._state.get_backoff()
+        if paused_until > now:
+            metrics.quota_throttles.inc(reason="backoff")
+            return paused_until - now
+        acquired, reason, wait_sec = self._state.try_acquire(
+            lease_id, now, self._requests_per_minute, self._max_concurrent, self._lease_ttl_sec)
+        if acquired:
+            return 0.0
+        metrics.quota_throttles.inc(reason=reason)
+        # Concurrency slots free up when some operation finishes, possibly in another worker
+        return max(wait_sec, self._retry_sec) if reason == "rpm" else self._retry_sec
+
+    def release(self, lease_id: str):
+        """Frees the slot held by a finished, failed or cancelled operation."""
+        self._state.release(lease_id)
+
+    def renew(self, lease_ids: Iterable[str]):
+        """Extends the leases of running operations; cheap to call often."""
+        now = time.time()
+        if now - self._last_renewal < self._lease_ttl_sec / 4:
+            return
+        self._last_renewal = now
+        self._state.renew(list(lease_ids), now + self._lease_ttl_sec)
+
+    def record_quota_error(self) -> float:
+        """
+        Pauses all starts after Veo rejected one with 429, doubling the pause on consecutive errors.
+
+        Returns:
+            float: Seconds until starts resume.
+        """
+        _, strikes = self._state.get_backoff()
+        strikes += 1
+        backoff_sec = min(self._max_backoff_sec, self._backoff_base_sec * 2 ** (strikes - 1))
+        self._state.set_backoff(time.time() + backoff_sec, strikes)
+        metrics.quota_errors.inc()
+        logger.warning(f"Veo quota exhausted; pausing new operations for {backoff_sec:.0f}s.")
+        return backoff_sec
+
+    def record_success(self):
+        """Resets the 429 backoff once an operation started successfully."""
+        paused_until, strikes = self._state.get_backoff()
+        if strikes:
+            self._state.set_backoff(paused_until, 0)
+
+
+_quota_scheduler = None
+_quota_scheduler_lock = threading.Lock()
+
+
+def get_quota_scheduler() -> QuotaScheduler:
+    """Returns the process-wide quota scheduler configured by the `quota` section of the config."""
+    global _quota_scheduler
+    with _quota_scheduler_lock:
+        if _quota_scheduler is None:
+            config = load_config()
+            quota_config = config.get("quota", {})
+            _quota_scheduler = QuotaScheduler(
+                requests_per_minute=quota_config.get("requests_per_minute", 10),
+                max_concurrent_operations=quota_config.get(
+                    "max_concurrent_operations", get_settings().veo.max_concurrent_operations),
+                lease_db_path=quota_config.get("lease_db_path") or None,
+                lease_ttl_sec=quota_config.get("lease_ttl_sec", 900),
+                backoff_base_sec=quota_config.get("backoff_base_sec", 10),
+                max_backoff_sec=quota_config.get("max_backoff_sec", 300),
+                retry_sec=quota_config.get("retry_sec", 2),
+            )
+    return _quota_scheduler
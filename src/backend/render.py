@@ -0,0 +1,475 @@
+"""Final ad rendering and export: transitions, music bed, text overlay and renditions in single ffmpeg passes"""
+import os
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import ffmpeg
+
+from src.backend import metrics
+from src.backend.clients import get_storage_client
+from src.backend.scratch import get_scratch_space
+from src.backend.signed_urls import get_signed_url, get_signed_urls
+from src.backend.utils import load_config, upload_file_to_gcs, IMMUTABLE_CACHE_CONTROL
+from src.backend.video_ops import (download_from_gcs, local_download_path, probe_clip, conform_video_stream, conform_audio_stream,
+                                   silent_audio)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+config = load_config()
+
+
+def _join_video(videos: list, durations: List[float], transition: str, transition_sec: float):
+    """Chains clips with xfade at every boundary, or concatenates them when transition_sec is 0."""
+    if len(videos) == 1:
+        return videos[0]
+    if transition_sec <= 0:
+        return ffmpeg.concat(*videos, v=1, a=0)
+
+    joined = videos[0]
+    offset = 0.0
+    for video, previous_duration in zip(videos[1:], durations):
+        # Each transition starts transition_sec before the end of the output so far
+        offset += previous_duration - transition_sec
+        joined = ffmpeg.filter([joined, video], 'xfade', transition=transition, duration=transition_sec,
+                               offset=round(offset, 3))
+    return joined
+
+
+def _join_audio(audios: list, transition_sec: float):
+    """Crossfades audio at every boundary, matching the video transitions."""
+    if len(audios) == 1:
+        return audios[0]
+    if transition_sec <= 0:
+        return ffmpeg.concat(*audios, v=0, a=1)
+
+    joined = audios[0]
+    for audio in audios[1:]:
+        joined = ffmpeg.filter([joined, audio], 'acrossfade', d=transition_sec)
+    return joined
+
+
+def build_render_graph(sources: List[str], probes: List[dict], music_source: str = None,
+                       text_file: str = None, render_config: dict = None):
+    """
+    Builds one ffmpeg filter graph for the whole ad.
+
+    Every clip is conformed to the first clip's resolution and frame rate. Clips are
+    joined with xfade/acrossfade transitions. An optional music track is looped under the
+    ad and ducked with sidechaincompress while the clips have sound. An optional product
+    name is drawn over the final frames.
+
+    Args:
+        sources: Local paths or URLs of the clips, in order.
+        probes: `video_ops.probe_clip` results for `sources`.
+        music_source: Optional local path or URL of the background music.
+        text_file: Optional file holding the overlay text. A file is used instead of an inline
+            argument so product names need no filter-graph escaping.
+        render_config: The `render` config section. Defaults to the loaded config.
+
+    Returns:
+        Tuple of (streams, duration_sec): the output streams to encode and the ad length.
+    """
+    render_config = render_config if render_config is not None else config.get("render", {})
+    durations = [probe['duration'] for probe in probes]
+    transition_sec = float(render_config.get("transition_sec", 0.5))
+    if len(sources) > 1 and transition_sec > 0:
+        # A transition can't be longer than half of the shortest clip it touches
+        transition_sec = min(transition_sec, min(durations) / 2)
+    total_sec = sum(durations) - transition_sec * (len(sources) - 1) if transition_sec > 0 else sum(durations)
+
+    width = probes[0]['width'] // 2 * 2
+    height = probes[0]['height'] // 2 * 2
+    fps = probes[0]['fps'] or 24
+
+    clips = [ffmpeg.input(source) for source in sources]
+    video = _join_video(
+        [conform_video_stream(clip.video, width, height, fps) for clip in clips],
+        durations, render_config.get("transition", "fade"), transition_sec,
+    )
+
+    if text_file:
+        overlay_sec = float(render_config.get("text_overlay_sec", 3))
+        drawtext_kwargs = {}
+        if render_config.get("font_file"):
+            drawtext_kwargs['fontfile'] = render_config["font_file"]
+        video = video.filter(
+            'drawtext',
+            textfile=text_file,
+            expansion='none',
+            fontsize=f"h*{render_config.get('font_size_ratio', 0.07)}",
+            fontcolor='white',
+            box=1,
+            boxcolor='black@0.45',
+            boxborderw=20,
+            x='(w-text_w)/2',
+            y='h-text_h-h/10',
+            enable=f"gte(t,{max(0.0, total_sec - overlay_sec):.3f})",
+            **drawtext_kwargs,
+        )
+
+    voice = None
+    if any(probe['audio'] for probe in probes):
+        voice = _join_audio(
+            [conform_audio_stream(clip.audio if probe['audio'] else silent_audio(probe['duration']))
+             for clip, probe in zip(clips, probes)],
+            transition_sec,
+        )
+
+    music = None
+    if music_source:
+        fade_sec = min(1.5, total_sec / 4)
+        music = (
+            conform_audio_stream(ffmpeg.input(music_source, stream_loop=-1, t=total_sec).audio)
+            .filter('volume', render_config.get("music_volume", 0.3))
+            .filter('afade', t='in', d=fade_sec)
+            .filter('afade', t='out', st=round(total_sec - fade_sec, 3), d=fade_sec)
+        )
+
+    if voice is not None and music is not None:
+        if render_config.get("duck_music", True):
+            voice_split = voice.filter_multi_output('asplit', 2)
+            voice, sidechain = voice_split[0], voice_split[1]
+            music = ffmpeg.filter(
+                [music, sidechain], 'sidechaincompress',
+                threshold=render_config.get("duck_threshold", 0.05),
+                ratio=render_config.get("duck_ratio", 8),
+                attack=20,
+                release=400,
+            )
+        audio = ffmpeg.filter([voice, music], 'amix', inputs=2, duration='first', normalize=0)
+    else:
+        audio = voice if voice is not None else music
+
+    streams = [video] if audio is None else [video, audio]
+    return streams, total_sec
+
+
+def _download_targets(gcs_video_urls: List[str], music_uri: Optional[str], local_dir: str) -> List[str]:
+    """Returns the local paths `_download_inputs` writes to, so they can be pinned before downloading."""
+    urls = gcs_video_urls + ([music_uri] if music_uri else [])
+    return [local_download_path(url, local_dir) for url in urls if url.startswith("gs://")]
+
+
+def _download_inputs(gcs_video_urls: List[str], music_uri: Optional[str], local_dir: str):
+    """Downloads clips (and music stored in GCS) and returns (local_paths, music_source)."""
+    local_paths = download_from_gcs(gcs_video_urls, local_dir)
+    music_source = music_uri
+    if music_uri and music_uri.startswith("gs://"):
+        downloaded_music = download_from_gcs([music_uri], local_dir)
+        if not downloaded_music:
+            logger.warning(f"Could not download background music {music_uri}; rendering without it.")
+        music_source = downloaded_music[0] if downloaded_music else None
+    return local_paths, music_source
+
+
+def _write_overlay_text(work_dir: str, product_name: Optional[str], render_config: dict) -> Optional[str]:
+    if not product_name or not product_name.strip() or not render_config.get("text_overlay", True):
+        return None
+    text_file = os.path.join(work_dir, "overlay.txt")
+    with open(text_file, 'w', encoding='utf-8') as f:
+        f.write(product_name.strip())
+    return text_file
+
+
+def needs_render(clip_count: int, product_name: str = None, music_uri: str = None) -> bool:
+    """
+    Returns True if `render.enabled` is on and the ad asks for something a plain merge can't
+    do: a transition between clips, background music or a product-name overlay. Otherwise
+    `merge_video_clips` is cheaper, since it can stream-copy the clips.
+    """
+    render_config = config.get("render", {})
+    if not render_config.get("enabled", False):
+        return False
+    wants_transition = clip_count > 1 and float(render_config.get("transition_sec", 0.5)) > 0
+    wants_music = bool(music_uri or render_config.get("music_uri"))
+    wants_overlay = bool(product_name and product_name.strip() and render_config.get("text_overlay", True))
+    return wants_transition or wants_music or wants_overlay
+
+
+def render_final_ad(gcs_video_urls: List[str], output_location: str, product_name: str = None,
+                    music_uri: str = None, temp_dir: str = None) -> Optional[str]:
+    """
+    Renders the final ad with transitions, background music and a product-name overlay,
+    encoding the whole filter graph in one ffmpeg pass. No intermediate file is written per
+    transition, so render time stays close to linear in the ad duration.
+
+    Args:
+        gcs_video_urls: Ordered list of gs:// clip URIs.
+        output_location: gs:// URI of the rendered ad. A `{hash}` placeholder is replaced by the
+            SHA-256 of the rendered file.
+        product_name: Text drawn over the closing seconds, if `render.text_overlay` is on.
+        music_uri: gs:// URI or local path of the background music. Defaults to `render.music_uri`.
+        temp_dir: Optional directory to download clips into. Defaults to the shared scratch clip cache.
+
+    Returns:
+        A signed URL for the rendered ad, or None if rendering failed.
+    """
+    start = time.perf_counter()
+    render_config = config.get("render", {})
+    merge_config = config.get("merge", {})
+    music_uri = music_uri or render_config.get("music_uri") or None
+
+    scratch = get_scratch_space()
+    local_dir = temp_dir or scratch.cache_dir
+    outcome = "error"
+    try:
+        # Pinned before downloading, so a concurrent enforce_budget can't evict an input before it is used
+        with scratch.pinned(_download_targets(gcs_video_urls, music_uri, local_dir)), \
+                scratch.job_dir("render") as work_dir:
+            local_paths, music_source = _download_inputs(gcs_video_urls, music_uri, local_dir)
+            if not local_paths or len(local_paths) != len(gcs_video_urls):
+                logger.error(f"Downloaded {len(local_paths)} of {len(gcs_video_urls)} clips; "
+                             f"not rendering an incomplete ad.")
+                return None
+
+            text_file = _write_overlay_text(work_dir, product_name, render_config)
+            probes = [probe_clip(path) for path in local_paths]
+            streams, total_sec = build_render_graph(local_paths, probes, music_source, text_file, render_config)
+
+            output_path = os.path.join(work_dir, "final_ad.mp4")
+            output_kwargs = {
+                'vcodec': 'libx264',
+                'preset': merge_config.get("reencode_preset", "veryfast"),
+                'crf': merge_config.get("reencode_crf", 20),
+                'threads': merge_config.get("encoder_threads", 0),
+                'movflags': '+faststart',
+            }
+            if len(streams) > 1:
+                output_kwargs.update(acodec='aac', audio_bitrate='192k')
+            (
+                ffmpeg
+                .output(*streams, output_path, **output_kwargs)
+                .run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
+            )
+            logger.info(f"Rendered {len(local_paths)} clips into a {total_sec:.1f}s ad at {output_path}.")
+
+            with open(output_path, 'rb') as source_file:
+                uploaded_file_path = upload_file_to_gcs(file_object=source_file, gcs_destination_path=output_location,
+                                                        content_type="video/mp4")
+
+        if not uploaded_file_path:
+            return None
+        outcome = "ok"
+        return get_signed_url(uploaded_file_path)
+
+    except ffmpeg.Error as e:
+        logger.error('ffmpeg error while rendering the final ad:')
+        logger.error(e.stderr.decode('utf8', errors='replace') if e.stderr else "")
+        return None
+
+    except Exception as e:
+        logger.error(f"Could not render final ad to {output_location}: {e}")
+        return None
+
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.merges.inc(mode="render", path="filter_graph", outcome=outcome)
+        metrics.merge_seconds.observe(elapsed, mode="render", path="filter_graph")
+        logger.info(f"Render finished with outcome {outcome} in {elapsed:.1f}s.")
+        scratch.enforce_budget()
+
+
+def _parse_bitrate(bitrate) -> int:
+    """Converts an ffmpeg bitrate such as "6M" or "800k" to bits per second."""
+    text = str(bitrate).strip()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(text[-1].lower(), 1)
+    return int(float(text[:-1] if multiplier > 1 else text) * multiplier)
+
+
+def _fit_video_stream(stream, width: int, height: int, fit: str):
+    """Fits the timeline into a rendition frame: "crop" fills the frame, "pad" letterboxes."""
+    if fit == "pad":
+        stream = (stream
+                  .filter('scale', width, height, force_original_aspect_ratio='decrease')
+                  .filter('pad', width, height, '(ow-iw)/2', '(oh-ih)/2'))
+    else:
+        stream = (stream
+                  .filter('scale', width, height, force_original_aspect_ratio='increase')
+                  .filter('crop', width, height))
+    return stream.filter('setsar', 1)
+
+
+def _upload_file(local_path: str, gcs_uri: str, content_type: str) -> str:
+    bucket_name, blob_name = gcs_uri.replace("gs://", "", 1).split('/', 1)
+    blob = get_storage_client().bucket(bucket_name).blob(blob_name)
+    # Export prefixes are unique per export, so the objects are never overwritten
+    blob.cache_control = IMMUTABLE_CACHE_CONTROL
+    blob.upload_from_filename(local_path, content_type=content_type)
+    return gcs_uri
+
+
+_CONTENT_TYPES = {'.mp4': "video/mp4", '.m3u8': "application/vnd.apple.mpegurl", '.ts': "video/mp2t",
+                  '.json': "application/json"}
+
+
+def export_final_ad(gcs_video_urls: List[str], output_prefix: str, product_name: str = None,
+                    music_uri: str = None, renditions: List[dict] = None, temp_dir: str = None) -> Optional[dict]:
+    """
+    Exports the final ad in several renditions (aspect ratios, resolutions, bitrates).
+
+    The timeline is built once with `build_render_graph` and decoded once: a split filter
+    feeds one encoder per rendition inside a single ffmpeg process. With `export.hls`
+    on, every rendition is also remuxed (without re-encoding) into an HLS ladder with a
+    master playlist. Keyframes are aligned to the segment length for this. All files are
+    uploaded concurrently.
+
+    Args:
+        gcs_video_urls: Ordered list of gs:// clip URIs.
+        output_prefix: gs:// prefix the renditions, HLS ladder and manifest are written under.
+            Must be unique to this export (see `storage_paths.export_prefix`); the objects are
+            uploaded with an immutable Cache-Control header.
+        product_name: Text drawn over the closing seconds, if `render.text_overlay` is on.
+        music_uri: gs:// URI or local path of the background music. Defaults to `render.music_uri`.
+        renditions: List of {'name', 'width', 'height', 'video_bitrate', 'audio_bitrate', 'fit'}.
+            Defaults to `export.renditions`.
+        temp_dir: Optional directory to download clips into. Defaults to the shared scratch clip cache.
+
+    Returns:
+        The manifest dict: 'duration_sec', 'renditions' (each with 'gs_uri' and 'signed_url')
+        and 'hls' ({'gs_uri'} of the master playlist, or None). The HLS ladder is not signed:
+        its playlists reference private segments by relative path, so it must be served
+        through a CDN or IAM-authorized delivery rather than a single signed URL. A copy
+        without signed URLs is stored as manifest.json under `output_prefix`. Returns None
+        if the export failed.
+    """
+    start = time.perf_counter()
+    render_config = config.get("render", {})
+    merge_config = config.get("merge", {})
+    export_config = config.get("export", {})
+    renditions = renditions or export_config.get("renditions") or []
+    music_uri = music_uri or render_config.get("music_uri") or None
+    hls = export_config.get("hls", False)
+    hls_segment_sec = export_config.get("hls_segment_sec", 4)
+    output_prefix = output_prefix.rstrip('/')
+    if not renditions:
+        logger.error("No renditions configured for export.")
+        return None
+
+    scratch = get_scratch_space()
+    local_dir = temp_dir or scratch.cache_dir
+    outcome = "error"
+    try:
+        # Pinned before downloading, so a concurrent enforce_budget can't evict an input before it is used
+        with scratch.pinned(_download_targets(gcs_video_urls, music_uri, local_dir)), \
+                scratch.job_dir("export") as work_dir:
+            local_paths, music_source = _download_inputs(gcs_video_urls, music_uri, local_dir)
+            if not local_paths or len(local_paths) != len(gcs_video_urls):
+                logger.error(f"Downloaded {len(local_paths)} of {len(gcs_video_urls)} clips; "
+                             f"not exporting an incomplete ad.")
+                return None
+
+            text_file = _write_overlay_text(work_dir, product_name, render_config)
+            probes = [probe_clip(path) for path in local_paths]
+            streams, total_sec = build_render_graph(local_paths, probes, music_source, text_file, render_config)
+            fps = probes[0]['fps'] or 24
+
+            video_branches = streams[0].filter_multi_output('split', len(renditions))
+            audio_branches = streams[1].filter_multi_output('asplit', len(renditions)) if len(streams) > 1 else None
+
+            outputs, files = [], []
+            for index, rendition in enumerate(renditions):
+                video_bitrate = _parse_bitrate(rendition['video_bitrate'])
+                rendition_streams = [_fit_video_stream(
+                    video_branches[index], rendition['width'], rendition['height'], rendition.get('fit', "crop"))]
+                output_kwargs = {
+                    'vcodec': 'libx264',
+                    'preset': merge_config.get("reencode_preset", "veryfast"),
+                    'video_bitrate': video_bitrate,
+                    'maxrate': video_bitrate,
+                    'bufsize': 2 * video_bitrate,
+                    'pix_fmt': 'yuv420p',
+                    'threads': merge_config.get("encoder_threads", 0),
+                    'movflags': '+faststart',
+                }
+                if hls:
+                    keyframe_interval = max(1, round(fps * hls_segment_sec))
+                    output_kwargs.update(g=keyframe_interval, keyint_min=keyframe_interval, sc_threshold=0)
+                if audio_branches is not None:
+                    rendition_streams.append(audio_branches[index])
+                    output_kwargs.update(acodec='aac', audio_bitrate=rendition.get('audio_bitrate', '128k'))
+
+                local_path = os.path.join(work_dir, f"{rendition['name']}.mp4")
+                outputs.append(ffmpeg.output(*rendition_streams, local_path, **output_kwargs))
+                files.append((local_path, f"{output_prefix}/{rendition['name']}.mp4"))
+
+            ffmpeg.merge_outputs(*outputs).run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
+            logger.info(f"Encoded {len(renditions)} renditions of a {total_sec:.1f}s ad in one pass.")
+
+            hls_master_uri = None
+            if hls:
+                master_lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+                for rendition, (local_path, _) in zip(renditions, files[:len(renditions)]):
+                    hls_dir = os.path.join(work_dir, "hls", rendition['name'])
+                    os.makedirs(hls_dir)
+                    (
+                        ffmpeg
+                        .input(local_path)
+                        .output(os.path.join(hls_dir, "index.m3u8"), c='copy', f='hls',
+                                hls_time=hls_segment_sec, hls_playlist_type='vod',
+                                hls_segment_filename=os.path.join(hls_dir, "segment_%03d.ts"))
+                        .run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
+                    )
+                    bandwidth = _parse_bitrate(rendition['video_bitrate']) + \
+                        _parse_bitrate(rendition.get('audio_bitrate', '128k'))
+                    master_lines += [
+                        f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={rendition['width']}x{rendition['height']}",
+                        f"{rendition['name']}/index.m3u8",
+                    ]
+                    for filename in sorted(os.listdir(hls_dir)):
+                        files.append((os.path.join(hls_dir, filename),
+                                      f"{output_prefix}/hls/{rendition['name']}/{filename}"))
+                master_path = os.path.join(work_dir, "hls", "master.m3u8")
+                with open(master_path, 'w') as f:
+                    f.write("\n".join(master_lines) + "\n")
+                hls_master_uri = f"{output_prefix}/hls/master.m3u8"
+                files.append((master_path, hls_master_uri))
+
+            upload_workers = min(export_config.get("upload_workers", 8), len(files))
+            with ThreadPoolExecutor(max_workers=upload_workers, thread_name_prefix="export-upload") as executor:
+                futures = [
+                    executor.submit(_upload_file, local_path, gcs_uri,
+                                    _CONTENT_TYPES.get(os.path.splitext(local_path)[1], "application/octet-stream"))
+                    for local_path, gcs_uri in files
+                ]
+                for future in futures:
+                    future.result()
+
+            manifest = {
+                'duration_sec': round(total_sec, 3),
+                'renditions': [
+                    {**{key: rendition.get(key) for key in ('name', 'width', 'height', 'video_bitrate')},
+                     'gs_uri': gcs_uri}
+                    for rendition, (_, gcs_uri) in zip(renditions, files)
+                ],
+                'hls': {'gs_uri': hls_master_uri} if hls_master_uri else None,
+            }
+            manifest_path = os.path.join(work_dir, "manifest.json")
+            with open(manifest_path, 'w') as f:
+                json.dump(manifest, f, indent=2)
+            _upload_file(manifest_path, f"{output_prefix}/manifest.json", _CONTENT_TYPES['.json'])
+
+        signed = get_signed_urls([rendition['gs_uri'] for rendition in manifest['renditions']])
+        for rendition in manifest['renditions']:
+            rendition['signed_url'] = signed.get(rendition['gs_uri'])
+        outcome = "ok"
+        return manifest
+
+    except ffmpeg.Error as e:
+        logger.error('ffmpeg error while exporting renditions:')
+        logger.error(e.stderr.decode('utf8', errors='replace') if e.stderr else "")
+        return None
+
+    except Exception as e:
+        logger.error(f"Could not export final ad to {output_prefix}: {e}")
+        return None
+
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.merges.inc(mode="export", path="filter_graph", outcome=outcome)
+        metrics.merge_seconds.observe(elapsed, mode="export", path="filter_graph")
+        logger.info(f"Export of {len(renditions)} renditions finished with outcome {outcome} in {elapsed:.1f}s.")
+        scratch.enforce_budget()
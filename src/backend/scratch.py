@@ -0,0 +1,204 @@
+"""Scratch disk management for video processing"""
+import os
+import time
+import uuid
+import shutil
+import logging
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Dict, Iterable
+
+from src.backend.utils import load_config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass  # Removed while we were walking
+    return total
+
+
+def _process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Owned by another user, but running
+    except OSError:
+        return False
+    return True
+
+
+class ScratchSpace:
+    """
+    Owns all local scratch files under one root directory.
+
+    - `job_dir()` hands out a private working directory that is always removed when the
+      job finishes, whether it succeeded or failed.
+    - `cache_dir` holds downloaded clips shared across jobs. Whenever usage exceeds
+      `max_bytes`, the least recently used cached files are evicted, except for files
+      pinned by running jobs and partial downloads (`*.part`).
+
+    On Cloud Run the filesystem is memory-backed, so `max_bytes` bounds the memory
+    scratch files can take.
+
+    Several processes may share one root. Job directories live under `jobs/<pid>`, and
+    only leftovers of processes that no longer run are removed; partial downloads are
+    removed once nothing has written to them for `stale_part_sec`.
+    """
+
+    def __init__(self, root: str, max_bytes: int, stale_part_sec: float = 3600):
+        self._root = Path(root)
+        self._jobs_root = self._root / "jobs" / str(os.getpid())
+        self._cache_dir = self._root / "cache"
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._active_jobs: Dict[str, Path] = {}
+        self._pinned: Dict[str, int] = {}
+        self._evicted_files = 0
+
+        self._remove_leftovers(stale_part_sec)
+        self._jobs_root.mkdir(parents=True, exist_ok=True)
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _remove_leftovers(self, stale_part_sec: float):
+        """
+        Removes job directories and partial downloads left behind by processes that exited
+        without cleaning up. Files other running processes are still working on are kept.
+        """
+        # A directory under our own PID can only belong to an earlier process that had it
+        shutil.rmtree(self._jobs_root, ignore_errors=True)
+        jobs_parent = self._jobs_root.parent
+        if jobs_parent.is_dir():
+            for pid_dir in jobs_parent.iterdir():
+                if not pid_dir.name.isdigit() or not _process_exists(int(pid_dir.name)):
+                    shutil.rmtree(pid_dir, ignore_errors=True)
+                    logger.info(f"Removed scratch directories left behind by process {pid_dir.name}")
+
+        if self._cache_dir.is_dir():
+            stale_before = time.time() - stale_part_sec
+            for partial_file in self._cache_dir.rglob("*.part"):
+                try:
+                    if partial_file.stat().st_mtime < stale_before:
+                        partial_file.unlink()
+                except OSError:
+                    pass  # Completed or removed by its owner meanwhile
+
+    @property
+    def cache_dir(self) -> str:
+        return str(self._cache_dir)
+
+    @contextmanager
+    def job_dir(self, prefix: str = "job"):
+        """Yields a fresh working directory and removes it with all its contents afterwards."""
+        job_id = f"{prefix}_{uuid.uuid4().hex}"
+        path = self._jobs_root / job_id
+        path.mkdir(parents=True)
+        with self._lock:
+            self._active_jobs[job_id] = path
+        try:
+            yield str(path)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+            with self._lock:
+                del self._active_jobs[job_id]
+            logger.info(f"Cleaned up scratch directory: {path}")
+
+    @contextmanager
+    def pinned(self, paths: Iterable[str]):
+        """
+        Marks cached files as recently used and protects them from eviction while in use.
+
+        Paths may not exist yet: jobs pin the files they are about to download, so a clip
+        can't be evicted between its download and its use.
+        """
+        paths = [os.path.abspath(path) for path in paths]
+        with self._lock:
+            for path in paths:
+                self._pinned[path] = self._pinned.get(path, 0) + 1
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+        try:
+            yield
+        finally:
+            with self._lock:
+                for path in paths:
+                    self._pinned[path] -= 1
+                    if not self._pinned[path]:
+                        del self._pinned[path]
+
+    def enforce_budget(self):
+        """Evicts least recently used cache files until total scratch usage fits `max_bytes`."""
+        with self._lock:
+            job_bytes = sum(_dir_size(path) for path in self._active_jobs.values())
+            cache_files = []
+            for dirpath, _, filenames in os.walk(self._cache_dir):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    cache_files.append((stat.st_mtime, stat.st_size, path))
+
+            total = job_bytes + sum(size for _, size, _ in cache_files)
+            for _, size, path in sorted(cache_files):
+                if total <= self._max_bytes:
+                    break
+                if path in self._pinned or path.endswith(".part"):
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                self._evicted_files += 1
+                logger.info(f"Evicted cached file {path} ({size} bytes)")
+
+        if total > self._max_bytes:
+            logger.warning(f"Scratch usage {total} bytes exceeds budget of {self._max_bytes} bytes "
+                           f"after eviction; remaining files are in use.")
+
+    def usage(self) -> Dict[str, int]:
+        """Returns current scratch usage metrics."""
+        with self._lock:
+            active_jobs = list(self._active_jobs.values())
+            evicted_files = self._evicted_files
+        cache_files = sum(len(filenames) for _, _, filenames in os.walk(self._cache_dir))
+        return {
+            'budget_bytes': self._max_bytes,
+            'job_dirs': len(active_jobs),
+            'job_bytes': sum(_dir_size(path) for path in active_jobs),
+            'cache_files': cache_files,
+            'cache_bytes': _dir_size(self._cache_dir),
+            'evicted_files': evicted_files,
+        }
+
+
+_scratch_space = None
+_scratch_space_lock = threading.Lock()
+
+
+def get_scratch_space() -> ScratchSpace:
+    """Returns the process-wide scratch space configured by the `scratch` section of the config."""
+    global _scratch_space
+    with _scratch_space_lock:
+        if _scratch_space is None:
+            scratch_config = load_config().get("scratch", {})
+            _scratch_space = ScratchSpace(
+                root=scratch_config.get("root", "/tmp/adgen/scratch"),
+                max_bytes=scratch_config.get("max_mb", 2048) * 1024 * 1024,
+                stale_part_sec=scratch_config.get("stale_part_sec", 3600),
+            )
+    return _scratch_space
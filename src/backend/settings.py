@@ -0,0 +1,116 @@
+"""Typed, validated view of config.yaml"""
+from dataclasses import dataclass
+from typing import List
+
+from src.backend.utils import load_config, get_config_version
+
+
+class ConfigError(ValueError):
+    """Raised when config.yaml is missing a required key or has an invalid value."""
+
+
+@dataclass(frozen=True)
+class ProjectSettings:
+    id: str
+    region: str
+
+
+@dataclass(frozen=True)
+class GeminiSettings:
+    model_name: str
+
+
+@dataclass(frozen=True)
+class VeoSettings:
+    model_name: str
+    veo_output_dir: str
+    number_of_videos: int
+    max_concurrent_operations: int
+    prompts: List[str]
+
+
+@dataclass(frozen=True)
+class ImagenSettings:
+    image_output_dir: str
+
+
+@dataclass(frozen=True)
+class Settings:
+    project: ProjectSettings
+    gemini: GeminiSettings
+    veo: VeoSettings
+    imagen: ImagenSettings
+
+
+def _require(config: dict, path: str, expected_type: type):
+    value = config
+    for part in path.split("."):
+        if not isinstance(value, dict) or value.get(part) is None:
+            raise ConfigError(f"Missing required config key: {path}")
+        value = value[part]
+    if not isinstance(value, expected_type):
+        raise ConfigError(f"Config key {path} must be of type {expected_type.__name__}, got {type(value).__name__}")
+    return value
+
+
+def _optional_int(config: dict, path: str, default: int) -> int:
+    section, key = path.split(".")
+    value = (config.get(section) or {}).get(key)
+    if value is None:
+        return default
+    if not isinstance(value, int) or value < 1:
+        raise ConfigError(f"Config key {path} must be a positive integer, got {value!r}")
+    return value
+
+
+def build_settings(config: dict) -> Settings:
+    """
+    Validates a raw config dict and converts it into `Settings`.
+
+    Raises:
+        ConfigError: If a required key is missing or has the wrong type.
+    """
+    veo_output_dir = _require(config, "veo.veo_output_dir", str)
+    image_output_dir = _require(config, "imagen.image_output_dir", str)
+    for path, uri in (("veo.veo_output_dir", veo_output_dir), ("imagen.image_output_dir", image_output_dir)):
+        if not uri.startswith("gs://"):
+            raise ConfigError(f"Config key {path} must be a gs:// URI, got {uri!r}")
+
+    return Settings(
+        project=ProjectSettings(
+            id=_require(config, "project.id", str),
+            region=_require(config, "project.region", str),
+        ),
+        gemini=GeminiSettings(
+            model_name=_require(config, "gemini.model_name", str),
+        ),
+        veo=VeoSettings(
+            model_name=_require(config, "veo.model_name", str),
+            veo_output_dir=veo_output_dir,
+            number_of_videos=_optional_int(config, "veo.number_of_videos", 2),
+            max_concurrent_operations=_optional_int(config, "veo.max_concurrent_operations", 4),
+            prompts=list(_require(config, "veo.prompts", list)),
+        ),
+        imagen=ImagenSettings(
+            image_output_dir=image_output_dir,
+        ),
+    )
+
+
+_settings = None
+_settings_version = None
+
+
+def get_settings() -> Settings:
+    """
+    Returns validated settings for the current config, rebuilding them only after a reload.
+
+    Raises:
+        ConfigError: If the config is invalid.
+    """
+    global _settings, _settings_version
+    version = get_config_version()
+    if _settings is None or version != _settings_version:
+        _settings = build_settings(load_config())
+        _settings_version = version
+    return _settings
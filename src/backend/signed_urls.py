@@ -0,0 +1,152 @@
+"""In-memory cache of signed GCS URLs"""
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import google.auth.credentials
+import google.auth.transport.requests
+
+from src.backend import metrics
+from src.backend.clients import get_storage_client
+from src.backend.utils import load_config, generate_signed_url
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _signing_kwargs() -> dict:
+    """
+    Returns the extra arguments needed to sign with credentials that hold no private key.
+
+    Compute Engine and Cloud Run credentials sign through the IAM signBlob API using an
+    access token. The token is refreshed here once per batch instead of once per URL.
+    Service-account key credentials sign locally and need nothing extra.
+    """
+    credentials = getattr(get_storage_client(), "_credentials", None)
+    if credentials is None or isinstance(credentials, google.auth.credentials.Signing):
+        return {}
+    service_account_email = getattr(credentials, "service_account_email", None)
+    if not service_account_email:
+        return {}
+    if not credentials.valid:
+        credentials.refresh(google.auth.transport.requests.Request())
+    return {'service_account_email': service_account_email, 'access_token': credentials.token}
+
+
+class SignedUrlCache:
+    """
+    Signed GET URLs keyed on gs:// URI, kept until `refresh_margin_sec` before they expire.
+
+    Streamlit reruns the whole page on every interaction, so without the cache every preview
+    clip would be re-signed on every click. Misses in a batch are signed concurrently with
+    one credential refresh.
+    """
+
+    def __init__(self, expiration_sec: int = 3600, refresh_margin_sec: int = 300, sign_workers: int = 8,
+                 max_entries: int = 10000):
+        self._expiration_sec = expiration_sec
+        self._refresh_margin_sec = min(refresh_margin_sec, expiration_sec // 2)
+        self._sign_workers = sign_workers
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}  # gs_uri -> (signed_url, reuse_until)
+
+    def _lookup(self, gs_uri: str, now: float) -> Optional[str]:
+        entry = self._entries.get(gs_uri)
+        if entry and entry[1] > now:
+            return entry[0]
+        return None
+
+    def _store(self, signed: Dict[str, str], signed_at: float):
+        reuse_until = signed_at + self._expiration_sec - self._refresh_margin_sec
+        with self._lock:
+            self._entries.update((gs_uri, (url, reuse_until)) for gs_uri, url in signed.items())
+            if len(self._entries) > self._max_entries:
+                now = time.time()
+                self._entries = {gs_uri: entry for gs_uri, entry in self._entries.items() if entry[1] > now}
+                # Still full of live entries: drop the ones closest to expiry
+                for gs_uri, _ in sorted(self._entries.items(), key=lambda item: item[1][1])[
+                                 :len(self._entries) - self._max_entries]:
+                    del self._entries[gs_uri]
+
+    def get_many(self, gs_uris: List[str]) -> Dict[str, str]:
+        """
+        Returns signed URLs for all the given objects, signing only those not cached.
+
+        Args:
+            gs_uris: gs:// URIs of the objects.
+
+        Returns:
+            Dict[str, str]: Signed URL per gs:// URI. Objects that could not be signed are left out.
+        """
+        now = time.time()
+        result, misses = {}, []
+        with self._lock:
+            for gs_uri in dict.fromkeys(gs_uris):
+                url = self._lookup(gs_uri, now)
+                if url:
+                    result[gs_uri] = url
+                else:
+                    misses.append(gs_uri)
+        if result:
+            metrics.cache_lookups.inc(len(result), cache="signed_url", result="hit")
+        if not misses:
+            return result
+        metrics.cache_lookups.inc(len(misses), cache="signed_url", result="miss")
+
+        signing_kwargs = _signing_kwargs()
+        signed = {}
+
+        def sign(gs_uri):
+            return generate_signed_url(gs_uri, expiration=self._expiration_sec, **signing_kwargs)
+
+        max_workers = max(1, min(self._sign_workers, len(misses)))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="url-sign") as executor:
+            for gs_uri, future in zip(misses, [executor.submit(sign, gs_uri) for gs_uri in misses]):
+                try:
+                    signed[gs_uri] = future.result()
+                except Exception as e:
+                    logger.error(f"Could not sign URL for {gs_uri}: {e}")
+
+        self._store(signed, now)
+        result.update(signed)
+        return result
+
+    def get(self, gs_uri: str) -> Optional[str]:
+        """Returns a signed URL for one object, or None if it could not be signed."""
+        return self.get_many([gs_uri]).get(gs_uri)
+
+    def invalidate(self, gs_uri: str):
+        with self._lock:
+            self._entries.pop(gs_uri, None)
+
+
+_signed_url_cache = None
+_signed_url_cache_lock = threading.Lock()
+
+
+def get_signed_url_cache() -> SignedUrlCache:
+    """Returns the process-wide signed URL cache."""
+    global _signed_url_cache
+    with _signed_url_cache_lock:
+        if _signed_url_cache is None:
+            url_config = load_config().get("signed_urls", {})
+            _signed_url_cache = SignedUrlCache(
+                expiration_sec=url_config.get("expiration_sec", 3600),
+                refresh_margin_sec=url_config.get("refresh_margin_sec", 300),
+                sign_workers=url_config.get("sign_workers", 8),
+                max_entries=url_config.get("max_entries", 10000),
+            )
+    return _signed_url_cache
+
+
+def get_signed_url(gs_uri: str) -> Optional[str]:
+    """Returns a cached signed URL for a gs:// URI, signing it if needed."""
+    return get_signed_url_cache().get(gs_uri)
+
+
+def get_signed_urls(gs_uris: List[str]) -> Dict[str, str]:
+    """Returns cached signed URLs for several gs:// URIs, batch-signing the missing ones."""
+    return get_signed_url_cache().get_many(gs_uris)
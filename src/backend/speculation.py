@@ -0,0 +1,201 @@
+"""Speculative pre-generation of alternate clips while the user reviews"""
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from src.backend import ad_generator
+from src.backend import jobs
+from src.backend import storage_paths
+from src.backend.settings import get_settings
+from src.backend.utils import load_config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SpeculationManager:
+    """
+    Queues low-priority Veo jobs for likely alternatives of each scene, within a per-session budget.
+
+    Once a scene's clips land, Gemini proposes refined variants of its prompt and each
+    variant is submitted as a `jobs.PRIORITY_SPECULATIVE` job. The budget is the total
+    seconds of video (duration x clips per request) a session may speculatively generate;
+    variants served from the clip cache cost nothing. When the user picks an alternative,
+    its job is adopted: promoted to user priority, which also starts it sooner if it is
+    still running, so an alternative is often ready the moment it is asked for.
+
+    Sessions nobody has touched for `session_idle_sec`, e.g. closed tabs, are evicted by
+    `evict_idle` and their unadopted jobs cancelled.
+    """
+
+    def __init__(self, variants_per_scene: int = 2, max_video_sec_per_session: int = 48, workers: int = 2,
+                 session_idle_sec: float = 3600):
+        self._variants_per_scene = variants_per_scene
+        self._max_video_sec_per_session = max_video_sec_per_session
+        self._session_idle_sec = session_idle_sec
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="speculation")
+        self._lock = threading.Lock()
+        # session_id -> {'spent_sec': int, 'last_used_at': float,
+        #                'scenes': {scene_index: {'base_prompts': set, 'alternatives': list}}}
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+
+    def _scene(self, session_id: str, scene_index: int) -> Dict[str, Any]:
+        # Called with the lock held
+        session = self._sessions.setdefault(session_id, {'spent_sec': 0, 'scenes': {}})
+        session['last_used_at'] = time.time()
+        return session['scenes'].setdefault(scene_index, {'base_prompts': set(), 'alternatives': []})
+
+    def speculate(self, session_id: str, scene_index: int, params: Dict[str, Any]):
+        """
+        Starts speculation for a scene in the background, once per scene prompt.
+
+        Args:
+            session_id: The session the scene belongs to.
+            scene_index: Zero-based index of the scene.
+            params: The `video_ops.start_video_generation` arguments the scene's clips were
+                generated with; variants differ only in prompt and output location.
+        """
+        with self._lock:
+            base_prompts = self._scene(session_id, scene_index)['base_prompts']
+            if params['prompt'] in base_prompts:
+                return
+            base_prompts.add(params['prompt'])
+        self._executor.submit(self._speculate, session_id, scene_index, params)
+
+    def _speculate(self, session_id: str, scene_index: int, params: Dict[str, Any]):
+        try:
+            variants = ad_generator.get_prompt_variants(params['prompt'], self._variants_per_scene)
+        except Exception as e:
+            logger.warning(f"Could not propose prompt variants for scene {scene_index}: {e}")
+            return
+
+        cost_sec = params.get('duration_seconds', 5) * get_settings().veo.number_of_videos
+        for variant in variants:
+            with self._lock:
+                session = self._sessions.get(session_id)
+                if session is None:
+                    return  # Discarded while Gemini was answering
+                scene = self._scene(session_id, scene_index)
+                if any(alternative['prompt'] == variant for alternative in scene['alternatives']):
+                    continue
+                if session['spent_sec'] + cost_sec > self._max_video_sec_per_session:
+                    logger.info(f"Speculation budget of session {session_id} exhausted.")
+                    return
+                session['spent_sec'] += cost_sec
+
+            job_id = jobs.submit(
+                dict(params, prompt=variant,
+                     output_location=storage_paths.clip_output_location(session_id, scene_index)),
+                owner=session_id,
+                priority=jobs.PRIORITY_SPECULATIVE,
+                labels={'scene_index': scene_index},
+            )
+            job = jobs.poll(job_id)
+            with self._lock:
+                session = self._sessions.get(session_id)
+                if session is not None:
+                    if job and job['status'] == jobs.SUCCEEDED:
+                        session['spent_sec'] -= cost_sec  # Served from the clip cache
+                    self._scene(session_id, scene_index)['alternatives'].append({'prompt': variant, 'job_id': job_id})
+            if session is None:
+                # Discarded while the job was being submitted; nobody will ever adopt it
+                jobs.cancel(job_id)
+                return
+            logger.info(f"Submitted speculative job {job_id} for scene {scene_index} of session {session_id}")
+
+    def alternatives(self, session_id: str, scene_index: int) -> List[Dict[str, Any]]:
+        """
+        Returns the pre-generated alternatives of a scene.
+
+        Returns:
+            List[Dict[str, Any]]: {'prompt', 'job_id', 'status', 'result'} per alternative,
+            excluding failed and cancelled ones.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session['last_used_at'] = time.time()
+            scene = (session or {}).get('scenes', {}).get(scene_index)
+            candidates = list(scene['alternatives']) if scene else []
+        result = []
+        for alternative in candidates:
+            job = jobs.poll(alternative['job_id'])
+            if job and job['status'] not in (jobs.FAILED, jobs.CANCELLED):
+                result.append(dict(alternative, status=job['status'], result=job['result']))
+        return result
+
+    def adopt(self, session_id: str, scene_index: int, prompt: str) -> Optional[str]:
+        """
+        Takes the alternative generated from `prompt` out of the pool for the scene to use.
+
+        Returns:
+            Optional[str]: Its job id, promoted to user priority, or None
+            if no alternative of the scene was generated from that prompt.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session['last_used_at'] = time.time()
+            scene = (session or {}).get('scenes', {}).get(scene_index)
+            if not scene:
+                return None
+            for alternative in scene['alternatives']:
+                if alternative['prompt'].strip() == prompt.strip():
+                    scene['alternatives'].remove(alternative)
+                    break
+            else:
+                return None
+        job = jobs.poll(alternative['job_id'])
+        if job is None or job['status'] in (jobs.FAILED, jobs.CANCELLED):
+            return None
+        jobs.promote(alternative['job_id'])
+        return alternative['job_id']
+
+    def discard(self, session_id: str):
+        """Cancels a session's unused speculative jobs and forgets its alternatives."""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        self._cancel_alternatives(session)
+
+    def evict_idle(self):
+        """Discards sessions idle for longer than `session_idle_sec`, cancelling their unadopted jobs."""
+        cutoff = time.time() - self._session_idle_sec
+        with self._lock:
+            idle = [session_id for session_id, session in self._sessions.items()
+                    if session['last_used_at'] < cutoff]
+            evicted = [self._sessions.pop(session_id) for session_id in idle]
+        for session in evicted:
+            self._cancel_alternatives(session)
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} idle speculation sessions")
+
+    @staticmethod
+    def _cancel_alternatives(session: Optional[Dict[str, Any]]):
+        for scene in (session or {}).get('scenes', {}).values():
+            for alternative in scene['alternatives']:
+                jobs.cancel(alternative['job_id'])
+
+
+_speculation_manager = None
+_speculation_manager_lock = threading.Lock()
+
+
+def get_speculation_manager() -> Optional[SpeculationManager]:
+    """Returns the process-wide speculation manager, or None if `speculation.enabled` is false."""
+    global _speculation_manager
+    speculation_config = load_config().get("speculation", {})
+    if not speculation_config.get("enabled", False):
+        return None
+    with _speculation_manager_lock:
+        if _speculation_manager is None:
+            _speculation_manager = SpeculationManager(
+                variants_per_scene=speculation_config.get("variants_per_scene", 2),
+                max_video_sec_per_session=speculation_config.get("max_video_sec_per_session", 48),
+                workers=speculation_config.get("workers", 2),
+                session_idle_sec=speculation_config.get("session_idle_sec", 3600),
+            )
+            # Idle sessions expire on the job manager's prune pass
+            jobs.get_job_manager().add_prune_callback(_speculation_manager.evict_idle)
+    return _speculation_manager
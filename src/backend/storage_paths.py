@@ -0,0 +1,70 @@
+# src/backend/storage_paths.py
+
+"""
+GCS object names for everything AdGen writes.
+
+Generated outputs are namespaced by the Streamlit session that produced them, so concurrent
+sessions, retries and app instances never write to the same object:
+
+    {veo_output_dir}/sessions/{session_id}/clips/scene_{n}/{request_id}/...  Veo outputs
+    {veo_output_dir}/sessions/{session_id}/final_ads/{hash}.mp4            merged / rendered ads
+    {veo_output_dir}/sessions/{session_id}/exports/{export_id}/...         multi-rendition exports
+    {image_output_dir}/{hash}{ext}                                         uploaded product images
+
+`{hash}` is resolved to the SHA-256 of the content at upload time (see
+`utils.upload_file_to_gcs`), and request and export ids are random. Uploaded images are
+not namespaced: the content hash already makes their names unique, and the same image
+keeps the same URI across sessions, so its clips stay cacheable. Since no object is ever
+overwritten, uploads carry an immutable Cache-Control header.
+"""
+
+import os
+import uuid
+from typing import Optional
+
+from src.backend.settings import get_settings
+from src.backend.utils import CONTENT_HASH_PLACEHOLDER
+
+
+def _session_prefix(root: str, session_id: Optional[str]) -> str:
+    # Backend callers without a Streamlit session (benchmarks, scripts) share one namespace
+    return f"{root.rstrip('/')}/sessions/{session_id or 'shared'}"
+
+
+def clip_output_location(session_id: Optional[str], scene_index: int) -> str:
+    """
+    Returns a fresh Veo output_gcs_uri for one generation request of a scene.
+
+    Args:
+        session_id: The session the clip belongs to.
+        scene_index: Zero-based index of the scene.
+
+    Returns:
+        str: A gs:// prefix no other request writes to.
+    """
+    return (f"{_session_prefix(get_settings().veo.veo_output_dir, session_id)}"
+            f"/clips/scene_{scene_index}/{uuid.uuid4().hex}")
+
+
+def final_ad_location(session_id: Optional[str]) -> str:
+    """Returns the content-addressed gs:// URI template of a session's final ad."""
+    return f"{_session_prefix(get_settings().veo.veo_output_dir, session_id)}/final_ads/{CONTENT_HASH_PLACEHOLDER}.mp4"
+
+
+def export_prefix(session_id: Optional[str]) -> str:
+    """Returns a fresh gs:// prefix for one multi-rendition export of a session's final ad."""
+    return f"{_session_prefix(get_settings().veo.veo_output_dir, session_id)}/exports/{uuid.uuid4().hex}"
+
+
+def image_location(filename: str) -> str:
+    """
+    Returns the content-addressed gs:// URI template of an uploaded product image.
+
+    Args:
+        filename: Original file name; only its extension is kept.
+
+    Returns:
+        str: A gs:// URI template containing the `{hash}` placeholder.
+    """
+    extension = os.path.splitext(filename or "")[1].lower()
+    return f"{get_settings().imagen.image_output_dir.rstrip('/')}/{CONTENT_HASH_PLACEHOLDER}{extension}"
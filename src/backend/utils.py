@@ -1,46 +1,134 @@
+import os
 import yaml
+import hashlib
 import logging
+import threading
 from pathlib import Path
 from typing import Optional, BinaryIO
 
-from google.cloud import storage
+from src.backend.clients import get_storage_client
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+CONFIG_FILE = Path(__file__).parent.parent / "config.yaml"
+
+# Environment variables of the form ADGEN__SECTION__KEY=value override config.yaml entries,
+# e.g. ADGEN__VEO__MAX_CONCURRENT_OPERATIONS=2. Values are parsed as YAML scalars.
+CONFIG_ENV_PREFIX = "ADGEN__"
+
+# Destination paths containing this placeholder are named after the SHA-256 of their content
+CONTENT_HASH_PLACEHOLDER = "{hash}"
+CONTENT_HASH_LENGTH = 32
+# Objects that are never overwritten can be cached forever by browsers and CDNs
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_config = {}
+_config_signature = None
+_config_version = 0
+_config_lock = threading.Lock()
+
+
+def _config_env_overrides() -> dict:
+    return {name: value for name, value in os.environ.items() if name.startswith(CONFIG_ENV_PREFIX)}
+
+
+def _apply_env_overrides(config: dict, overrides: dict):
+    for name, value in overrides.items():
+        path = [part.lower() for part in name[len(CONFIG_ENV_PREFIX):].split("__") if part]
+        if not path:
+            continue
+        section = config
+        for part in path[:-1]:
+            if not isinstance(section.get(part), dict):
+                section[part] = {}
+            section = section[part]
+        section[path[-1]] = yaml.safe_load(value)
+
 
 def load_config():
     """
-    Loads the configuration from a YAML file located at the project's root.
+    Returns the process-wide configuration loaded from the YAML file at the project's root.
+
+    The file is parsed once and shared by every caller. It is re-read only when its
+    modification time or the ADGEN__* environment overrides change; the shared dict is
+    then updated in place, so module-level references pick up the new values.
+    Callers must treat the returned dict as read-only.
 
     Returns:
-        dict: The parsed YAML configuration.
+        dict: The parsed YAML configuration with environment overrides applied.
 
     Raises:
         FileNotFoundError: If the config file doesn't exist.
         yaml.YAMLError: If there's an error parsing the YAML file.
     """
-    config_file = Path(__file__).parent.parent / "config.yaml"
-    logger.info(f"Loading config: {config_file}")
+    global _config_signature, _config_version
 
-    if not config_file.exists():
-        raise FileNotFoundError(f"Config file not found: {config_file}")
+    if not CONFIG_FILE.exists():
+        raise FileNotFoundError(f"Config file not found: {CONFIG_FILE}")
+
+    overrides = _config_env_overrides()
+    signature = (CONFIG_FILE.stat().st_mtime_ns, tuple(sorted(overrides.items())))
+    if signature == _config_signature:
+        return _config
+
+    with _config_lock:
+        if signature == _config_signature:
+            return _config
+
+        logger.info(f"Loading config: {CONFIG_FILE}")
+        try:
+            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+                loaded = yaml.safe_load(f) or {}
+        except yaml.YAMLError as e:
+            raise yaml.YAMLError(f"Error parsing config file: {e}")
+        _apply_env_overrides(loaded, overrides)
+
+        # Update in place (new keys first) so readers never see a partially emptied config
+        _config.update(loaded)
+        for key in set(_config) - set(loaded):
+            del _config[key]
+        _config_signature = signature
+        _config_version += 1
+    return _config
 
-    try:
-        with open(config_file, "r", encoding="utf-8") as f:
-            return yaml.safe_load(f)
-    except yaml.YAMLError as e:
-        raise yaml.YAMLError(f"Error parsing config file: {e}")
 
+def get_config_version() -> int:
+    """Returns a counter that increases every time the config is (re)loaded."""
+    load_config()
+    return _config_version
 
-def upload_file_to_gcs(file_object: BinaryIO, gcs_destination_path: str) -> Optional[str]:
+
+def content_hash(file_object: BinaryIO) -> str:
+    """Returns the SHA-256 hex digest of a seekable file-like object and rewinds it."""
+    digest = hashlib.sha256()
+    file_object.seek(0)
+    for chunk in iter(lambda: file_object.read(1024 * 1024), b''):
+        digest.update(chunk)
+    file_object.seek(0)
+    return digest.hexdigest()
+
+
+def resolve_content_address(gcs_destination_path: str, digest: str) -> str:
+    """Substitutes the content hash for the `{hash}` placeholder of a destination path."""
+    return gcs_destination_path.replace(CONTENT_HASH_PLACEHOLDER, digest[:CONTENT_HASH_LENGTH])
+
+
+def upload_file_to_gcs(file_object: BinaryIO, gcs_destination_path: str, content_type: str = None,
+                       cache_control: str = None) -> Optional[str]:
     """
     Uploads a file-like object to GCS.
 
+    If the destination contains the `{hash}` placeholder, it is replaced by the SHA-256 of
+    the content and the object is uploaded with `IMMUTABLE_CACHE_CONTROL`. An object that
+    already exists under that name has identical content, so it is not uploaded again.
+
     Args:
         file_object: The file-like object from st.file_uploader.
         gcs_destination_path (str): The full path including bucket name (e.g., 'your-bucket/your-folder/your-file.png').
+        content_type (str): Optional MIME type of the object.
+        cache_control (str): Optional Cache-Control header of the object.
 
     Returns:
         Optional[str]: The GCS URI (gs://...) of the uploaded file if successful, None otherwise.
@@ -49,19 +137,30 @@ def upload_file_to_gcs(file_object: BinaryIO, gcs_destination_path: str) -> Opti
         logger.info("No file provided for GCS upload.")
         return None
 
-    storage_client_instance = storage.Client()
+    storage_client_instance = get_storage_client()
 
     try:
         # Split the destination blob name into bucket and blob path
         if gcs_destination_path.startswith("gs://"):
             gcs_destination_path = gcs_destination_path.replace("gs://", "")
 
+        content_addressed = CONTENT_HASH_PLACEHOLDER in gcs_destination_path
+        if content_addressed:
+            gcs_destination_path = resolve_content_address(gcs_destination_path, content_hash(file_object))
+            cache_control = cache_control or IMMUTABLE_CACHE_CONTROL
+
         bucket_name, blob_name = gcs_destination_path.split('/', 1)
         bucket = storage_client_instance.bucket(bucket_name)
         blob = bucket.blob(blob_name)
 
+        if content_addressed and blob.exists():
+            logger.info(f"Content-addressed object already exists: gs://{bucket_name}/{blob_name}")
+            return f"gs://{bucket_name}/{blob_name}"
+
         # Upload the file object directly
-        blob.upload_from_file(file_object)
+        if cache_control:
+            blob.cache_control = cache_control
+        blob.upload_from_file(file_object, content_type=content_type)
 
         gcs_uri = f"gs://{bucket_name}/{blob_name}"
         logger.info(f"Successfully uploaded file to GCS: {gcs_uri}")
@@ -72,13 +171,25 @@ def upload_file_to_gcs(file_object: BinaryIO, gcs_destination_path: str) -> Opti
         return None
 
 
-def generate_signed_url(gcs_file_path: str):
+def generate_signed_url(gcs_file_path: str, expiration: int = 3600, **signing_kwargs):
+    """
+    Signs a V4 GET URL for a GCS object. Prefer `signed_urls.get_signed_url`, which caches.
+
+    Args:
+        gcs_file_path (str): gs:// URI or 'bucket/blob' path of the object.
+        expiration (int): Lifetime of the URL in seconds.
+        **signing_kwargs: Passed to `Blob.generate_signed_url`, e.g. service_account_email
+            and access_token for credentials without a private key.
+
+    Returns:
+        str: The signed URL.
+    """
     if gcs_file_path.startswith("gs://"):
         gcs_file_path = gcs_file_path.replace("gs://", "")
     bucket_name, blob_name = gcs_file_path.split('/', 1)
 
-    client = storage.Client()
+    client = get_storage_client()
     bucket = client.bucket(bucket_name)
     blob = bucket.blob(blob_name)
-    url = blob.generate_signed_url(version="v4", expiration=3600)
+    url = blob.generate_signed_url(version="v4", expiration=expiration, **signing_kwargs)
     return url
@@ -2,15 +2,27 @@
 
 import os
 import time
+import uuid
+import base64
+import hashlib
 import logging
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import ffmpeg
-from google import genai
-from google.cloud import storage
-from google.genai.types import GenerateVideosConfig, Image
-
-from src.backend.utils import load_config, upload_file_to_gcs, generate_signed_url
+import google_crc32c
+from google.cloud.storage import transfer_manager
+from google.genai.types import GenerateVideosConfig, GenerateVideosOperation, Image
+
+from src.backend import metrics
+from src.backend.clients import get_genai_client, get_storage_client
+from src.backend.clip_cache import clip_cache_key, get_clip_cache
+from src.backend.scratch import get_scratch_space
+from src.backend.settings import get_settings
+from src.backend.signed_urls import get_signed_url, get_signed_urls
+from src.backend.utils import (load_config, upload_file_to_gcs, resolve_content_address, CONTENT_HASH_PLACEHOLDER,
+                               IMMUTABLE_CACHE_CONTROL)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,52 +30,7 @@ logger = logging.getLogger(__name__)
 config = load_config()
 
 
-# def generate_video_clip(
-#         prompt: str,
-#         output_location: str,
-#         aspect_ratio: str,
-#         duration_seconds: str,
-#         person_generation: str,
-#         negative_prompt: str = None,
-#         image_gcs_uri: str = None,
-#         metadata: dict = None,
-# ):
-#     # Simulate the time taken by a video generation API call
-#     import time
-#     time.sleep(5)
-
-#     generated_clips_data = []
-#     storage_client_instance = storage.Client()
-
-#     parsed_url = urlparse(output_location)
-#     bucket_name = parsed_url.netloc
-#     prefix = parsed_url.path.lstrip('/')
-
-#     try:
-#         bucket = storage_client_instance.get_bucket(bucket_name)
-#         blobs = bucket.list_blobs(prefix=prefix)
-
-#         for blob in blobs:
-#             if blob.name == prefix + "/":
-#                 continue
-
-#             gs_uri = f"gs://{bucket_name}/{blob.name}"
-#             http_url = f"https://storage.cloud.google.com/{bucket_name}/{blob.name}"
-
-#             generated_clips_data.append({
-#                 'gs_uri': gs_uri,
-#                 'http_url': http_url
-#             })
-
-#     except Exception as e:
-#         logging.error(f"Error listing blobs or generating signed URLs at {output_location}: {e}")
-#         return []
-
-#     logging.info(f"Simulated generated video data (gs_uri and signed http_url) by listing: {generated_clips_data}")
-#     return generated_clips_data
-
-
-def generate_video_clip(
+def start_video_generation(
         prompt: str,
         output_location: str,
         aspect_ratio: str,
@@ -74,7 +41,7 @@ def generate_video_clip(
         metadata: dict = None,
 ):
     """
-    Generates video clips using a generative model Veo2.
+    Submits a Veo2 video generation request without waiting for it to finish.
 
     Args:
         prompt: Text prompt for video generation.
@@ -87,52 +54,162 @@ def generate_video_clip(
         metadata: Optional dictionary for metadata (not used in API call).
 
     Returns:
-        A list of dictionaries, each containing 'gs_uri' and 'http_url'
-        for the generated video clips. Empty list if generation fails.
+        The long-running Veo operation. Its `name` can be persisted and passed to
+        `get_video_operation` to check progress later.
     """
 
-    os.environ["GOOGLE_CLOUD_PROJECT"] = config["project"]["id"]
-    os.environ["GOOGLE_CLOUD_LOCATION"] = config["project"]["region"]
-    os.environ["GOOGLE_GENAI_USE_VERTEXAI"] = "True"
-
     image_param = None
     if image_gcs_uri:
         image_param = Image(gcs_uri=image_gcs_uri, mime_type="image/png")
 
-    requested_number_of_videos = 2
+    model_name = get_settings().veo.model_name
+    requested_number_of_videos = _number_of_videos()
 
     # Handle duration
-    duration_seconds = max(5, min(duration_seconds, 8))
-
-    client = genai.Client()
-    operation = client.models.generate_videos(
-        model=config["veo"]["model_name"],
-        # image=image_param,
-        prompt=prompt,
-        config=GenerateVideosConfig(
-            aspect_ratio=aspect_ratio,
-            output_gcs_uri=output_location,
-            number_of_videos=requested_number_of_videos,
-            duration_seconds=duration_seconds,
-            person_generation=person_generation,
-            negative_prompt=negative_prompt,
-            enhance_prompt=True,
-            seed=None,
-
-        ),
+    duration_seconds = clamp_duration(duration_seconds)
+
+    client = get_genai_client()
+    with metrics.track_call("veo.generate_videos", model_name, prompt):
+        operation = client.models.generate_videos(
+            model=model_name,
+            # image=image_param,
+            prompt=prompt,
+            config=GenerateVideosConfig(
+                aspect_ratio=aspect_ratio,
+                output_gcs_uri=output_location,
+                number_of_videos=requested_number_of_videos,
+                duration_seconds=duration_seconds,
+                person_generation=person_generation,
+                negative_prompt=negative_prompt,
+                enhance_prompt=True,
+                seed=None,
+
+            ),
+        )
+    logger.info(f"Submitted video generation operation: {operation.name}")
+    return operation
+
+
+def _number_of_videos() -> int:
+    return get_settings().veo.number_of_videos
+
+
+def clamp_duration(duration_seconds: int) -> int:
+    """Clamps a requested clip length to the 5-8 seconds Veo supports."""
+    return max(5, min(duration_seconds, 8))
+
+
+def _request_cache_key(params: dict) -> str:
+    """Cache key for a request given as `start_video_generation` keyword arguments."""
+    return clip_cache_key(
+        model_name=get_settings().veo.model_name,
+        prompt=params['prompt'],
+        negative_prompt=params.get('negative_prompt'),
+        aspect_ratio=params['aspect_ratio'],
+        duration_seconds=clamp_duration(params['duration_seconds']),
+        person_generation=params['person_generation'],
+        image_gcs_uri=params.get('image_gcs_uri'),
+        number_of_videos=_number_of_videos(),
+    )
+
+
+def get_cached_clips(params: dict):
+    """
+    Looks up previously generated clips for an identical request.
+
+    Args:
+        params: Keyword arguments accepted by `start_video_generation`.
+
+    Returns:
+        The cached list of clip dictionaries, or None on a miss or cache error.
+    """
+    try:
+        cached_clips = get_clip_cache().get(_request_cache_key(params))
+    except Exception as e:
+        logger.warning(f"Clip cache lookup failed: {e}")
+        metrics.cache_lookups.inc(cache="clip", result="error")
+        return None
+    metrics.cache_lookups.inc(cache="clip", result="hit" if cached_clips else "miss")
+    if cached_clips:
+        logger.info(f"Clip cache hit for prompt: {params['prompt'][:50]}...")
+    return cached_clips or None
+
+
+def cache_generated_clips(params: dict, generated_clips_data: list):
+    """Stores generated clips for a request so identical requests can reuse them."""
+    if not generated_clips_data:
+        return
+    try:
+        get_clip_cache().put(_request_cache_key(params), generated_clips_data)
+    except Exception as e:
+        logger.warning(f"Clip cache write failed: {e}")
+
+
+def record_video_operation(params: dict, outcome: str, poll_stats: dict = None, queue_sec: float = None,
+                           error=None):
+    """
+    Records a finished Veo operation, from submission to the poll that saw it finish.
+
+    Args:
+        params: Keyword arguments the operation was started with.
+        outcome: "ok", "error" or "cancelled".
+        poll_stats: Dict returned by `PollScheduler.record_done` or `PollScheduler.untrack`.
+        queue_sec: Time the request waited for a free slot before it was submitted.
+        error: Exception or message if the operation failed.
+    """
+    poll_stats = poll_stats or {}
+    poll_sec = poll_stats.get('elapsed')
+    extra = {'error': str(error)} if error is not None else {}
+    metrics.record_call(
+        api="veo.operation",
+        model=get_settings().veo.model_name,
+        outcome=outcome,
+        wall_sec=(queue_sec or 0) + (poll_sec or 0),
+        prompt_chars=len(params.get('prompt') or ""),
+        queue_sec=queue_sec,
+        poll_sec=poll_sec,
+        polls=poll_stats.get('polls'),
+        retries=poll_stats.get('poll_errors', 0),
+        **extra,
     )
 
-    logger.info("Waiting for operation to complete.")
 
-    while not operation.done:
-        time.sleep(10)
-        operation = client.operations.get(operation)
+def get_video_operation(operation):
+    """
+    Fetches the latest state of a Veo operation.
 
-    print("operation: ", operation)
-    logger.info("Operation Completed!")
+    Args:
+        operation: A `GenerateVideosOperation` or the operation name string.
 
+    Returns:
+        The refreshed `GenerateVideosOperation`.
+    """
+    if isinstance(operation, str):
+        operation = GenerateVideosOperation(name=operation)
+
+    client = get_genai_client()
+    return client.operations.get(operation)
+
+
+def extract_generated_clips(operation):
+    """
+    Converts a completed Veo operation into clip data.
+
+    Args:
+        operation: A completed `GenerateVideosOperation`.
+
+    Returns:
+        A list of dictionaries, each containing 'gs_uri' and 'http_url'.
+
+    Raises:
+        RuntimeError: If the operation finished with an error.
+    """
+    if operation.error:
+        raise RuntimeError(f"Video generation operation {operation.name} failed: {operation.error}")
+
+    generated_videos = operation.result.generated_videos if operation.result else None
     generated_clips_data = []
-    for video_result_item in operation.result.generated_videos:
+    for video_result_item in generated_videos or []:
         video_uri = video_result_item.video.uri
 
         parts = video_uri[len("gs://"):].split('/', 1)
@@ -147,97 +224,478 @@ def generate_video_clip(
     return generated_clips_data
 
 
+def _crc32c_of_file(path: str) -> str:
+    """Returns the base64-encoded CRC32C of a local file, in the format GCS reports for blobs."""
+    checksum = google_crc32c.Checksum()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            checksum.update(chunk)
+    return base64.b64encode(checksum.digest()).decode('utf-8')
+
+
+def local_download_path(url: str, local_dir: str) -> str:
+    """Returns where `download_from_gcs` stores a gs:// object inside `local_dir`."""
+    blob_name = url[5:].split('/', 1)[1]
+    return os.path.join(local_dir, os.path.basename(os.path.dirname(blob_name)), os.path.basename(blob_name))
+
+
+def _download_blob(storage_client, url: str, local_dir: str) -> str:
+    """
+    Downloads one gs:// object into `local_dir`, reusing an existing local copy whose
+    CRC32C matches the blob. Large blobs are fetched as concurrent byte ranges.
+
+    Returns:
+        str: The local file path.
+    """
+    gcs_config = config.get("gcs", {})
+    chunked_threshold = gcs_config.get("chunked_download_threshold_mb", 64) * 1024 * 1024
+    chunk_size = gcs_config.get("download_chunk_size_mb", 16) * 1024 * 1024
+
+    bucket_name, blob_name = url[5:].split('/', 1)
+    blob = storage_client.bucket(bucket_name).get_blob(blob_name)
+    if blob is None:
+        raise FileNotFoundError(f"GCS object not found: {url}")
+
+    local_filename = local_download_path(url, local_dir)
+    os.makedirs(os.path.dirname(local_filename), exist_ok=True)
+
+    if os.path.exists(local_filename) and blob.crc32c and _crc32c_of_file(local_filename) == blob.crc32c:
+        logger.info(f"Using cached copy of {url} at {local_filename}")
+        return local_filename
+
+    # The cache directory is shared by every job: concurrent downloads of the same clip
+    # each write their own partial file, and the last complete one atomically wins
+    fd, partial_filename = tempfile.mkstemp(
+        dir=os.path.dirname(local_filename), prefix=f"{os.path.basename(local_filename)}.", suffix=".part")
+    os.close(fd)
+    try:
+        if blob.size and blob.size >= chunked_threshold:
+            transfer_manager.download_chunks_concurrently(
+                blob, partial_filename, chunk_size=chunk_size, worker_type=transfer_manager.THREAD
+            )
+        else:
+            blob.download_to_filename(partial_filename, checksum=None)
+
+        if blob.crc32c and _crc32c_of_file(partial_filename) != blob.crc32c:
+            raise ValueError(f"CRC32C mismatch for {url}")
+
+        os.replace(partial_filename, local_filename)
+    except BaseException:
+        try:
+            os.remove(partial_filename)
+        except OSError:
+            pass
+        raise
+    logger.info(f"Downloaded {url} to {local_filename}")
+    return local_filename
+
+
 def download_from_gcs(gcs_urls, local_dir="temp_videos"):
-    if not os.path.exists(local_dir):
-        os.makedirs(local_dir)
+    """
+    Downloads gs:// objects in parallel, verifying each against its CRC32C.
 
-    storage_client = storage.Client()
-    local_paths = []
+    Files already present in `local_dir` with a matching checksum are not fetched again.
+
+    Args:
+        gcs_urls: List of gs:// URIs.
+        local_dir: Directory to download into.
+
+    Returns:
+        List of local file paths, in the order of `gcs_urls`. URLs that fail to download are skipped,
+        so callers that need every clip must compare the count against `gcs_urls`.
+    """
+    os.makedirs(local_dir, exist_ok=True)
 
+    valid_urls = []
     for url in gcs_urls:
         if not url.startswith("gs://"):
             logger.error(f"Invalid GCS URL format (expected gs://): {url}")
             continue
+        valid_urls.append(url)
+    if not valid_urls:
+        return []
 
-        try:
-            parts = url[5:].split('/', 1)
-            bucket_name = parts[0]
-            blob_name = parts[1]
-
-            parent_dir_name = os.path.basename(os.path.dirname(blob_name))
-            if not os.path.exists(os.path.join(local_dir, parent_dir_name)):
-                os.makedirs(os.path.join(local_dir, parent_dir_name))
-
-            local_filename = os.path.join(local_dir, parent_dir_name, os.path.basename(blob_name))
-            bucket = storage_client.bucket(bucket_name)
-            blob = bucket.blob(blob_name)
-            blob.download_to_filename(local_filename)
-            local_paths.append(local_filename)
-            logger.info(f"Downloaded {url} to {local_filename}")
-        except Exception as e:
-            logger.error(f"Error downloading {url}: {e}")
+    storage_client = get_storage_client()
+    max_workers = min(config.get("gcs", {}).get("download_workers", 8), len(valid_urls))
+
+    local_paths = []
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gcs-download") as executor:
+        futures = [executor.submit(_download_blob, storage_client, url, local_dir) for url in valid_urls]
+        for url, future in zip(valid_urls, futures):
+            try:
+                local_paths.append(future.result())
+            except Exception as e:
+                logger.error(f"Error downloading {url}: {e}")
 
     return local_paths
 
 
-def merge_video_clips(gcs_video_urls, output_location, temp_dir="temp_videos"):
-    local_paths = download_from_gcs(gcs_video_urls, temp_dir)
+def _delete_blob_quietly(blob):
+    """Removes a partially written output object, ignoring errors if it was never created."""
+    try:
+        blob.delete()
+    except Exception as e:
+        logger.warning(f"Could not delete partial object {blob.name}: {e}")
 
-    if not local_paths:
-        logger.error("No videos downloaded for merging.")
-        return
 
-    list_content = ""
-    for path in local_paths:
-        absolute_path = os.path.abspath(path)
-        formatted_path = absolute_path.replace('\\', '/')
-        list_content += f"file '{formatted_path}'\n"
+def _parse_frame_rate(rate: str) -> float:
+    numerator, _, denominator = (rate or "0/1").partition('/')
+    return float(numerator) / float(denominator or 1) if float(denominator or 1) else 0.0
 
-    try:
-        with tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix='.txt', dir=temp_dir) as f:
-            temp_list_filepath = f.name
-            f.write(list_content)
 
-        logger.info(f"Created temporary file list: {temp_list_filepath}")
+def probe_clip(source: str) -> dict:
+    """
+    Reads the stream parameters of a clip with ffprobe.
+
+    Args:
+        source: Local path or URL of the clip.
+
+    Returns:
+        A dict with 'video' and 'audio' signatures (audio is None for silent clips), which
+        must match across clips for stream-copy concatenation, plus 'width', 'height',
+        'fps' and 'duration'.
+
+    Raises:
+        ffmpeg.Error: If ffprobe cannot read the clip.
+        ValueError: If the clip has no video stream.
+    """
+    info = ffmpeg.probe(source)
+    video = next((stream for stream in info['streams'] if stream['codec_type'] == 'video'), None)
+    audio = next((stream for stream in info['streams'] if stream['codec_type'] == 'audio'), None)
+    if video is None:
+        raise ValueError(f"No video stream in {source}")
+
+    return {
+        'video': (video['codec_name'], video.get('profile'), video['width'], video['height'],
+                  video.get('pix_fmt'), video.get('r_frame_rate'), video.get('time_base')),
+        'audio': None if audio is None else (audio['codec_name'], audio.get('sample_rate'),
+                                             audio.get('channels'), audio.get('time_base')),
+        'width': video['width'],
+        'height': video['height'],
+        'fps': _parse_frame_rate(video.get('r_frame_rate')),
+        'duration': float(info.get('format', {}).get('duration') or video.get('duration') or 0),
+    }
+
+
+def choose_merge_path(probes: list) -> str:
+    """
+    Picks the cheapest way to concatenate clips.
+
+    Returns:
+        str: "copy" if every clip has the same codecs, resolution, frame rate and time base
+        (and `merge.force_reencode` is off), otherwise "reencode".
+    """
+    if config.get("merge", {}).get("force_reencode", False):
+        return "reencode"
+    first = probes[0]
+    compatible = all(probe['video'] == first['video'] and probe['audio'] == first['audio'] for probe in probes)
+    return "copy" if compatible else "reencode"
+
+
+def conform_video_stream(stream, width: int, height: int, fps: float):
+    """Scales and pads a video stream to width x height, square pixels, a fixed frame rate and yuv420p."""
+    return (
+        stream
+        .filter('scale', width, height, force_original_aspect_ratio='decrease')
+        .filter('pad', width, height, '(ow-iw)/2', '(oh-ih)/2')
+        .filter('setsar', 1)
+        .filter('fps', fps=fps)
+        .filter('format', 'yuv420p')
+    )
+
+
+def conform_audio_stream(stream):
+    """Resamples an audio stream to 48 kHz stereo so streams can be joined or mixed."""
+    return stream.filter('aresample', 48000).filter('aformat', channel_layouts='stereo')
+
+
+def silent_audio(duration: float):
+    """Returns a generated silent audio stream of the given length, for clips without audio."""
+    return ffmpeg.input('anullsrc=channel_layout=stereo:sample_rate=48000', f='lavfi', t=duration).audio
+
+
+def _concat_streams(sources: list, probes: list, merge_path: str, list_filepath: str, remote: bool = False):
+    """
+    Builds the ffmpeg input graph for a concat.
 
-        absolute_temp_list_filepath = os.path.abspath(temp_list_filepath)
-        formatted_temp_list_filepath = absolute_temp_list_filepath.replace('\\', '/')
+    "copy" reads all clips through the concat demuxer. "reencode" builds a single
+    filter_complex that conforms every clip to the first clip's resolution and frame rate
+    and joins them with the concat filter. Silent clips get a generated silent track when
+    other clips have audio.
 
-        with tempfile.NamedTemporaryFile(mode='wb', delete=True, suffix="final_ad.mp4",
-                                         dir=temp_dir) as temp_output_file:
-            temp_file_path = temp_output_file.name
-            (
+    Returns:
+        Tuple of (streams, output_kwargs) to pass to `ffmpeg.output`.
+    """
+    merge_config = config.get("merge", {})
+    if merge_path == "copy":
+        input_kwargs = {'protocol_whitelist': 'file,http,https,tcp,tls,crypto'} if remote else {}
+        return [ffmpeg.input(list_filepath, f='concat', safe=0, **input_kwargs)], {'c': 'copy'}
+
+    # libx264 needs even dimensions
+    width = probes[0]['width'] // 2 * 2
+    height = probes[0]['height'] // 2 * 2
+    fps = probes[0]['fps'] or 24
+    with_audio = any(probe['audio'] for probe in probes)
+
+    segments = []
+    for source, probe in zip(sources, probes):
+        clip = ffmpeg.input(source)
+        segments.append(conform_video_stream(clip.video, width, height, fps))
+        if with_audio:
+            segments.append(conform_audio_stream(clip.audio if probe['audio'] else silent_audio(probe['duration'])))
+
+    joined = ffmpeg.concat(*segments, v=1, a=1 if with_audio else 0).node
+    streams = [joined[0], joined[1]] if with_audio else [joined[0]]
+    output_kwargs = {
+        'vcodec': 'libx264',
+        'preset': merge_config.get("reencode_preset", "veryfast"),
+        'crf': merge_config.get("reencode_crf", 20),
+        'threads': merge_config.get("encoder_threads", 0),
+    }
+    if with_audio:
+        output_kwargs.update(acodec='aac', audio_bitrate='192k')
+    return streams, output_kwargs
+
+
+def _merge_attempts(merge_path: str) -> list:
+    # Matching probes don't guarantee the demuxer accepts the clips; re-encoding always works
+    return ["copy", "reencode"] if merge_path == "copy" else ["reencode"]
+
+
+def _record_merge(mode: str, merge_path: str, outcome: str, start: float, clips: int):
+    elapsed = time.perf_counter() - start
+    metrics.merges.inc(mode=mode, path=merge_path, outcome=outcome)
+    metrics.merge_seconds.observe(elapsed, mode=mode, path=merge_path)
+    logger.info(f"Merge of {clips} clips ({mode}) finished with outcome {outcome} "
+                f"using the {merge_path} path in {elapsed:.1f}s.")
+
+
+def merge_video_clips_streaming(gcs_video_urls, output_location):
+    """
+    Merges clips without staging them on local disk.
+
+    ffmpeg reads each clip directly from a signed HTTPS URL and writes a fragmented MP4
+    to stdout, which is streamed into a resumable GCS upload. Compatible clips are
+    stream-copied through the concat demuxer; otherwise they are re-encoded in one pass.
+    Only the small concat list file touches the filesystem.
+
+    Args:
+        gcs_video_urls: Ordered list of gs:// clip URIs.
+        output_location: gs:// URI of the merged video. A `{hash}` placeholder is replaced by the
+            SHA-256 of the merged file.
+
+    Returns:
+        A signed URL for the merged video, or None if merging failed.
+    """
+    if not gcs_video_urls:
+        logger.error("No videos provided for merging.")
+        return None
+
+    start = time.perf_counter()
+    merge_config = config.get("merge", {})
+    chunk_size = merge_config.get("upload_chunk_size_mb", 8) * 1024 * 1024
+
+    signed = get_signed_urls(gcs_video_urls)
+    if len(signed) != len(set(gcs_video_urls)):
+        logger.error("Could not sign URLs for every clip to merge.")
+        _record_merge("streaming", "probe", "error", start, len(gcs_video_urls))
+        return None
+    signed_urls = [signed[url] for url in gcs_video_urls]
+    try:
+        probes = [probe_clip(url) for url in signed_urls]
+    except (ffmpeg.Error, ValueError) as e:
+        logger.error(f"Could not probe clips for merging: {e}")
+        _record_merge("streaming", "probe", "error", start, len(gcs_video_urls))
+        return None
+    merge_path = choose_merge_path(probes)
+
+    list_content = ""
+    for signed_url in signed_urls:
+        escaped_url = signed_url.replace("'", "'\\''")
+        list_content += f"file '{escaped_url}'\n"
+
+    # A content-addressed location is only known once the whole video has been streamed, so
+    # it is staged under a unique name and copied into place afterwards
+    content_addressed = CONTENT_HASH_PLACEHOLDER in output_location
+    staging_location = output_location.replace(CONTENT_HASH_PLACEHOLDER, f"staging-{uuid.uuid4().hex}")
+    bucket_name, blob_name = staging_location.replace("gs://", "", 1).split('/', 1)
+    bucket = get_storage_client().bucket(bucket_name)
+    blob = bucket.blob(blob_name)
+    if content_addressed:
+        blob.cache_control = IMMUTABLE_CACHE_CONTROL
+
+    with get_scratch_space().job_dir("stream_merge") as work_dir:
+        list_filepath = os.path.join(work_dir, "clips.txt")
+        with open(list_filepath, 'w') as f:
+            f.write(list_content)
+
+        for merge_path in _merge_attempts(merge_path):
+            streams, output_kwargs = _concat_streams(signed_urls, probes, merge_path, list_filepath, remote=True)
+            process = (
                 ffmpeg
-                .input(formatted_temp_list_filepath, f='concat', safe=0)
-                .output(temp_file_path, c='copy')
-                .run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
+                .output(*streams, 'pipe:1', f='mp4', movflags='frag_keyframe+empty_moov+default_base_moof',
+                        **output_kwargs)
+                .global_args('-loglevel', 'error')
+                .run_async(pipe_stdout=True, pipe_stderr=True)
             )
-            logger.info(f"Successfully merged videos to {temp_file_path} using concat demuxer.")
+            # Drain stderr concurrently so ffmpeg never blocks on a full pipe
+            stderr_chunks = []
+            stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+            stderr_reader.start()
+
+            digest = hashlib.sha256()
+            try:
+                with blob.open("wb", chunk_size=chunk_size, content_type="video/mp4") as writer:
+                    for chunk in iter(lambda: process.stdout.read(1024 * 1024), b''):
+                        digest.update(chunk)
+                        writer.write(chunk)
+                    return_code = process.wait()
+            except Exception as e:
+                process.kill()
+                process.wait()
+                logger.error(f"Error streaming merged video to {output_location}: {e}")
+                _delete_blob_quietly(blob)
+                _record_merge("streaming", merge_path, "error", start, len(gcs_video_urls))
+                return None
+            finally:
+                stderr_reader.join()
+
+            if return_code == 0:
+                break
+            logger.error(f'ffmpeg error ({merge_path} path):')
+            logger.error(b"".join(stderr_chunks).decode('utf8', errors='replace'))
+            _delete_blob_quietly(blob)
+        else:
+            _record_merge("streaming", merge_path, "error", start, len(gcs_video_urls))
+            return None
+
+    if content_addressed:
+        try:
+            output_location = _publish_staged_blob(bucket, blob, resolve_content_address(output_location,
+                                                                                         digest.hexdigest()))
+        except Exception as e:
+            logger.error(f"Could not publish merged video {staging_location}: {e}")
+            _delete_blob_quietly(blob)
+            _record_merge("streaming", merge_path, "error", start, len(gcs_video_urls))
+            return None
+    else:
+        output_location = staging_location
+
+    _record_merge("streaming", merge_path, "ok", start, len(gcs_video_urls))
+    logger.info(f"Successfully streamed merged video to {output_location}.")
+    return get_signed_url(output_location)
+
+
+def _publish_staged_blob(bucket, staged_blob, output_location: str) -> str:
+    """Copies a staged object to its final name server-side and removes the staged copy."""
+    blob_name = output_location.replace("gs://", "", 1).split('/', 1)[1]
+    if bucket.get_blob(blob_name) is None:
+        # The copy keeps the staged object's metadata, including its Cache-Control header
+        bucket.copy_blob(staged_blob, bucket, blob_name)
+    else:
+        logger.info(f"Identical merged video already exists at {output_location}.")
+    _delete_blob_quietly(staged_blob)
+    return output_location
+
+
+def merge_video_clips(gcs_video_urls, output_location, temp_dir=None, mode=None):
+    """
+    Concatenates clips into a single video, uploads it and returns a signed URL.
+
+    Each clip is probed first. Clips with identical codec, resolution, frame rate and
+    time base are stream-copied; anything else is re-encoded in a single filter_complex
+    pass with a fast x264 preset. The path taken is logged and exported as the
+    `adgen_merges_total` metric.
+
+    Args:
+        gcs_video_urls: Ordered list of gs:// clip URIs.
+        output_location: gs:// URI of the merged video. A `{hash}` placeholder is replaced by the
+            SHA-256 of the merged file.
+        temp_dir: Optional directory to download clips into for the "local" mode.
+            Defaults to the shared scratch clip cache.
+        mode: "local" downloads clips before merging; "streaming" merges straight from
+            signed URLs into GCS (see `merge_video_clips_streaming`). Defaults to `merge.mode`.
+
+    Returns:
+        A signed URL for the merged video, or None if merging failed.
+    """
+    mode = mode or config.get("merge", {}).get("mode", "local")
+    if mode == "streaming":
+        return merge_video_clips_streaming(gcs_video_urls, output_location)
+
+    start = time.perf_counter()
+    scratch = get_scratch_space()
+    local_dir = temp_dir or scratch.cache_dir
+    # Pinned before downloading, so a concurrent enforce_budget can't evict a clip before it is used
+    download_paths = [local_download_path(url, local_dir) for url in gcs_video_urls if url.startswith("gs://")]
+
+    merge_path = "probe"
+    try:
+        with scratch.pinned(download_paths), scratch.job_dir("merge") as work_dir:
+            local_paths = download_from_gcs(gcs_video_urls, local_dir)
+            if not local_paths or len(local_paths) != len(gcs_video_urls):
+                logger.error(f"Downloaded {len(local_paths)} of {len(gcs_video_urls)} clips; "
+                             f"not merging an incomplete ad.")
+                _record_merge("local", merge_path, "error", start, len(gcs_video_urls))
+                return None
+
+            list_content = ""
+            for path in local_paths:
+                absolute_path = os.path.abspath(path)
+                formatted_path = absolute_path.replace('\\', '/')
+                list_content += f"file '{formatted_path}'\n"
+
+            probes = [probe_clip(path) for path in local_paths]
+            merge_path = choose_merge_path(probes)
+
+            temp_list_filepath = os.path.join(work_dir, "clips.txt")
+            with open(temp_list_filepath, 'w') as f:
+                f.write(list_content)
+            logger.info(f"Created temporary file list: {temp_list_filepath}")
+
+            formatted_temp_list_filepath = os.path.abspath(temp_list_filepath).replace('\\', '/')
+            temp_file_path = os.path.join(work_dir, "final_ad.mp4")
+            attempts = _merge_attempts(merge_path)
+            for merge_path in attempts:
+                streams, output_kwargs = _concat_streams(
+                    local_paths, probes, merge_path, formatted_temp_list_filepath)
+                try:
+                    (
+                        ffmpeg
+                        .output(*streams, temp_file_path, movflags='+faststart', **output_kwargs)
+                        .run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
+                    )
+                    break
+                except ffmpeg.Error as e:
+                    if merge_path == attempts[-1]:
+                        raise
+                    logger.warning(f"Stream copy failed, falling back to re-encoding: "
+                                   f"{e.stderr.decode('utf8', errors='replace')}")
+            logger.info(f"Successfully merged videos to {temp_file_path} using the {merge_path} path.")
 
             # Upload to gcs
             with open(temp_file_path, 'rb') as source_file:
-                uploaded_file_path = upload_file_to_gcs(file_object=source_file, gcs_destination_path=output_location)
+                uploaded_file_path = upload_file_to_gcs(file_object=source_file, gcs_destination_path=output_location,
+                                                        content_type="video/mp4")
 
-            signed_url = generate_signed_url(uploaded_file_path)
-            return signed_url
+        if not uploaded_file_path:
+            _record_merge("local", merge_path, "error", start, len(gcs_video_urls))
+            return None
+        _record_merge("local", merge_path, "ok", start, len(gcs_video_urls))
+        return get_signed_url(uploaded_file_path)
 
     except ffmpeg.Error as e:
-        logger.error('ffmpeg error:')
-        logger.error(e.stdout.decode('utf8'))
-        logger.error(e.stderr.decode('utf8'))
-        print("An error occurred during ffmpeg processing. Check logs for details.")
-        print("This might be because the video streams are not compatible for direct copying.")
-
-    # finally:
-    #     if temp_list_filepath and os.path.exists(temp_list_filepath):
-    #         os.remove(temp_list_filepath)
-    #         logger.info(f"Cleaned up temporary file: {temp_list_filepath}")
-    #     for path in local_paths:
-    #         if os.path.exists(path):
-    #             os.remove(path)
-    #             logger.info(f"Cleaned up local file: {path}")
-    #     if os.path.exists(temp_dir) and not os.listdir(temp_dir):
-    #         os.rmdir(temp_dir)
-    #         logger.info(f"Removed temporary directory: {temp_dir}")
-
-    return output_location
+        logger.error(f'ffmpeg error ({merge_path} path):')
+        logger.error(e.stdout.decode('utf8', errors='replace') if e.stdout else "")
+        logger.error(e.stderr.decode('utf8', errors='replace') if e.stderr else "")
+        _record_merge("local", merge_path, "error", start, len(gcs_video_urls))
+        return None
+
+    except ValueError as e:
+        logger.error(f"Could not merge clips: {e}")
+        _record_merge("local", merge_path, "error", start, len(gcs_video_urls))
+        return None
+
+    finally:
+        scratch.enforce_budget()
+        logger.info(f"Scratch usage: {scratch.usage()}")
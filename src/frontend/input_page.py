@@ -2,9 +2,9 @@
 
 import logging
 from typing import Optional, Dict, Any
-import time
 
 import streamlit as st
+from src.backend import storage_paths
 from src.backend import video_ops
 from src.backend.utils import load_config
 
@@ -53,10 +53,10 @@ def render_input_page() -> Optional[Dict[str, Any]]:
             if uploaded_image is not None and st.session_state.get('last_uploaded_image_id') != uploaded_image.id:
                 logger.info(f"New image uploaded: {uploaded_image.name}. Uploading to GCS.")
                 with st.spinner("Uploading image to cloud storage..."):
-                    timestamp = int(time.time())
-                    image_destination_blob = f"{config['imagen']['image_output_dir']}/{timestamp}_{uploaded_image.name}"
+                    image_destination_blob = storage_paths.image_location(uploaded_image.name)
 
-                    gcs_uri = video_ops.upload_file_to_gcs(uploaded_image, image_destination_blob)
+                    gcs_uri = video_ops.upload_file_to_gcs(uploaded_image, image_destination_blob,
+                                                           content_type=uploaded_image.type)
 
                     if gcs_uri:
                         st.session_state['uploaded_image_gcs_uri'] = gcs_uri
@@ -116,6 +116,12 @@ def render_input_page() -> Optional[Dict[str, Any]]:
             "Negative Prompt (Optional)",
             help="Specify elements you want to avoid in the generated video."
         )
+
+        bypass_cache = st.checkbox(
+            "Generate fresh variations",
+            value=False,
+            help="Always generate new videos, even if identical prompts were generated before."
+        )
         # st.markdown("---")
 
         _, _, submit_col = st.columns([3, 3, 1])
@@ -139,6 +145,7 @@ def render_input_page() -> Optional[Dict[str, Any]]:
             "resolution": resolution,
             "negative_prompt": negative_prompt,
             "person_generation": person_generation,
+            "bypass_cache": bypass_cache,
             "uploaded_image_gcs_uri": st.session_state.get('uploaded_image_gcs_uri', None)
         }
         logger.info("Input data collected and validated.")
@@ -1,9 +1,16 @@
 # src/frontend/output_page.py
 import os
+import uuid
 import logging
 from typing import List, Dict, Any
 import streamlit as st
 
+from src.backend import jobs
+from src.backend import previews
+from src.backend import render
+from src.backend import signed_urls
+from src.backend import speculation
+from src.backend import storage_paths
 from src.backend import video_ops
 from src.backend.utils import load_config
 
@@ -35,10 +42,11 @@ def initialize_scene_state(output_data: List[Dict[str, Any]]):
             'confirmed_video_url': None,  # This will store the gs:// URI of the confirmed video
             'is_confirmed': False,
             'gcs_video_paths': [],  # List of dicts {'gs_uri': ..., 'http_url': ...}
+            'generation_error': None,  # Error message if video generation failed for this scene
+            'job_id': None,  # Background video generation job currently running for this scene
+            'is_playing': False,  # Video player loaded instead of the poster
             'scene_duration': scene.get('scene_duration', 5)
         })
-    if 'regen_count' not in st.session_state:
-        st.session_state['regen_count'] = 0
     # Initialize state for back button confirmation
     if 'show_back_confirm' not in st.session_state:
         st.session_state['show_back_confirm'] = False
@@ -46,6 +54,91 @@ def initialize_scene_state(output_data: List[Dict[str, Any]]):
     logger.info("Scene states initialized.")
 
 
+def refresh_scene_jobs() -> bool:
+    """
+    Pulls the results of finished background generation jobs into the scene states.
+
+    Returns:
+        bool: True if at least one scene's job finished, or moved in the Veo queue, since the last refresh.
+    """
+    changed = False
+    for scene_index, scene_state in enumerate(st.session_state.get('scene_states') or []):
+        job_id = scene_state.get('job_id')
+        if not job_id:
+            continue
+
+        job = jobs.poll(job_id)
+        if job is None:
+            logger.warning(f"Job {job_id} for Scene {scene_index} is unknown. Marking scene as failed.")
+            job = {'status': jobs.FAILED, 'error': "Video generation job was lost."}
+        if job['status'] not in jobs.FINISHED_STATUSES:
+            if job.get('queue_position') != scene_state.get('queue_position'):
+                scene_state['queue_position'] = job.get('queue_position')
+                changed = True
+            continue
+
+        if job['status'] == jobs.SUCCEEDED:
+            scene_state['gcs_video_paths'] = job['result']
+            scene_state['generation_error'] = None
+            scene_state['video_index'] = 0
+            scene_state['is_playing'] = False
+            logger.info(f"Video data generated for Scene {scene_index}: {job['result']}")
+            _speculate(scene_index)
+        elif job['status'] == jobs.FAILED:
+            scene_state['generation_error'] = job['error']
+        scene_state['job_id'] = None
+        scene_state['queue_position'] = None
+        changed = True
+    return changed
+
+
+def has_pending_jobs() -> bool:
+    """Returns True if any scene is still waiting on a background generation job."""
+    return any(scene_state.get('job_id') for scene_state in st.session_state.get('scene_states') or [])
+
+
+def cancel_scene_jobs():
+    """Cancels any background generation jobs still running for the current scenes, speculative ones included."""
+    for scene_state in st.session_state.get('scene_states') or []:
+        if scene_state.get('job_id'):
+            jobs.cancel(scene_state['job_id'])
+            scene_state['job_id'] = None
+    manager = speculation.get_speculation_manager()
+    if manager:
+        manager.discard(st.session_state.get('session_id'))
+
+
+def _session_clip_uris() -> List[str]:
+    """Returns the gs:// URIs of every generated clip shown on the review page."""
+    return [video_data['gs_uri']
+            for scene_state in st.session_state.get('scene_states') or []
+            for video_data in scene_state.get('gcs_video_paths', []) if video_data.get('gs_uri')]
+
+
+def _ready_preview_count() -> int:
+    return sum(1 for gs_uri in _session_clip_uris() if previews.get_previews(gs_uri))
+
+
+@st.fragment(run_every=config.get('jobs', {}).get('ui_refresh_sec', 5))
+def _watch_pending_jobs():
+    """
+    Periodically checks background jobs and previews, and reruns the page once a scene's
+    videos or a clip's previews are ready.
+    """
+    if refresh_scene_jobs() or _ready_preview_count() != st.session_state.get('ready_preview_count'):
+        st.rerun()
+
+
+def render_pending_scene_card(scene_index: int, scene_prompt: Dict[str, Any]):
+    """
+    Renders a read-only card for a scene whose prompt is ready while the rest of the ad is still being written.
+    """
+    with st.container(border=True):
+        st.subheader(f"Scene {scene_index + 1} 🔄")
+        st.caption(f"Duration: {scene_prompt.get('scene_duration', 5)}s · Video generation started")
+        st.write(scene_prompt.get('prompt', ''))
+
+
 def update_prompt_state(scene_index: int):
     """
     Callback function to update prompt text and edited state in session state.
@@ -64,6 +157,14 @@ def select_video_option(scene_index: int, video_option_index: int):
     """
     logger.info(f"Scene {scene_index}: Selected video option index {video_option_index}")
     st.session_state['scene_states'][scene_index]['video_index'] = video_option_index
+    st.session_state['scene_states'][scene_index]['is_playing'] = False
+
+
+def play_video(scene_index: int):
+    """
+    Callback function to load the selected clip's video player in place of its poster.
+    """
+    st.session_state['scene_states'][scene_index]['is_playing'] = True
 
 
 def confirm_video_selection(scene_index: int):
@@ -91,68 +192,90 @@ def confirm_video_selection(scene_index: int):
         st.warning("Please select a valid video before confirming.")
 
 
+def _scene_job_params(scene_index: int, prompt: str) -> Dict[str, Any]:
+    """Builds the video generation parameters for regenerating a scene with the given prompt."""
+    scene_state = st.session_state['scene_states'][scene_index]
+    ad_input_data = st.session_state.get('ad_input_data', {})
+    return dict(
+        prompt=prompt,
+        output_location=storage_paths.clip_output_location(st.session_state.get('session_id'), scene_index),
+        aspect_ratio=ad_input_data.get('aspect_ratio', '16:9'),
+        duration_seconds=scene_state.get('scene_duration', 5),
+        person_generation=ad_input_data.get('person_generation', 'dont_allow'),
+        image_gcs_uri=None
+    )
+
+
+def _speculate(scene_index: int):
+    """Queues speculative alternatives of a scene whose clips just landed, if speculation is enabled."""
+    manager = speculation.get_speculation_manager()
+    scene_state = st.session_state['scene_states'][scene_index]
+    if manager and not scene_state.get('is_confirmed', False):
+        manager.speculate(st.session_state.get('session_id'),
+                          scene_index, _scene_job_params(scene_index, scene_state.get('original_prompt', '')))
+
+
+def use_alternative(scene_index: int, prompt: str):
+    """
+    Callback function to switch a scene to one of its speculatively generated alternatives.
+    """
+    scene_state = st.session_state['scene_states'][scene_index]
+    scene_state['prompt_text'] = prompt
+    scene_state['is_edited'] = True
+    st.session_state[f'prompt_area_{scene_index}'] = prompt
+    regenerate_scene_video(scene_index)
+
+
 def regenerate_scene_video(scene_index: int):
     """
     Calls the backend video generation function to regenerate video for a specific scene.
     """
     scene_state = st.session_state['scene_states'][scene_index]
-    if scene_state.get('is_edited', False):
+    if scene_state.get('is_edited', False) or scene_state.get('generation_error'):
         edited_prompt = scene_state.get('prompt_text', '')
-        duration = scene_state.get('scene_duration', 5)
-        ad_input_data = st.session_state.get('ad_input_data', {})
-        aspect_ratio = ad_input_data.get('aspect_ratio', '16:9')
-        person_generation = ad_input_data.get('person_generation', 'dont_allow')
-        image_gcs_uri = None
+        session_id = st.session_state.get('session_id')
+        bypass_cache = st.session_state.get('ad_input_data', {}).get('bypass_cache', False)
 
         logger.info(f"Calling backend to regenerate Scene {scene_index} with prompt: {edited_prompt[:50]}...")
 
         try:
-            # output_location = f"gs://veo2-exp/AdGen/output_clips/regenerated_clips/scene_{scene_index}_{st.session_state.get('regen_count', 0)}"
-            # output_location = f"gs://mrdarshan-veo-exp/veo2_output_clips/AdGen/scene_{scene_index}_{st.session_state.get('regen_count', 0)}"
-            veo_output_location = config['veo']['veo_output_dir']
-            output_location = f"{veo_output_location}/regenerated_clips/scene_{scene_index}_{st.session_state.get('regen_count', 0)}"
-            st.session_state['regen_count'] = st.session_state.get('regen_count', 0) + 1
-
-            with st.spinner(f"Generating new videos for Scene {scene_index + 1}..."):
-                generated_clips_data = video_ops.generate_video_clip(
-                    prompt=edited_prompt,
-                    output_location=output_location,
-                    aspect_ratio=aspect_ratio,
-                    duration_seconds=duration,
-                    person_generation=person_generation,
-                    image_gcs_uri=image_gcs_uri
+            # A speculative alternative generated from the same prompt is (or will soon be) the answer
+            manager = speculation.get_speculation_manager()
+            adopted_job_id = manager.adopt(session_id, scene_index, edited_prompt) if manager else None
+            if adopted_job_id:
+                scene_state['job_id'] = adopted_job_id
+                logger.info(f"Adopted speculative job {adopted_job_id} for Scene {scene_index}")
+            else:
+                scene_state['job_id'] = jobs.submit(
+                    _scene_job_params(scene_index, edited_prompt),
+                    owner=session_id,
+                    bypass_cache=bypass_cache,
+                    labels={'scene_index': scene_index}
                 )
-            st.success(f"New videos generated for Scene {scene_index + 1}.")
-            logger.info(f"Backend returned new video data for Scene {scene_index}: {generated_clips_data}")
+                logger.info(f"Submitted regeneration job {scene_state['job_id']} for Scene {scene_index}")
 
-            scene_state['gcs_video_paths'] = generated_clips_data
+            scene_state['generation_error'] = None
             scene_state['original_prompt'] = edited_prompt
             scene_state['is_edited'] = False
             scene_state['video_index'] = 0
             scene_state['confirmed_video_url'] = None
             scene_state['is_confirmed'] = False
-            st.rerun()
 
         except Exception as e:
             logger.error(f"Error regenerating video for Scene {scene_index}: {e}")
             st.error(f"Error regenerating video for Scene {scene_index + 1}: {e}")
             scene_state['is_edited'] = False
-            st.rerun()
 
 
-def generate_final_video():
-    """
-    Collects confirmed video URLs and calls the backend to merge them into a final video.
-    """
-    logger.info("Initiating final video generation process.")
-
+def _confirmed_video_urls():
+    """Returns the gs:// URIs of the confirmed clips in scene order, or None after showing why not."""
     scene_states = st.session_state.get('scene_states', [])
     num_scenes = len(scene_states)
 
     if num_scenes == 0:
         st.warning("No scenes to generate final video.")
         logger.warning("Attempted final generation with no scenes.")
-        return
+        return None
 
     # Collect confirmed video data
     confirmed_video_data_list = []
@@ -168,25 +291,43 @@ def generate_final_video():
     if not all_scenes_confirmed:
         st.error("Please confirm all scenes before generating the final video.")
         logger.warning("Final generation attempted with unconfirmed scenes.")
-        return
+        return None
 
     if not confirmed_video_data_list:
         st.warning("No confirmed scenes with video URLs to merge.")
         logger.warning("Final generation attempted with no confirmed video data.")
-        return
+        return None
+
+    return [item['gs_uri'] for item in confirmed_video_data_list]
+
+
+def generate_final_video():
+    """
+    Collects confirmed video URLs and calls the backend to merge them into a final video.
+    """
+    logger.info("Initiating final video generation process.")
 
-    gcs_video_urls = [item['gs_uri'] for item in confirmed_video_data_list]
+    gcs_video_urls = _confirmed_video_urls()
+    if not gcs_video_urls:
+        return
     logger.info(f"Calling backend to merge videos with gs:// URIs: {gcs_video_urls}")
 
     try:
-        final_video_location = f"{config['veo']['veo_output_dir']}/final_ads/ad.mp4"
+        final_video_location = storage_paths.final_ad_location(st.session_state.get('session_id'))
 
         with st.spinner("Merging videos and generating final ad..."):
-            # Call merge_video_clips and expect a local file path
-            final_video_path = video_ops.merge_video_clips(
-                gcs_video_urls=gcs_video_urls,
-                output_location=final_video_location
-            )
+            product_name = (st.session_state.get('ad_input_data') or {}).get('product_name')
+            if render.needs_render(len(gcs_video_urls), product_name=product_name):
+                final_video_path = render.render_final_ad(
+                    gcs_video_urls=gcs_video_urls,
+                    output_location=final_video_location,
+                    product_name=product_name
+                )
+            else:
+                final_video_path = video_ops.merge_video_clips(
+                    gcs_video_urls=gcs_video_urls,
+                    output_location=final_video_location
+                )
 
         # Display the local file path directly
         if final_video_path:
@@ -200,13 +341,52 @@ def generate_final_video():
 
         else:
             st.error("Failed to generate final video.")
-            logger.error("merge_video_clips did not return a valid path or file does not exist.")
+            logger.error("Final video rendering did not return a valid URL.")
 
     except Exception as e:
         logger.error(f"Error during final video generation: {e}")
         st.error(f"An error occurred during final video generation: {e}")
 
 
+def export_final_video():
+    """
+    Exports the final ad in every configured rendition (aspect ratios and bitrates)
+    and lists download links for each.
+    """
+    logger.info("Initiating final video export.")
+
+    gcs_video_urls = _confirmed_video_urls()
+    if not gcs_video_urls:
+        return
+
+    try:
+        ad_input_data = st.session_state.get('ad_input_data') or {}
+        export_prefix = storage_paths.export_prefix(st.session_state.get('session_id'))
+        with st.spinner("Exporting the final ad for ad platforms..."):
+            manifest = render.export_final_ad(
+                gcs_video_urls=gcs_video_urls,
+                output_prefix=export_prefix,
+                product_name=ad_input_data.get('product_name')
+            )
+
+        if manifest:
+            st.success("Final ad exported!")
+            st.subheader("Exported Renditions")
+            for rendition in manifest['renditions']:
+                st.markdown(f"- [{rendition['name']}]({rendition['signed_url']}) "
+                            f"({rendition['width']}x{rendition['height']}, {rendition['video_bitrate']})")
+            if manifest['hls']:
+                st.markdown(f"- HLS master playlist: `{manifest['hls']['gs_uri']}` "
+                            f"(serve through your CDN; segments are not publicly signed)")
+        else:
+            st.error("Failed to export final video.")
+            logger.error("export_final_ad did not return a manifest.")
+
+    except Exception as e:
+        logger.error(f"Error during final video export: {e}")
+        st.error(f"An error occurred during final video export: {e}")
+
+
 # Helper functions for rendering individual scene components
 
 def _render_scene_header(scene_index: int, scene_state: Dict[str, Any]):
@@ -217,11 +397,25 @@ def _render_scene_header(scene_index: int, scene_state: Dict[str, Any]):
     if scene_state.get('is_confirmed', False):
         indicator_icon = "✅"
     if not scene_state.get('gcs_video_paths', []):
+        indicator_icon = "❌" if scene_state.get('generation_error') else "🔄"
+    if scene_state.get('job_id'):
         indicator_icon = "🔄"
 
     st.subheader(f"Scene {scene_index + 1} {indicator_icon}")
 
 
+def _sign_session_clips():
+    """
+    Signs the URLs of every clip in the session and of its previews in one batch; cached ones are reused.
+    """
+    gs_uris = []
+    for gs_uri in _session_clip_uris():
+        gs_uris.append(gs_uri)
+        gs_uris.extend((previews.get_previews(gs_uri) or {}).values())
+    if gs_uris:
+        signed_urls.get_signed_urls(gs_uris)
+
+
 def _render_video_player_and_selectors(scene_index: int, scene_state: Dict[str, Any]):
     """Renders the video player and clip selection buttons for a single scene."""
     video_data_list = scene_state.get('gcs_video_paths', [])
@@ -236,18 +430,37 @@ def _render_video_player_and_selectors(scene_index: int, scene_state: Dict[str,
                 logger.warning(
                     f"Invalid video index {scene_state.get('video_index', 'N/A')} for scene {scene_index}. Resetting to 0.")
 
-        current_video_data = video_data_list[selected_index]
-        current_video_url = current_video_data.get('http_url')
-
-        if current_video_url:
-            st.video(current_video_url)
+        current_gs_uri = video_data_list[selected_index].get('gs_uri')
+        # Signed URLs stream straight from GCS; already signed for the session in _sign_session_clips
+        current_video_url = signed_urls.get_signed_url(current_gs_uri)
+        clip_previews = previews.get_previews(current_gs_uri)
+        # Without previews (disabled or failed) the full clip is shown as before
+        show_player = (scene_state.get('is_playing', False) or
+                       (not clip_previews and not previews.previews_pending([current_gs_uri])))
+
+        if not current_video_url:
+            st.warning(f"Video URL not available for selected video in Scene {scene_index + 1}.")
+        elif show_player:
+            # The low-bitrate preview plays by default; full resolution is one click away
+            preview_url = signed_urls.get_signed_url(clip_previews['preview']) if clip_previews else None
+            st.video(preview_url or current_video_url, autoplay=scene_state.get('is_playing', False))
+            if preview_url:
+                st.markdown(f"[Full resolution]({current_video_url})")
         else:
-            st.warning(f"HTTP URL not available for selected video in Scene {scene_index + 1}.")
+            if clip_previews:
+                st.image(signed_urls.get_signed_url(clip_previews['poster']), use_container_width=True)
+            else:
+                st.info("Preparing preview...")
+            st.button("▶ Play", key=f'play_video_{scene_index}', on_click=play_video, args=(scene_index,),
+                      help=f"Load the video player for Scene {scene_index + 1}")
 
         st.write("Select Clip:")
         video_select_cols = st.columns(num_videos)
         for video_option_index in range(num_videos):
             with video_select_cols[video_option_index]:
+                option_previews = previews.get_previews(video_data_list[video_option_index].get('gs_uri'))
+                if option_previews:
+                    st.image(signed_urls.get_signed_url(option_previews['thumbnails']), use_container_width=True)
                 is_selected = (selected_index == video_option_index)
                 button_style = "primary" if is_selected else "secondary"
                 st.button(
@@ -261,6 +474,32 @@ def _render_video_player_and_selectors(scene_index: int, scene_state: Dict[str,
                 )
 
 
+def _render_alternatives(scene_index: int, scene_state: Dict[str, Any]):
+    """Renders the speculatively generated alternatives of a scene, if there are any."""
+    manager = speculation.get_speculation_manager()
+    if manager is None or scene_state.get('is_confirmed', False):
+        return
+    alternatives = manager.alternatives(st.session_state.get('session_id'), scene_index)
+    if not alternatives:
+        return
+
+    num_ready = sum(1 for alternative in alternatives if alternative['status'] == jobs.SUCCEEDED)
+    with st.expander(f"Show alternatives ({num_ready}/{len(alternatives)} ready)"):
+        for alternative_index, alternative in enumerate(alternatives):
+            is_ready = alternative['status'] == jobs.SUCCEEDED
+            alternative_previews = previews.get_previews(alternative['result'][0]['gs_uri']) if is_ready else None
+            if alternative_previews:
+                st.image(signed_urls.get_signed_url(alternative_previews['thumbnails']), use_container_width=True)
+            st.caption(alternative['prompt'])
+            st.button(
+                "Use this" if is_ready else "Use when ready",
+                key=f'use_alternative_{scene_index}_{alternative_index}',
+                on_click=use_alternative,
+                args=(scene_index, alternative['prompt']),
+                help="Ready to use now." if is_ready else "Still generating; switches the scene to it right away."
+            )
+
+
 def _render_prompt_area(scene_index: int, scene_state: Dict[str, Any]):
     """Renders the editable prompt text area for a single scene."""
     edited_prompt_text = st.text_area(
@@ -282,9 +521,13 @@ def _render_scene_buttons(scene_index: int, scene_state: Dict[str, Any]):
 
     is_edited = scene_state.get('is_edited', False)
     is_confirmed = scene_state.get('is_confirmed', False)
+    has_failed = bool(scene_state.get('generation_error'))
+    has_videos = bool(scene_state.get('gcs_video_paths', []))
 
     with button_col1:
         regen_help_text = "Edit the prompt above to enable regeneration." if not is_edited else "Generate new videos based on the edited prompt."
+        if has_failed:
+            regen_help_text = "Video generation failed for this scene. Retry with the current prompt."
         if is_confirmed:
             regen_help_text = "Scene is confirmed, cannot regenerate."
         st.button(
@@ -292,7 +535,7 @@ def _render_scene_buttons(scene_index: int, scene_state: Dict[str, Any]):
             key=f'regenerate_button_{scene_index}',
             on_click=regenerate_scene_video,
             args=(scene_index,),
-            disabled=not is_edited or is_confirmed,
+            disabled=not (is_edited or has_failed) or is_confirmed,
             help=regen_help_text
         )
     with button_col2:
@@ -305,25 +548,12 @@ def _render_scene_buttons(scene_index: int, scene_state: Dict[str, Any]):
             key=f'confirm_button_{scene_index}',
             on_click=confirm_video_selection,
             args=(scene_index,),
-            disabled=is_confirmed,
+            disabled=is_confirmed or not has_videos,
             help=confirm_help_text
         )
 
 
-def render_output_page(output_data: List[Dict[str, Any]]):
-    """
-    Renders the output page displaying generated scenes and controls with horizontal layout.
-
-    Args:
-        output_data (List[Dict[str, Any]]): The list of scene data from the backend,
-                                             containing 'prompt' and 'scene_duration'.
-    """
-    logger.info("Rendering output page with horizontal layout...")
-
-    st.title("🎬 Review and Finalize Your Ad Scenes 🎬")
-    st.subheader("Review the generated scenes, edit prompts, and select your preferred videos.")
-
-    st.markdown("""
+_INSTRUCTIONS_MARKDOWN = """
     **Instructions:**
     1.  Review each scene below.
     2.  Watch the different video clips generated for each scene using the 'Select Clip' buttons.
@@ -332,9 +562,9 @@ def render_output_page(output_data: List[Dict[str, Any]]):
     5.  Click 'Confirm' for your chosen clip once you are satisfied with the video and prompt for that scene.
     6.  Repeat for all scenes.
     7.  Once all scenes are confirmed (indicated by the 'Confirmed' button and checkmark icon), the 'Generate Final Video' button will be enabled.
-    """, unsafe_allow_html=True)
+    """
 
-    st.markdown("""
+_PAGE_CSS = """
     <style>
     .stButton button {
         margin-right: 5px;
@@ -349,7 +579,86 @@ def render_output_page(output_data: List[Dict[str, Any]]):
          margin-right: 0;
     }
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+
+def _page_signature() -> tuple:
+    """Scene state that affects more than its own card: confirmations and running jobs."""
+    return tuple((scene_state.get('is_confirmed', False), bool(scene_state.get('job_id')))
+                 for scene_state in st.session_state['scene_states'])
+
+
+@st.fragment
+def _render_scene_card(scene_index: int):
+    """
+    Renders the card of a single scene.
+
+    As a fragment, interacting with one scene's widgets (selecting or playing a clip,
+    editing the prompt) reruns only that card. Changes that affect the rest of the page,
+    i.e. confirming or regenerating a scene, rerun the whole page.
+    """
+    if _page_signature() != st.session_state.get('page_signature'):
+        st.rerun()
+
+    scene_state = st.session_state['scene_states'][scene_index]
+
+    _render_scene_header(scene_index, scene_state)
+
+    gcs_paths = scene_state.get('gcs_video_paths', [])
+    is_generating = bool(scene_state.get('job_id'))
+    if len(gcs_paths) > 0 and not is_generating:
+        if scene_state.get('generation_error'):
+            st.error(f"Re-generation failed for Scene {scene_index + 1}: "
+                     f"{scene_state['generation_error']}")
+        _render_video_player_and_selectors(scene_index, scene_state)
+        _render_prompt_area(scene_index, scene_state)
+        _render_scene_buttons(scene_index, scene_state)
+        _render_alternatives(scene_index, scene_state)
+    elif scene_state.get('generation_error') and not is_generating:
+        st.error(f"Video generation failed for Scene {scene_index + 1}: "
+                 f"{scene_state['generation_error']}")
+        _render_prompt_area(scene_index, scene_state)
+        _render_scene_buttons(scene_index, scene_state)
+    else:
+        st.video(
+            "https://storage.googleapis.com/gtv-films-clients/veo/dummy/loading.mp4")
+        if scene_state.get('queue_position'):
+            st.info(f"Waiting for Veo capacity for Scene {scene_index + 1}: "
+                    f"position {scene_state['queue_position']} in the queue...")
+        else:
+            st.info(f"Generating videos for Scene {scene_index + 1}...")
+        st.text_area(
+            "Prompt:",
+            value=scene_state.get('prompt_text', ''),
+            height=150,
+            key=f'prompt_area_{scene_index}',
+            disabled=True,
+            help="Videos are currently being generated for this scene."
+        )
+        button_col1, button_col2 = st.columns(2)
+        with button_col1:
+            st.button("Re-generate", key=f'regenerate_button_{scene_index}', disabled=True,
+                      help="Wait for initial generation to complete.")
+        with button_col2:
+            st.button("Confirm", key=f'confirm_button_{scene_index}', disabled=True,
+                      help="Wait for initial generation to complete.")
+
+
+def render_output_page(output_data: List[Dict[str, Any]]):
+    """
+    Renders the output page displaying generated scenes and controls with horizontal layout.
+
+    Args:
+        output_data (List[Dict[str, Any]]): The list of scene data from the backend,
+                                             containing 'prompt' and 'scene_duration'.
+    """
+    logger.info("Rendering output page with horizontal layout...")
+
+    st.title("🎬 Review and Finalize Your Ad Scenes 🎬")
+    st.subheader("Review the generated scenes, edit prompts, and select your preferred videos.")
+
+    st.markdown(_INSTRUCTIONS_MARKDOWN, unsafe_allow_html=True)
+    st.markdown(_PAGE_CSS, unsafe_allow_html=True)
 
     if ('scene_states' not in st.session_state or
             st.session_state['scene_states'] is None or
@@ -361,8 +670,16 @@ def render_output_page(output_data: List[Dict[str, Any]]):
         st.error("Scene data not loaded. Please go back to the input page.")
         return
 
+    refresh_scene_jobs()
+    st.session_state['ready_preview_count'] = _ready_preview_count()
+    if has_pending_jobs() or previews.previews_pending(_session_clip_uris()):
+        _watch_pending_jobs()
+    _sign_session_clips()
+
+    # Scene cards compare against this to tell when they need a full rerun
+    st.session_state['page_signature'] = _page_signature()
+
     scenes_per_row = 3
-    scene_data_for_final_generation = []
     num_scenes = len(st.session_state['scene_states'])
 
     num_confirmed_scenes = sum(1 for scene_state in st.session_state['scene_states'] if
@@ -376,48 +693,22 @@ def render_output_page(output_data: List[Dict[str, Any]]):
 
             if scene_index < num_scenes:
                 with cols[j]:
-                    scene_state = st.session_state['scene_states'][scene_index]
-
-                    _render_scene_header(scene_index, scene_state)
-
-                    gcs_paths = scene_state.get('gcs_video_paths', [])
-                    if len(gcs_paths) > 0:
-                        _render_video_player_and_selectors(scene_index, scene_state)
-                        _render_prompt_area(scene_index, scene_state)
-                        _render_scene_buttons(scene_index, scene_state)
-
-                        if scene_state.get('is_confirmed', False):
-                            scene_data_for_final_generation.append({
-                                "scene_index": scene_index,
-                                "prompt": scene_state.get('prompt_text', ''),
-                                "confirmed_video_url": scene_state.get('confirmed_video_url', ''),
-                                "scene_duration": scene_state.get('scene_duration', 5)
-                            })
-                    else:
-                        st.video(
-                            "https://storage.googleapis.com/gtv-films-clients/veo/dummy/loading.mp4")
-                        st.info(f"Generating videos for Scene {scene_index + 1}...")
-                        st.text_area(
-                            "Prompt:",
-                            value=scene_state.get('prompt_text', ''),
-                            height=150,
-                            key=f'prompt_area_{scene_index}',
-                            disabled=True,
-                            help="Videos are currently being generated for this scene."
-                        )
-                        button_col1, button_col2 = st.columns(2)
-                        with button_col1:
-                            st.button("Re-generate", key=f'regenerate_button_{scene_index}', disabled=True,
-                                      help="Wait for initial generation to complete.")
-                        with button_col2:
-                            st.button("Confirm", key=f'confirm_button_{scene_index}', disabled=True,
-                                      help="Wait for initial generation to complete.")
+                    _render_scene_card(scene_index)
 
         st.markdown("---")
     st.info(f"Scenes Confirmed: {num_confirmed_scenes}/{num_scenes}")
 
     all_scenes_confirmed = (num_scenes > 0) and (num_confirmed_scenes == num_scenes)
-    _, _, final_button_col = st.columns([3, 3, 1])
+    _, export_button_col, final_button_col = st.columns([3, 3, 1])
+
+    with export_button_col:
+        st.button(
+            "Export for Ad Platforms",
+            key='export_final_button',
+            on_click=export_final_video,
+            disabled=not all_scenes_confirmed,
+            help="Exports the final ad in every configured aspect ratio and bitrate."
+        )
 
     with final_button_col:
         st.button(
@@ -439,12 +730,14 @@ def render_output_page(output_data: List[Dict[str, Any]]):
         col_yes, col_no = st.columns(2)
         with col_yes:
             if st.button("Yes, Go Back", key="confirm_go_back"):
+                cancel_scene_jobs()
                 st.session_state['current_page'] = "Input"  # Assuming page name is "Input" or imported
                 # Clear relevant session state data when going back
                 st.session_state['ad_input_data'] = None
                 st.session_state['output_data'] = None
                 st.session_state['scene_states'] = None
-                st.session_state['initial_generation_pending'] = False
+                # The discarded ad's jobs must not be restored on reload
+                st.session_state['session_id'] = uuid.uuid4().hex
                 st.session_state['show_back_confirm'] = False  # Reset confirmation flag
                 st.rerun()
         with col_no:
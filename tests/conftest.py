@@ -0,0 +1,25 @@
+"""Shared test fixtures"""
+import time
+
+import pytest
+
+
+class Clock:
+    """Controllable stand-in for time.time."""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Freezes time.time at a fixed instant that tests move forward with `clock.advance`."""
+    clock = Clock()
+    monkeypatch.setattr(time, "time", clock)
+    return clock
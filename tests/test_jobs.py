@@ -0,0 +1,147 @@
+"""Tests for the job manager's queue order and quota admission"""
+from types import SimpleNamespace
+
+import pytest
+
+from src.backend import jobs
+
+
+@pytest.fixture
+def manager(tmp_path):
+    # The worker thread is never started; tests drive the scheduler passes directly
+    return jobs.JobManager(db_path=str(tmp_path / "jobs.sqlite"), max_in_flight=4)
+
+
+def _submit(manager, owner, priority=jobs.PRIORITY_USER):
+    return manager.submit({'prompt': f"clip for {owner}"}, owner=owner, bypass_cache=True, priority=priority)
+
+
+def _mark_running(manager, job_id):
+    manager._queue.remove(job_id)
+    manager._operations[job_id] = SimpleNamespace(name=f"operations/{job_id}")
+    manager._jobs[job_id]['status'] = jobs.RUNNING
+    manager._queue_positions = None
+
+
+def test_queue_order_alternates_between_owners(manager):
+    a1, a2, a3 = (_submit(manager, "a") for _ in range(3))
+    b1 = _submit(manager, "b")
+    assert manager._queue_order() == [a1, b1, a2, a3]
+
+
+def test_queue_order_favours_owners_with_fewer_running_jobs(manager):
+    a1, a2 = _submit(manager, "a"), _submit(manager, "a")
+    b1 = _submit(manager, "b")
+    _mark_running(manager, a1)
+    assert manager._queue_order() == [b1, a2]
+
+
+def test_queue_order_puts_user_jobs_before_speculative_ones(manager):
+    speculative = _submit(manager, "a", priority=jobs.PRIORITY_SPECULATIVE)
+    user = _submit(manager, "b")
+    assert manager._queue_order() == [user, speculative]
+
+
+def test_poll_reports_cached_queue_positions(manager):
+    a1, a2 = _submit(manager, "a"), _submit(manager, "a")
+    b1 = _submit(manager, "b")
+    assert [manager.poll(job_id)['queue_position'] for job_id in (a1, b1, a2)] == [1, 2, 3]
+
+    manager.cancel(a1)
+    assert manager.poll(a1)['queue_position'] is None
+    assert [manager.poll(job_id)['queue_position'] for job_id in (a2, b1)] == [1, 2]
+
+
+class _RecordingQuota:
+    """Quota scheduler stand-in that checks it is never called with the job manager lock held."""
+
+    def __init__(self, manager, wait_sec=0.0, on_acquire=None):
+        self._manager = manager
+        self._wait_sec = wait_sec
+        self._on_acquire = on_acquire
+        self.acquired, self.released = [], []
+
+    def try_acquire(self, lease_id):
+        assert not self._manager._lock.locked()
+        self.acquired.append(lease_id)
+        if self._on_acquire:
+            self._on_acquire(lease_id)
+        return self._wait_sec
+
+    def release(self, lease_id):
+        assert not self._manager._lock.locked()
+        self.released.append(lease_id)
+
+    def record_success(self):
+        pass
+
+
+def test_start_acquires_quota_outside_the_lock(manager, monkeypatch):
+    monkeypatch.setattr(jobs.video_ops, "start_video_generation",
+                        lambda **params: SimpleNamespace(name="operations/1"))
+    manager._quota = _RecordingQuota(manager)
+    job_id = _submit(manager, "a")
+
+    manager._start_queued_jobs()
+
+    assert manager._quota.acquired == [job_id]
+    assert manager.poll(job_id)['status'] == jobs.RUNNING
+
+
+def test_start_waits_when_quota_is_exhausted(manager):
+    manager._quota = _RecordingQuota(manager, wait_sec=30)
+    job_id = _submit(manager, "a")
+
+    manager._start_queued_jobs()
+
+    assert manager.poll(job_id)['status'] == jobs.QUEUED
+    assert manager._quota_retry_at > 0
+
+
+def test_lease_is_released_when_job_is_cancelled_during_admission(manager, monkeypatch):
+    def fail_if_called(**params):
+        raise AssertionError("cancelled job must not start")
+
+    monkeypatch.setattr(jobs.video_ops, "start_video_generation", fail_if_called)
+    manager._quota = _RecordingQuota(manager, on_acquire=manager.cancel)
+    job_id = _submit(manager, "a")
+
+    manager._start_queued_jobs()
+
+    assert manager._quota.released == [job_id]
+    assert manager.poll(job_id)['status'] == jobs.CANCELLED
+
+
+def test_promote_records_choice_of_finished_job(manager):
+    job_id = _submit(manager, "a", priority=jobs.PRIORITY_SPECULATIVE)
+    with manager._lock:
+        manager._queue.remove(job_id)
+        manager._finish(manager._jobs[job_id], jobs.SUCCEEDED, result=[])
+
+    assert manager.promote(job_id)
+
+    job = manager.list_for_owner("a")[0]
+    assert job['priority'] == jobs.PRIORITY_USER
+    assert job['labels']['promoted_at'] >= job['created_at']
+
+
+def test_promote_ignores_cancelled_job(manager):
+    job_id = _submit(manager, "a", priority=jobs.PRIORITY_SPECULATIVE)
+    manager.cancel(job_id)
+    assert not manager.promote(job_id)
+
+
+def test_cache_hit_submits_previews_outside_the_lock(manager, monkeypatch):
+    clips = [{'gs_uri': "gs://bucket/clip.mp4"}]
+    submitted = []
+
+    def submit_previews(result):
+        assert not manager._lock.locked()
+        submitted.append(result)
+
+    monkeypatch.setattr(jobs.video_ops, "get_cached_clips", lambda params: clips)
+    monkeypatch.setattr(jobs.previews, "submit_previews", submit_previews)
+    job_id = manager.submit({'prompt': "cached clip"}, owner="a")
+
+    assert manager.poll(job_id)['status'] == jobs.SUCCEEDED
+    assert submitted == [clips]
@@ -0,0 +1,66 @@
+"""Tests for incremental parsing of streamed JSON arrays"""
+import json
+
+import pytest
+
+from src.backend.json_stream import IncrementalJSONArrayParser
+
+# Strings with brackets, commas, escaped quotes and backslashes, where a chunk boundary
+# falling inside them must not end the element early
+PAYLOAD = json.dumps([
+    {'prompt': 'A shot of "the bottle" [close-up], then {wide}', 'scene_duration': 6},
+    {'prompt': 'Backslash \\ at the end \\', 'tags': ['a,b', ']', '}'], 'nested': {'x': [1, [2, 3]]}},
+    "a bare string with \\\"escapes\\\" and é",
+    42,
+    -1.5e3,
+    True,
+    None,
+])
+
+
+def _parse_in_chunks(text: str, chunk_size: int):
+    parser = IncrementalJSONArrayParser()
+    items = []
+    for start in range(0, len(text), chunk_size):
+        items.extend(parser.feed(text[start:start + chunk_size]))
+    return parser, items
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 16, 64, len(PAYLOAD)])
+def test_chunk_boundaries_do_not_change_the_result(chunk_size):
+    parser, items = _parse_in_chunks(PAYLOAD, chunk_size)
+    assert items == json.loads(PAYLOAD)
+    assert parser.finished
+
+
+def test_elements_are_returned_as_soon_as_they_close():
+    parser = IncrementalJSONArrayParser()
+    assert parser.feed('[{"prompt": "one"}, {"prompt": "t') == [{'prompt': "one"}]
+    assert parser.feed('wo"}') == [{'prompt': "two"}]
+    assert not parser.finished
+    assert parser.feed(']') == []
+    assert parser.finished
+
+
+def test_text_before_the_array_and_after_it_is_ignored():
+    parser, items = _parse_in_chunks('```json\n[{"a": 1}, 2]\n```', 4)
+    assert items == [{'a': 1}, 2]
+    assert parser.finished
+
+
+def test_escaped_backslash_before_closing_quote():
+    # The quote after an escaped backslash closes the string
+    parser, items = _parse_in_chunks(r'["a\\", "b"]', 1)
+    assert items == ["a\\", "b"]
+
+
+def test_truncated_stream_is_not_finished():
+    parser, items = _parse_in_chunks('[{"prompt": "one"}, {"prompt": "tw', 3)
+    assert items == [{'prompt': "one"}]
+    assert not parser.finished
+
+
+def test_invalid_element_raises():
+    parser = IncrementalJSONArrayParser()
+    with pytest.raises(json.JSONDecodeError):
+        parser.feed('[{"prompt": oops}]')
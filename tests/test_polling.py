@@ -0,0 +1,73 @@
+"""Tests for adaptive polling of long-running operations"""
+import pytest
+
+from src.backend.polling import DurationModel, PollScheduler
+
+
+def test_unknown_bucket_uses_default():
+    model = DurationModel(default_seconds=90)
+    assert model.expected(8, "16:9") == 90
+
+
+def test_first_observation_replaces_default():
+    model = DurationModel(default_seconds=90)
+    model.observe(8, "16:9", 40)
+    assert model.expected(8, "16:9") == 40
+
+
+def test_later_observations_are_exponentially_weighted():
+    model = DurationModel(alpha=0.25)
+    model.observe(8, "16:9", 40)
+    model.observe(8, "16:9", 80)
+    assert model.expected(8, "16:9") == pytest.approx(0.75 * 40 + 0.25 * 80)
+    model.observe(8, "16:9", 80)
+    assert model.expected(8, "16:9") == pytest.approx(0.75 * 50 + 0.25 * 80)
+
+
+def test_buckets_are_independent():
+    model = DurationModel(default_seconds=90)
+    model.observe(8, "16:9", 40)
+    assert model.expected(8, "9:16") == 90
+    assert model.expected(5, "16:9") == 90
+
+
+def test_model_persists_across_instances(tmp_path):
+    path = tmp_path / "durations.json"
+    DurationModel(path=str(path)).observe(6, "9:16", 55)
+    assert DurationModel(path=str(path)).expected(6, "9:16") == 55
+
+
+def test_unreadable_model_file_is_ignored(tmp_path):
+    path = tmp_path / "durations.json"
+    path.write_text("not json")
+    assert DurationModel(default_seconds=90, path=str(path)).expected(6, "9:16") == 90
+
+
+def test_polls_densify_towards_expected_duration(clock):
+    scheduler = PollScheduler(DurationModel(default_seconds=60), min_interval=2, max_interval=30)
+    scheduler.track("op", 8, "16:9")
+    assert scheduler.next_due_in() == pytest.approx(30)  # Half the remaining 60s, capped
+
+    clock.advance(30)
+    assert scheduler.due() == ["op"]
+    scheduler.record_pending("op")
+    assert scheduler.next_due_in() == pytest.approx(15)
+
+    clock.advance(15)
+    scheduler.record_pending("op")
+    assert scheduler.next_due_in() == pytest.approx(7.5)
+
+
+def test_record_done_reports_lag_and_updates_model(clock):
+    model = DurationModel(default_seconds=60)
+    scheduler = PollScheduler(model, min_interval=2, max_interval=30)
+    scheduler.track("op", 8, "16:9")
+    clock.advance(30)
+    scheduler.record_pending("op")
+    clock.advance(15)
+
+    stats = scheduler.record_done("op")
+
+    assert stats == {'elapsed': 45, 'lag': 15, 'polls': 2, 'poll_errors': 0}
+    assert model.expected(8, "16:9") == 45
+    assert len(scheduler) == 0
@@ -0,0 +1,68 @@
+"""Tests for the Gemini prompt cache"""
+import pytest
+
+from src.backend.prompt_cache import PromptCache, normalize_prompt
+
+
+@pytest.fixture
+def make_cache(tmp_path):
+    def make(**kwargs):
+        return PromptCache(str(tmp_path / "prompt_cache.sqlite"), **kwargs)
+    return make
+
+
+def test_miss_then_hit(make_cache):
+    cache = make_cache()
+    key = cache.key("gemini", {'response_mime_type': "application/json"}, "An ad idea")
+    assert cache.get(key) is None
+    cache.put(key, '{"scenes": []}')
+    assert cache.get(key) == '{"scenes": []}'
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'entries': 1}
+
+
+def test_entries_expire_after_ttl(clock, make_cache):
+    cache = make_cache(ttl_sec=60)
+    key = cache.key("gemini", None, "An ad idea")
+    cache.put(key, "[]")
+    clock.advance(59)
+    assert cache.get(key) == "[]"
+    clock.advance(2)
+    assert cache.get(key) is None
+
+
+def test_least_recently_used_entry_is_evicted(clock, make_cache):
+    cache = make_cache(max_entries=2)
+    first, second, third = (cache.key("gemini", None, prompt) for prompt in ("one", "two", "three"))
+    cache.put(first, "1")
+    clock.advance(1)
+    cache.put(second, "2")
+    clock.advance(1)
+    assert cache.get(first) == "1"  # Now more recently used than `second`
+    clock.advance(1)
+    cache.put(third, "3")
+
+    assert cache.get(second) is None
+    assert cache.get(first) == "1"
+    assert cache.get(third) == "3"
+
+
+def test_normalize_prompt_collapses_whitespace_and_case():
+    assert normalize_prompt("  A Bottle\n\ton   a HIKE ") == "a bottle on a hike"
+
+
+def test_semantic_mode_shares_entries_between_trivially_different_prompts(make_cache):
+    cache = make_cache(semantic=True)
+    assert cache.key("gemini", None, "A bottle on a hike") == cache.key("gemini", None, "a  bottle\non a HIKE ")
+    assert cache.key("gemini", None, "A bottle on a hike") != cache.key("gemini", None, "A bottle on a beach")
+
+
+def test_exact_mode_keys_on_the_prompt_as_sent(make_cache):
+    cache = make_cache()
+    assert cache.key("gemini", None, "A bottle on a hike") != cache.key("gemini", None, "a bottle on a hike")
+
+
+def test_key_depends_on_model_and_generation_config(make_cache):
+    cache = make_cache()
+    key = cache.key("gemini", {'response_mime_type': "application/json"}, "prompt")
+    assert key != cache.key("other-model", {'response_mime_type': "application/json"}, "prompt")
+    assert key != cache.key("gemini", {'response_mime_type': "text/plain"}, "prompt")
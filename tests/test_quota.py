@@ -0,0 +1,91 @@
+"""Tests for the Veo quota scheduler"""
+import pytest
+
+from src.backend import quota
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_scheduler(request, tmp_path):
+    """Builds schedulers backed by process memory or by a shared lease file."""
+    def make(**kwargs):
+        if request.param == "sqlite":
+            kwargs.setdefault("lease_db_path", str(tmp_path / "quota.sqlite"))
+        kwargs.setdefault("retry_sec", 2)
+        return quota.QuotaScheduler(**kwargs)
+    return make
+
+
+def test_requests_per_minute_is_a_sliding_window(clock, make_scheduler):
+    scheduler = make_scheduler(requests_per_minute=2, max_concurrent_operations=10)
+    assert scheduler.try_acquire("a") == 0
+    clock.advance(20)
+    assert scheduler.try_acquire("b") == 0
+
+    # The oldest start leaves the window 40s from now
+    assert scheduler.try_acquire("c") == pytest.approx(40)
+    clock.advance(40.5)
+    assert scheduler.try_acquire("c") == 0
+    assert scheduler.try_acquire("d") > 0
+
+
+def test_reacquiring_a_held_lease_uses_no_quota(clock, make_scheduler):
+    scheduler = make_scheduler(requests_per_minute=1, max_concurrent_operations=1)
+    assert scheduler.try_acquire("a") == 0
+    assert scheduler.try_acquire("a") == 0
+
+
+def test_concurrency_slot_frees_on_release(clock, make_scheduler):
+    scheduler = make_scheduler(requests_per_minute=10, max_concurrent_operations=1)
+    assert scheduler.try_acquire("a") == 0
+    assert scheduler.try_acquire("b") == 2
+    scheduler.release("a")
+    assert scheduler.try_acquire("b") == 0
+
+
+def test_unrenewed_lease_expires(clock, make_scheduler):
+    scheduler = make_scheduler(requests_per_minute=10, max_concurrent_operations=1, lease_ttl_sec=100)
+    assert scheduler.try_acquire("a") == 0
+    clock.advance(99)
+    assert scheduler.try_acquire("b") > 0
+    clock.advance(2)
+    assert scheduler.try_acquire("b") == 0
+
+
+def test_renewed_lease_does_not_expire(clock, make_scheduler):
+    scheduler = make_scheduler(requests_per_minute=10, max_concurrent_operations=1, lease_ttl_sec=100)
+    assert scheduler.try_acquire("a") == 0
+    clock.advance(60)
+    scheduler.renew(["a"])
+    clock.advance(60)
+    assert scheduler.try_acquire("b") > 0
+
+
+def test_quota_errors_back_off_exponentially(clock, make_scheduler):
+    scheduler = make_scheduler(backoff_base_sec=10, max_backoff_sec=35)
+    assert scheduler.record_quota_error() == 10
+    assert scheduler.record_quota_error() == 20
+    assert scheduler.record_quota_error() == 35
+
+    assert scheduler.try_acquire("a") == pytest.approx(35)
+    clock.advance(30)
+    assert scheduler.try_acquire("a") == pytest.approx(5)
+    clock.advance(5)
+    assert scheduler.try_acquire("a") == 0
+
+
+def test_success_resets_backoff(clock, make_scheduler):
+    scheduler = make_scheduler(backoff_base_sec=10)
+    scheduler.record_quota_error()
+    scheduler.record_quota_error()
+    clock.advance(20)
+    scheduler.record_success()
+    assert scheduler.record_quota_error() == 10
+
+
+def test_is_quota_error():
+    class ApiError(Exception):
+        code = 429
+
+    assert quota.is_quota_error(ApiError("Too many requests"))
+    assert quota.is_quota_error(Exception("RESOURCE_EXHAUSTED: Quota exceeded"))
+    assert not quota.is_quota_error(Exception("INVALID_ARGUMENT: bad prompt"))
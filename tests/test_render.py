@@ -0,0 +1,80 @@
+"""Tests for the final ad's ffmpeg filter graph"""
+import ffmpeg
+import pytest
+
+from src.backend.render import build_render_graph
+
+RENDER_CONFIG = {'transition': "fade", 'transition_sec': 0.5, 'music_volume': 0.3, 'duck_music': True,
+                 'text_overlay_sec': 3}
+
+
+def _probe(duration=4.0, audio=True):
+    return {'duration': duration, 'width': 1280, 'height': 720, 'fps': 24, 'audio': audio}
+
+
+def _filter_graph(sources, probes, music_source=None, text_file=None, **render_config):
+    """Returns (filter_complex, full argument list, stream count, duration) of the rendered graph."""
+    streams, total_sec = build_render_graph(sources, probes, music_source, text_file,
+                                            dict(RENDER_CONFIG, **render_config))
+    args = ffmpeg.output(*streams, "out.mp4").get_args()
+    return args[args.index('-filter_complex') + 1], args, len(streams), total_sec
+
+
+def test_single_clip_has_no_transition():
+    graph, _, stream_count, total_sec = _filter_graph(["a.mp4"], [_probe(audio=False)])
+    assert 'xfade' not in graph and 'concat' not in graph
+    assert stream_count == 1
+    assert total_sec == 4.0
+
+
+def test_clips_are_joined_with_xfade_at_each_boundary():
+    graph, _, stream_count, total_sec = _filter_graph(
+        ["a.mp4", "b.mp4", "c.mp4"], [_probe(audio=False)] * 3)
+    assert graph.count('xfade=') == 2
+    assert 'offset=3.5' in graph and 'offset=7.0' in graph
+    assert stream_count == 1
+    assert total_sec == pytest.approx(11.0)
+
+
+def test_zero_transition_concatenates():
+    graph, _, _, total_sec = _filter_graph(["a.mp4", "b.mp4"], [_probe(audio=False)] * 2, transition_sec=0)
+    assert 'xfade' not in graph
+    assert 'concat=a=0:n=2:v=1' in graph
+    assert total_sec == 8.0
+
+
+def test_transition_is_capped_by_the_shortest_clip():
+    graph, _, _, total_sec = _filter_graph(["a.mp4", "b.mp4"], [_probe(), _probe(duration=0.6)], transition_sec=1)
+    assert 'duration=0.3' in graph
+    assert total_sec == pytest.approx(4.3)
+
+
+def test_clip_audio_is_crossfaded_and_silent_clips_get_a_silent_track():
+    graph, args, stream_count, _ = _filter_graph(["a.mp4", "b.mp4"], [_probe(), _probe(audio=False)])
+    assert 'acrossfade=d=0.5' in graph
+    assert 'anullsrc=channel_layout=stereo:sample_rate=48000' in args
+    assert stream_count == 2
+
+
+def test_music_is_ducked_under_clip_audio():
+    graph, args, stream_count, _ = _filter_graph(["a.mp4", "b.mp4"], [_probe()] * 2, music_source="music.mp3")
+    assert 'sidechaincompress' in graph
+    assert 'amix=duration=first:inputs=2:normalize=0' in graph
+    assert args[args.index('music.mp3') - 5:args.index('music.mp3')] == ['-stream_loop', '-1', '-t', '7.5', '-i']
+    assert stream_count == 2
+
+
+def test_music_without_clip_audio_is_the_only_audio():
+    graph, _, stream_count, _ = _filter_graph(["a.mp4", "b.mp4"], [_probe(audio=False)] * 2,
+                                              music_source="music.mp3")
+    assert 'amix' not in graph and 'sidechaincompress' not in graph
+    assert 'volume=0.3' in graph and 'afade' in graph
+    assert stream_count == 2
+
+
+def test_text_overlay_covers_the_closing_seconds():
+    graph, _, _, _ = _filter_graph(["a.mp4", "b.mp4", "c.mp4"], [_probe(audio=False)] * 3,
+                                   text_file="overlay.txt")
+    assert 'drawtext' in graph
+    assert 'textfile=overlay.txt' in graph
+    assert r'enable=gte(t\,8.000)' in graph